@@ -0,0 +1,53 @@
+.data
+sum: 0
+digits: RESERVE 10
+digits_pointer: 0
+
+.text
+    MOV R2, 1001
+LOOP:
+    INC R1
+    JEQ R1, R2, GET_DIGITS
+    IDIVI R3, R1, 3
+    JZ ADD_TO_SUM
+    IDIVI R3, R1, 5
+    JZ ADD_TO_SUM
+    JMP LOOP
+
+ADD_TO_SUM:
+    LOAD R3, sum
+    ADD R2, R1, R3
+    STORE R2, sum
+    MOV R2, 1001
+    JMP LOOP
+
+GET_DIGITS:
+    MOV R1, digits_pointer
+    DEC R1
+    DEC R1
+    STORE R1, digits_pointer
+LOOP_DIGITS:
+    LOAD R1, sum
+    IDIVI R3, R1, 10
+    ADDI R2, R3, 48
+    LOAD R1, digits_pointer
+    STORE R2, (R1)
+    LOAD R1, sum
+    DIVI R3, R1, 10
+    JZ PRINT_DIGITS
+    STORE R3, sum
+    LOAD R1, digits_pointer
+    DEC R1
+    STORE R1, digits_pointer
+    JMP LOOP_DIGITS
+PRINT_DIGITS:
+    LOAD R1, digits_pointer
+    LOAD R2, (R1)
+    CMP R2, 0
+    JZ END
+    OUT R2, 1
+    INC R1
+    STORE R1, digits_pointer
+    JMP PRINT_DIGITS
+END:
+    HALT
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from binary_object import load_program
+from control_unit import ControlUnit, TickLimitError, TraceLevel
+from data_path import DataPath
+from input_port import read_input
+from machine import ENGINES
+from microcode import DecodedInstruction, InstructionDecoder
+
+# Кеш объектных файлов внутри процесса-исполнителя: программа читается
+# и декодируется один раз, затем используется всеми заданиями с этим файлом.
+programs: dict[str, tuple[list[int], list[DecodedInstruction]]] = {}
+
+
+def cached_program(object_file: str) -> tuple[list[int], list[DecodedInstruction]]:
+    if object_file not in programs:
+        program = load_program(object_file)
+        instruction_decoder = InstructionDecoder()
+        programs[object_file] = (
+            list(program.get("data", [])),
+            [
+                instruction_decoder.predecode(instruction)
+                for instruction in program.get("text", [])
+            ],
+        )
+    return programs[object_file]
+
+
+def execute_job(job: dict, engine: str) -> dict:
+    data, instructions = cached_program(job["object"])
+    tick_limit = job.get("tick_limit")
+
+    error = None
+    with open(job["input"]) as file:
+        data_path = DataPath(data, read_input(file))
+        control_unit = ENGINES[engine](data_path, instructions)
+        if isinstance(control_unit, ControlUnit):
+            control_unit.configure_trace(TraceLevel.OFF)
+        control_unit.tick_limit = math.inf if tick_limit is None else tick_limit
+        try:
+            control_unit.control_logic_procced()
+        except StopIteration:
+            halt = "HALT"
+        except EOFError:
+            halt = "EOF"
+        except TickLimitError:
+            halt = "LIMIT"
+        except Exception as exception:
+            halt = "ERROR"
+            error = repr(exception)
+
+    return {
+        "stdout": data_path.output_buffer.getvalue(),
+        "tick": control_unit.tick,
+        "halt": halt,
+        "error": error,
+    }
+
+
+def run_job(job: dict, engine: str) -> dict:
+    started = time.perf_counter()
+    try:
+        outcome = execute_job(job, engine)
+    except Exception as exception:
+        # задание не запустилось (нет объектного файла или ввода): ошибка
+        # остаётся в его строке результата и не прерывает остальные задания
+        outcome = {"stdout": "", "tick": 0, "halt": "ERROR", "error": repr(exception)}
+
+    result = {
+        "object": job.get("object"),
+        "input": job.get("input"),
+        "stdout": outcome["stdout"],
+        "tick": outcome["tick"],
+        "halt": outcome["halt"],
+        "wall_time": time.perf_counter() - started,
+    }
+    if outcome["error"] is not None:
+        result["error"] = outcome["error"]
+    return result
+
+
+def load_manifest(manifest_file: str) -> list[dict]:
+    # строка манифеста: {"object": ..., "input": ..., "tick_limit": ...}
+    with open(manifest_file, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def run_batch(jobs: list[dict], engine: str = "jit", workers: int | None = None):
+    workers = workers or os.cpu_count() or 1
+    # соседние задания попадают к одному исполнителю и переиспользуют его кеш
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(
+            partial(run_job, engine=engine), jobs, chunksize=chunksize
+        )
+
+
+def main(manifest_file, engine="jit", workers=None):
+    for result in run_batch(load_manifest(manifest_file), engine, workers):
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="batch.py")
+    parser.add_argument(
+        "manifest_file", help="JSON lines with object, input, tick_limit"
+    )
+    parser.add_argument("--engine", default="jit", choices=ENGINES)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    main(args.manifest_file, args.engine, args.workers)
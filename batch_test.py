@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from batch import run_batch
+from translator import translate_to_json
+
+PROGRAMS = Path(__file__).parent / "asm_programs"
+
+
+def test_failing_job_does_not_stop_others(tmp_path):
+    program = tmp_path / "hello_user_name.json"
+    program.write_text(
+        translate_to_json((PROGRAMS / "hello_user_name.asm").read_text("utf-8"))
+    )
+    user_input = str(PROGRAMS / "user_name.txt")
+    jobs = [
+        {"object": str(program), "input": user_input},
+        {"object": str(program), "input": str(tmp_path / "missing.txt")},
+        {"object": str(tmp_path / "missing.json"), "input": user_input},
+        {"object": str(program), "input": user_input, "tick_limit": 100},
+        {"object": str(program), "input": user_input},
+    ]
+
+    results = list(run_batch(jobs, "jit", workers=2))
+
+    assert [result["halt"] for result in results] == [
+        "HALT",
+        "ERROR",
+        "ERROR",
+        "LIMIT",
+        "HALT",
+    ]
+    assert "FileNotFoundError" in results[1]["error"]
+    assert "FileNotFoundError" in results[2]["error"]
+    assert [result["input"] for result in results] == [job["input"] for job in jobs]
+    assert results[0]["stdout"] == results[4]["stdout"]
+    assert results[0]["stdout"].startswith("What is your name?")
+    assert "error" not in results[0]
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.workloads import Workload, workloads
+from cfg_optimizer import CfgOptimizer
+from control_unit import ControlUnit, TraceLevel
+from data_path import DataPath
+from fast_engine import FastEngine
+from machine import ENGINES
+from peephole import Peephole
+from profiler import Profiler
+from translator import parse_asm
+
+BENCHMARKS = Path(__file__).resolve().parent
+ROOT = BENCHMARKS.parent
+# история и базовый прогон пишутся в текущий каталог, а не в пакет
+HISTORY = Path("benchmark_history.json")
+BASELINE = Path("benchmark_baseline.json")
+
+# метрика и направление: +1 - больше значит лучше, -1 - больше значит хуже
+METRICS = {
+    "ticks_per_second": 1,
+    "instructions_per_second": 1,
+    "translate_time": -1,
+    "peak_rss_mb": -1,
+}
+
+
+def profile(program: dict, workload: Workload) -> tuple[Profiler, FastEngine]:
+    engine = FastEngine(DataPath(program["data"], workload.input), program["text"])
+    profiler = Profiler(len(engine.instructions_memory))
+    profiler.run(engine)
+    return profiler, engine
+
+
+def count_instructions(workload: Workload) -> int:
+    # число исполненных инструкций не зависит от режима, считается один раз
+    profiler, _ = profile(parse_asm(workload.source), workload)
+    return sum(profiler.executions)
+
+
+def peephole_report(
+    names: list[str] | None, scale: float, global_optimize: bool = False
+) -> bool:
+    # экономия peephole-прохода (и глобальных проходов при global_optimize):
+    # команды в программе, исполненные команды и такты
+    identical = True
+    print(f"{'workload':<18} {'static':>15} {'executed':>21} {'ticks':>21}  output")
+    for workload in workloads(scale):
+        if names and workload.name not in names:
+            continue
+        global_optimizer = CfgOptimizer() if global_optimize else None
+        after, after_engine = profile(
+            parse_asm(workload.source, None, Peephole(), global_optimizer), workload
+        )
+        before, before_engine = profile(parse_asm(workload.source), workload)
+        same = (
+            after.halt == before.halt
+            and after_engine.data_path.output_buffer.getvalue()
+            == before_engine.data_path.output_buffer.getvalue()
+        )
+        identical = identical and same
+        print(
+            f"{workload.name:<18}"
+            f" {len(before.executions):>7} -> {len(after.executions):<5}"
+            f" {sum(before.executions):>10} -> {sum(after.executions):<8}"
+            f" {before_engine.tick:>10} -> {after_engine.tick:<8}"
+            f"  {'same' if same else 'DIFFERENT'}"
+        )
+    return identical
+
+
+def run_measurement(source_file: Path, input_file: Path, engine: str, trace: str):
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.measure",
+            str(source_file),
+            str(input_file),
+            engine,
+            trace,
+        ],
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+    return json.loads(completed.stdout)
+
+
+def run(
+    engines: list[str],
+    trace_levels: list[str],
+    names: list[str] | None,
+    scale: float,
+    repeat: int,
+) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for workload in workloads(scale):
+            if names and workload.name not in names:
+                continue
+            source_file = Path(directory) / f"{workload.name}.asm"
+            source_file.write_text(workload.source, encoding="utf-8")
+            input_file = Path(directory) / f"{workload.name}.txt"
+            input_file.write_text(workload.input, encoding="utf-8")
+            instructions = count_instructions(workload)
+
+            for engine in engines:
+                # журнал ведут только потактовые режимы
+                levels = (
+                    trace_levels
+                    if issubclass(ENGINES[engine], ControlUnit)
+                    else [TraceLevel.OFF.value]
+                )
+                for trace in levels:
+                    measurements = [
+                        run_measurement(source_file, input_file, engine, trace)
+                        for _ in range(repeat)
+                    ]
+                    best = min(measurements, key=lambda item: item["wall_time"])
+                    result = {
+                        "workload": workload.name,
+                        "engine": engine,
+                        "trace": trace,
+                        "instructions": instructions,
+                        **best,
+                        "translate_time": min(
+                            item["translate_time"] for item in measurements
+                        ),
+                        "ticks_per_second": best["ticks"] / best["wall_time"],
+                        "instructions_per_second": instructions / best["wall_time"],
+                    }
+                    print_result(result)
+                    results.append(result)
+    return results
+
+
+def print_result(result: dict):
+    print(
+        f"{result['workload']:<18} {result['engine']:<10} {result['trace']:<12}"
+        f" translate {result['translate_time'] * 1000:8.2f} ms"
+        f"  {result['ticks_per_second']:12.0f} ticks/s"
+        f"  {result['instructions_per_second']:12.0f} instr/s"
+        f"  {result['peak_rss_mb']:7.1f} MB",
+        flush=True,
+    )
+
+
+def current_commit() -> str | None:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip()
+
+
+def load_history(history_file: Path) -> list[dict]:
+    if not history_file.exists():
+        return []
+    return json.loads(history_file.read_text(encoding="utf-8"))
+
+
+def append_history(history_file: Path, entry: dict):
+    history = load_history(history_file)
+    history.append(entry)
+    history_file.write_text(json.dumps(history, indent=1), encoding="utf-8")
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    # регрессия - ухудшение метрики больше чем на threshold (доля)
+    reference = {
+        (item["workload"], item["engine"], item["trace"]): item
+        for item in baseline["results"]
+    }
+    regressions = []
+    for item in current["results"]:
+        key = (item["workload"], item["engine"], item["trace"])
+        if key not in reference:
+            continue
+        for metric, direction in METRICS.items():
+            before, after = reference[key][metric], item[metric]
+            if not before:
+                continue
+            change = (after - before) / before
+            flag = ""
+            if change * direction < -threshold:
+                flag = "REGRESSION"
+                regressions.append(f"{' '.join(key)} {metric}")
+            print(
+                f"{' '.join(key):<42} {metric:<24} {before:14.3f} -> {after:14.3f}"
+                f" {change * 100:+7.1f}% {flag}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument(
+        "--history", type=Path, default=HISTORY, help=f"default: ./{HISTORY}"
+    )
+    parser.add_argument(
+        "--baseline", type=Path, default=BASELINE, help=f"default: ./{BASELINE}"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="measure and append to history")
+    run_parser.add_argument("--engines", default=",".join(ENGINES))
+    # журнал microcode на больших нагрузках идёт часами и пишет гигабайты
+    run_parser.add_argument(
+        "--trace-levels",
+        default=TraceLevel.OFF.value,
+        help="comma separated, e.g. off,instruction,microcode (default: off)",
+    )
+    run_parser.add_argument("--workloads", default=None, help="comma separated")
+    run_parser.add_argument(
+        "--scale", type=float, default=1.0, help="size of synthetic workloads"
+    )
+    run_parser.add_argument("--repeat", type=int, default=1)
+
+    commands.add_parser("baseline", help="store the last history entry as baseline")
+
+    compare_parser = commands.add_parser(
+        "compare", help="compare the last history entry with the baseline"
+    )
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+
+    peephole_parser = commands.add_parser(
+        "peephole", help="report savings of the peephole pass"
+    )
+    peephole_parser.add_argument("--workloads", default=None, help="comma separated")
+    peephole_parser.add_argument("--scale", type=float, default=1.0)
+    peephole_parser.add_argument(
+        "--global-optimize", action="store_true", help="also run cfg_optimizer.py"
+    )
+
+    args = parser.parse_args()
+    if args.command == "run":
+        levels = {level.value for level in TraceLevel}
+        if not set(args.trace_levels.split(",")) <= levels:
+            parser.error(f"--trace-levels: choose from {','.join(sorted(levels))}")
+        results = run(
+            args.engines.split(","),
+            args.trace_levels.split(","),
+            args.workloads.split(",") if args.workloads else None,
+            args.scale,
+            args.repeat,
+        )
+        append_history(
+            args.history,
+            {
+                "timestamp": dt.datetime.now(dt.UTC).isoformat(),
+                "commit": current_commit(),
+                "python": platform.python_version(),
+                "scale": args.scale,
+                "results": results,
+            },
+        )
+    elif args.command == "baseline":
+        args.baseline.write_text(
+            json.dumps(load_history(args.history)[-1], indent=1), encoding="utf-8"
+        )
+    elif args.command == "peephole":
+        names = args.workloads.split(",") if args.workloads else None
+        if not peephole_report(names, args.scale, args.global_optimize):
+            sys.exit(1)
+    else:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(baseline, load_history(args.history)[-1], args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
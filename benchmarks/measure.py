@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import machine
+import translator
+
+
+def measure(source_file: str, input_file: str, engine: str, trace_level: str) -> dict:
+    asm_code = Path(source_file).read_text(encoding="utf-8")
+    started = time.perf_counter()
+    object_code = translator.translate(asm_code)
+    translate_time = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as directory:
+        object_file = Path(directory) / "program.json"
+        object_file.write_bytes(object_code)
+        started = time.perf_counter()
+        control_unit = machine.main(
+            str(object_file),
+            input_file,
+            engine,
+            trace_level,
+            output_file=os.devnull,
+        )
+        wall_time = time.perf_counter() - started
+
+    return {
+        "translate_time": translate_time,
+        "wall_time": wall_time,
+        "ticks": control_unit.tick,
+        # ru_maxrss в Linux - в килобайтах
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+if __name__ == "__main__":
+    # запускается отдельным процессом на каждое измерение, чтобы пиковый RSS
+    # относился к одному прогону
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.measure")
+    parser.add_argument("source_file")
+    parser.add_argument("input_file")
+    parser.add_argument("engine")
+    parser.add_argument("trace_level")
+    args = parser.parse_args()
+    result = measure(args.source_file, args.input_file, args.engine, args.trace_level)
+    json.dump(result, sys.stdout)
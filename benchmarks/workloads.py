@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import NamedTuple
+
+ASM_PROGRAMS = Path(__file__).resolve().parent.parent / "asm_programs"
+
+
+class Workload(NamedTuple):
+    name: str
+    source: str
+    input: str
+
+
+def read_program(name: str) -> str:
+    return (ASM_PROGRAMS / f"{name}.asm").read_text(encoding="utf-8")
+
+
+def text_input(size: int) -> str:
+    # печатные строки по 64 символа, как у обычного текстового файла
+    line = "".join(chr(ord("a") + index % 26) for index in range(63)) + "\n"
+    return (line * (size // len(line) + 1))[:size]
+
+
+def workloads(scale: float = 1.0) -> list[Workload]:
+    prob1 = read_program("prob1")
+    prob1_fused = read_program("prob1_fused")
+    # верхняя граница prob1 ограничена 15-битным непосредственным операндом
+    bound = min(32767, int(10000 * scale) + 1)
+    return [
+        Workload("hello", read_program("hello"), ""),
+        Workload(
+            "hello_user_name",
+            read_program("hello_user_name"),
+            (ASM_PROGRAMS / "user_name.txt").read_text(encoding="utf-8"),
+        ),
+        Workload("cat", read_program("cat"), "Alice"),
+        Workload("prob1", prob1, ""),
+        Workload(
+            f"prob1_{bound - 1}",
+            prob1.replace("CMP R1, 1001", f"CMP R1, {bound}"),
+            "",
+        ),
+        Workload("prob1_fused", prob1_fused, ""),
+        Workload(
+            f"prob1_fused_{bound - 1}",
+            prob1_fused.replace("MOV R2, 1001", f"MOV R2, {bound}"),
+            "",
+        ),
+        Workload(
+            f"cat_{int((1 << 20) * scale)}",
+            read_program("cat"),
+            text_input(int((1 << 20) * scale)),
+        ),
+    ]
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import json
+import mmap
+import struct
+from pathlib import Path
+
+import numpy as np
+
+from isa import encode_instruction
+
+MAGIC = b"CSAOBJ\x00\x00"
+VERSION = 1
+
+# заголовок: сигнатура, версия, число секций; затем таблица секций
+HEADER = struct.Struct("<8sHH")
+SECTION = struct.Struct("<8sII")
+
+TEXT_DTYPE = np.dtype("<u4")
+DATA_DTYPE = np.dtype("<i4")
+
+
+def pack_object(program: dict) -> bytes:
+    sections = {
+        b".text": np.array(
+            [encode_instruction(instruction) for instruction in program["text"]],
+            dtype=TEXT_DTYPE,
+        ).tobytes(),
+        b".data": np.array(program["data"], dtype=DATA_DTYPE).tobytes(),
+    }
+    offset = HEADER.size + SECTION.size * len(sections)
+    table = []
+    for name, payload in sections.items():
+        table.append(SECTION.pack(name, offset, len(payload)))
+        offset += len(payload)
+    return b"".join(
+        [HEADER.pack(MAGIC, VERSION, len(sections)), *table, *sections.values()]
+    )
+
+
+def is_binary_object(filename: str) -> bool:
+    with Path(filename).open("rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def load_object(filename: str) -> dict[str, np.ndarray]:
+    with (
+        Path(filename).open("rb") as file,
+        mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer,
+    ):
+        magic, version, count = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError()
+
+        sections = {}
+        for index in range(count):
+            name, offset, size = SECTION.unpack_from(
+                buffer, HEADER.size + SECTION.size * index
+            )
+            sections[name.rstrip(b"\x00")] = (offset, size)
+
+        program = {}
+        for key, name, dtype in (
+            ("text", b".text", TEXT_DTYPE),
+            ("data", b".data", DATA_DTYPE),
+        ):
+            offset, size = sections[name]
+            # копия нужна, чтобы отпустить отображение файла
+            program[key] = np.frombuffer(
+                buffer, dtype=dtype, count=size // dtype.itemsize, offset=offset
+            ).copy()
+        return program
+
+
+def load_program(filename: str) -> dict:
+    if is_binary_object(filename):
+        return load_object(filename)
+    with Path(filename).open() as file:
+        return json.load(file)
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import argparse
+import mmap
+import struct
+import sys
+from collections.abc import Iterator
+from pathlib import Path
+from typing import BinaryIO, NamedTuple, TextIO
+
+from binary_object import load_program
+from control_unit import TraceRecord, format_trace
+from microcode import InstructionDecoder
+
+MAGIC = b"CSATRACE"
+VERSION = 1
+
+HEADER = struct.Struct("<8sHH")
+# TICK, MC, IP, AR, R1, R2, R3, Z, DR, OR
+RECORD = struct.Struct("<QHqqqqq?qq")
+
+LOG_PREFIX = "DEBUG | "
+
+
+class BinaryRecord(NamedTuple):
+    tick: int
+    mc_addres: int
+    instruction_pointer: int
+    address_register: int
+    r1: int
+    r2: int
+    r3: int
+    zero_flag: bool
+    data_register: int
+    operand_register: int
+
+
+def segment_path(path: str, index: int) -> Path:
+    # первый сегмент - сам файл, следующие - path.1, path.2, ...
+    return Path(path if index == 0 else f"{path}.{index}")
+
+
+class TraceWriter:
+    path: str = None
+
+    chunk: bytearray = None
+
+    chunk_size: int = None
+
+    segment_records: int = None
+
+    segment_index: int = None
+
+    records_in_segment: int = None
+
+    file: BinaryIO = None
+
+    def __init__(
+        self,
+        path: str,
+        chunk_records: int = 1 << 16,
+        segment_records: int = 1 << 24,
+    ):
+        self.path = path
+        self.chunk = bytearray()
+        self.chunk_size = chunk_records * RECORD.size
+        self.segment_records = segment_records
+        self.segment_index = 0
+        self.records_in_segment = 0
+        self.remove_stale_segments()
+        self.open_segment()
+
+    def remove_stale_segments(self):
+        index = 1
+        while segment_path(self.path, index).exists():
+            segment_path(self.path, index).unlink()
+            index += 1
+
+    def open_segment(self):
+        self.file = segment_path(self.path, self.segment_index).open("wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+        self.records_in_segment = 0
+
+    def write(self, record: TraceRecord):
+        if self.records_in_segment == self.segment_records:
+            self.flush()
+            self.file.close()
+            self.segment_index += 1
+            self.open_segment()
+
+        self.chunk += RECORD.pack(
+            record.tick,
+            record.mc_addres,
+            record.instruction_pointer,
+            record.address_register,
+            record.r1,
+            record.r2,
+            record.r3,
+            record.zero_flag,
+            record.data_register,
+            record.operand_register,
+        )
+        self.records_in_segment += 1
+        if len(self.chunk) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.chunk)
+        self.chunk.clear()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self) -> TraceWriter:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TraceReader:
+    paths: list[Path] = None
+
+    def __init__(self, path: str):
+        self.paths = []
+        while segment_path(path, len(self.paths)).exists():
+            self.paths.append(segment_path(path, len(self.paths)))
+        if not self.paths:
+            raise FileNotFoundError(path)
+
+    def segment(self, path: Path) -> Iterator[BinaryRecord]:
+        if path.stat().st_size == HEADER.size:
+            return
+        with path.open("rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                magic, version, record_size = HEADER.unpack_from(buffer)
+                if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+                    raise ValueError()
+                view = memoryview(buffer)[HEADER.size :]
+                try:
+                    for fields in RECORD.iter_unpack(view):
+                        yield BinaryRecord(*fields)
+                finally:
+                    view.release()
+
+    def __iter__(self) -> Iterator[BinaryRecord]:
+        for path in self.paths:
+            yield from self.segment(path)
+
+    def __len__(self) -> int:
+        return sum(
+            (path.stat().st_size - HEADER.size) // RECORD.size for path in self.paths
+        )
+
+
+def render_trace(trace_file: str, object_file: str, file: TextIO):
+    # регистр инструкции не пишется в трассу: на тактах исполнения в нём лежит
+    # инструкция по адресу IP, её и восстанавливаем из объектного файла
+    asm_data = load_program(object_file)
+    instruction_decoder = InstructionDecoder()
+    instructions_memory = [
+        instruction_decoder.predecode(instruction)
+        for instruction in asm_data.get("text", [])
+    ]
+    for record in TraceReader(trace_file):
+        if 0 <= record.instruction_pointer < len(instructions_memory):
+            instruction = instructions_memory[record.instruction_pointer]
+        else:
+            instruction = None
+        trace_record = TraceRecord(
+            record.tick,
+            record.mc_addres,
+            record.instruction_pointer,
+            instruction,
+            record.address_register,
+            record.r1,
+            record.r2,
+            record.r3,
+            record.zero_flag,
+            record.data_register,
+            record.operand_register,
+        )
+        file.write(LOG_PREFIX + format_trace(trace_record) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="binary_trace.py", description="render binary trace as text log"
+    )
+    parser.add_argument("trace_file")
+    parser.add_argument("object_file")
+    args = parser.parse_args()
+    render_trace(args.trace_file, args.object_file, sys.stdout)
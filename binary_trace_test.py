@@ -0,0 +1,57 @@
+import io
+import math
+
+import pytest
+
+import translator
+from binary_object import load_program
+from binary_trace import TraceReader, TraceWriter, render_trace
+from control_unit import ControlUnit, TraceLevel
+from data_path import DataPath
+from input_port import read_input
+from output_port import BufferSink
+from trace_digest import TraceDigest
+
+# маленькие блоки и сегменты, чтобы прогон их пересекал
+CHUNK_RECORDS = 7
+
+SEGMENT_RECORDS = 100
+
+
+@pytest.mark.golden_test("golden/*_asm.yml")
+def test_segments_render_golden_log(golden, tmp_path):
+    source = tmp_path / "source.asm"
+    input_stream = tmp_path / "input.txt"
+    target = tmp_path / "target.o"
+    trace = tmp_path / "trace.bin"
+    source.write_text(golden["in_source"], encoding="utf-8")
+    input_stream.write_text(golden["in_stdin"], encoding="utf-8")
+    translator.main(str(source), str(target))
+
+    program = load_program(str(target))
+    with open(input_stream, encoding="utf-8") as file:
+        control_unit = ControlUnit(
+            DataPath(program["data"], read_input(file), BufferSink()),
+            program["text"],
+        )
+        with TraceWriter(str(trace), CHUNK_RECORDS, SEGMENT_RECORDS) as writer:
+            control_unit.configure_trace(TraceLevel.OFF, trace_writer=writer)
+            try:
+                control_unit.control_logic_procced()
+            except (StopIteration, EOFError):
+                pass
+
+    # такт останова в журнал не попадает
+    reader = TraceReader(str(trace))
+    ticks = control_unit.tick - 1
+    assert len(reader.paths) == math.ceil(ticks / SEGMENT_RECORDS)
+    assert [record.tick for record in reader] == list(range(1, ticks + 1))
+
+    log = io.StringIO()
+    render_trace(str(trace), str(target), log)
+    if "out_log_digest" in golden.out:
+        expected = golden.out["out_log_digest"]
+        digest = TraceDigest.from_log(log.getvalue().splitlines(), expected["interval"])
+        assert digest.as_dict() == expected, digest.divergence(expected)
+    else:
+        assert log.getvalue() == golden.out["out_log"]
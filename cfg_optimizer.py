@@ -0,0 +1,719 @@
+from __future__ import annotations
+
+import bisect
+
+import numpy as np
+from numpy import int16
+
+from data_path import ZERO
+from fast_engine import alu_registers
+from isa import COMPARE_JUMPS, IMMEDIATE_ALU, IMMEDIATE_MASK, Opcode
+from microcode import DecodedInstruction, Instruction, InstructionDecoder
+from peephole import ALU, JUMPS
+
+# размер памяти данных, как в data_path.Memory для небольших программ
+MEMORY_SIZE = 1024
+
+# индекс флага нуля в состоянии, регистры R1-R3 занимают индексы 1-3
+FLAG = 0
+
+# значение, не известное при трансляции; None - точка ещё не достигнута
+UNKNOWN = object()
+
+# JZ и JNZ выполняются при установленном флаге нуля (см. ControlUnit.handle_jnz)
+BRANCHES = frozenset((Opcode.JZ, Opcode.JNZ))
+
+# JEQ и JNE сами выставляют флаг и обращаются друг в друга
+INVERTED = {Opcode.JEQ: Opcode.JNE, Opcode.JNE: Opcode.JEQ}
+
+# команда с непосредственным операндом для команды над регистрами
+IMMEDIATE_FORMS = {opcode: immediate for immediate, opcode in IMMEDIATE_ALU.items()}
+
+# второй операнд этих операций можно поменять местами с первым
+COMMUTATIVE = frozenset((Opcode.ADD, Opcode.MUL))
+
+
+def known(value) -> bool:
+    return value is not None and value is not UNKNOWN
+
+
+def same(first, second) -> bool:
+    # константы совпадают вместе с разрядностью: int16 и int64 считаются по-разному
+    if not known(first) or not known(second):
+        return first is second
+    return type(first) is type(second) and first == second
+
+
+def merge(first, second):
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return first if same(first, second) else UNKNOWN
+
+
+def evaluate(opcode: Opcode, first, second):
+    # те же операции над скалярами numpy, что в FastEngine.alu_result
+    opcode = IMMEDIATE_ALU.get(opcode, opcode)
+    with np.errstate(all="ignore"):
+        match opcode:
+            case Opcode.ADD:
+                return first + second
+            case Opcode.SUB:
+                return first - second
+            case Opcode.IDIV:
+                return first % second
+            case Opcode.DIV:
+                return first // second
+            case Opcode.MUL:
+                return first * second
+            case Opcode.INC:
+                return first + 1
+            case Opcode.DEC:
+                return first - 1
+            case Opcode.CMP | Opcode.JEQ | Opcode.JNE:
+                return first - second
+    raise ValueError()
+
+
+def effects(instruction: DecodedInstruction) -> tuple[set, set]:
+    # читаемые и записываемые регистры (FLAG - флаг нуля)
+    opcode = instruction.opcode
+    operands = instruction.registers
+    if opcode in (Opcode.MOV, Opcode.LOAD):
+        return set(operands[1:]), {operands[0]}
+    if opcode in (Opcode.STORE, Opcode.OUT):
+        return set(operands), set()
+    if opcode in ALU:
+        target, first, second = alu_registers(instruction)
+        return {first, second}, {target, FLAG}
+    if opcode in IMMEDIATE_ALU:
+        return {operands[1]}, {operands[0], FLAG}
+    if opcode in (Opcode.INC, Opcode.DEC):
+        return {operands[0]}, {operands[0], FLAG}
+    if opcode == Opcode.CMP or opcode in COMPARE_JUMPS:
+        return set(operands), {FLAG}
+    if opcode in BRANCHES:
+        return {FLAG}, set()
+    if opcode == Opcode.IN:
+        return set(), {operands[0]}
+    return set(), set()
+
+
+def jump(opcode: Opcode, target: int) -> Instruction:
+    return {"opcode": opcode.value, "args": [{"number": str(target)}]}
+
+
+def retarget(
+    instruction: Instruction, target: int, opcode: Opcode | None = None
+) -> Instruction:
+    # адрес перехода - последний аргумент, регистры JEQ/JNE сохраняются
+    return {
+        "opcode": (opcode or Opcode[instruction["opcode"]]).value,
+        "args": [*instruction["args"][:-1], {"number": str(target)}],
+    }
+
+
+class Block:
+    # базовый блок: тело без завершающего перехода и способ выхода из блока
+    body: list[int] = None
+
+    # "jump", "branch", "fall" или "halt"
+    kind: str = None
+
+    # завершающий условный переход
+    branch: Instruction | None = None
+
+    target: int | None = None
+
+    fall: int | None = None
+
+    # исходная команда для перехода, добавленного при раскладке
+    origin: int = None
+
+    # адрес за последней командой блока после раскладки
+    address: int = None
+
+    def __init__(self, body: list[int], kind: str, origin: int):
+        self.body = body
+        self.kind = kind
+        self.origin = origin
+
+
+class CfgOptimizer:
+    # Глобальные проходы над разрешённой секцией .text: граф потока управления,
+    # распространение констант по R1-R3, флагу нуля и ячейкам .data, в которые
+    # никто не пишет, свёртка условных переходов и вычислений в MOV, удаление
+    # мёртвых команд и недостижимых блоков, сквозные переходы и раскладка блоков,
+    # при которой безусловный переход по возможности заменяется проваливанием.
+    folded: int = None
+
+    removed: int = None
+
+    threaded: int = None
+
+    decoder: InstructionDecoder = None
+
+    memory_size: int = None
+
+    def __init__(self):
+        self.folded = 0
+        self.removed = 0
+        self.threaded = 0
+        self.decoder = InstructionDecoder()
+
+    def optimize(self, instructions: list[Instruction], data: list[int]) -> list[int]:
+        # instructions меняется на месте; возвращается номер исходной команды
+        # для каждой команды результата
+        origins = list(range(len(instructions)))
+        try:
+            decoded = [self.decoder.predecode(item) for item in instructions]
+            constants = self.constant_cells(decoded, data)
+        except (KeyError, ValueError, OverflowError):
+            return origins
+        if not self.analyzable(decoded):
+            return origins
+
+        columns = (instructions, decoded, origins)
+        while True:
+            leaders = self.leaders(decoded)
+            states = self.propagate(decoded, leaders, constants)
+            live = self.liveness(decoded, leaders)
+            changed, removed = self.fold(
+                instructions, decoded, leaders, states, live, constants
+            )
+            removed |= self.unreachable(instructions, decoded, leaders, states)
+            if not removed:
+                # живость посчитана до удаления повторных MOV и LOAD, поэтому
+                # мёртвые команды ищутся на следующей итерации
+                removed = self.dead(decoded, leaders, states, live)
+            self.remove(removed, columns)
+            if not changed and not removed:
+                break
+
+        self.layout(columns)
+        return origins
+
+    def analyzable(self, decoded: list[DecodedInstruction]) -> bool:
+        # команда без микропрограммы, переход за пределы программы или выполнение
+        # за последней командой останавливают машину с ошибкой: такие программы
+        # не меняются
+        if not decoded or decoded[-1].opcode not in (Opcode.JMP, Opcode.HALT):
+            return False
+        for instruction in decoded:
+            if instruction.opcode == Opcode.HALT:
+                continue
+            if instruction.mc_addres is None or instruction.mc_addres_zero is None:
+                return False
+            if instruction.opcode in JUMPS and (
+                instruction.operand is None
+                or not 0 <= int(instruction.operand) < len(decoded)
+            ):
+                return False
+        return True
+
+    def constant_cells(
+        self, decoded: list[DecodedInstruction], data: list[int]
+    ) -> dict[int, int16]:
+        self.memory_size = max(MEMORY_SIZE, len(data))
+        # STORE по адресу из регистра может изменить любую ячейку
+        stored = set()
+        for instruction in decoded:
+            if instruction.opcode == Opcode.STORE:
+                if len(instruction.registers) > 1:
+                    return {}
+                stored.add(int(instruction.operand))
+        cells = [int16(value) for value in data]
+        return {
+            address: cells[address] if address < len(cells) else int16(0)
+            for address in range(self.memory_size)
+            if address not in stored
+        }
+
+    def leaders(self, decoded: list[DecodedInstruction]) -> list[int]:
+        leaders = {0}
+        for index, instruction in enumerate(decoded):
+            if instruction.opcode in JUMPS:
+                leaders.add(int(instruction.operand))
+            if instruction.opcode in JUMPS or instruction.opcode == Opcode.HALT:
+                leaders.add(index + 1)
+        return sorted(leader for leader in leaders if leader < len(decoded))
+
+    def block_end(self, leaders: list[int], start: int, size: int) -> int:
+        position = bisect.bisect_right(leaders, start)
+        return leaders[position] if position < len(leaders) else size
+
+    def successors(
+        self, decoded: list[DecodedInstruction], end: int, zero_flag
+    ) -> list[int]:
+        last = decoded[end - 1]
+        if last.opcode == Opcode.HALT:
+            return []
+        if last.opcode == Opcode.JMP:
+            return [int(last.operand)]
+        if last.opcode in BRANCHES:
+            if not known(zero_flag):
+                return [int(last.operand), end]
+            return [int(last.operand) if zero_flag else end]
+        if last.opcode in COMPARE_JUMPS:
+            # флаг выставлен самим переходом; JNE выполняется при сброшенном флаге
+            if not known(zero_flag):
+                return [int(last.operand), end]
+            taken = zero_flag == (last.opcode == Opcode.JEQ)
+            return [int(last.operand) if taken else end]
+        return [end]
+
+    def transfer(self, instruction: DecodedInstruction, state: list, constants: dict):
+        opcode = instruction.opcode
+        operands = instruction.registers
+        if opcode == Opcode.MOV:
+            state[operands[0]] = (
+                instruction.operand if len(operands) == 1 else state[operands[1]]
+            )
+        elif opcode == Opcode.LOAD:
+            address = instruction.operand if len(operands) == 1 else state[operands[1]]
+            state[operands[0]] = (
+                constants.get(int(address), UNKNOWN) if known(address) else UNKNOWN
+            )
+        elif (
+            opcode in ALU
+            or opcode in IMMEDIATE_ALU
+            or opcode in COMPARE_JUMPS
+            or opcode in (Opcode.INC, Opcode.DEC, Opcode.CMP)
+        ):
+            if opcode in ALU:
+                target, first, second = alu_registers(instruction)
+                values = [state[first], state[second]]
+            elif opcode in IMMEDIATE_ALU:
+                target = operands[0]
+                values = [state[operands[1]], instruction.operand]
+            elif opcode == Opcode.CMP or opcode in COMPARE_JUMPS:
+                target = None
+                values = [
+                    state[operands[0]],
+                    instruction.operand if len(operands) == 1 else state[operands[1]],
+                ]
+            else:
+                target = operands[0]
+                values = [state[target], None]
+            if known(values[0]) and (
+                known(values[1]) or opcode in (Opcode.INC, Opcode.DEC)
+            ):
+                result = evaluate(opcode, *values)
+                state[FLAG] = bool(result == ZERO)
+            else:
+                result = UNKNOWN
+                state[FLAG] = UNKNOWN
+            if target is not None:
+                state[target] = result
+        elif opcode == Opcode.IN:
+            state[operands[0]] = UNKNOWN
+
+    def propagate(
+        self,
+        decoded: list[DecodedInstruction],
+        leaders: list[int],
+        constants: dict,
+    ) -> dict[int, list | None]:
+        # состояние на входе в блок; машина стартует с нулевыми регистрами
+        states = {leader: None for leader in leaders}
+        states[0] = [False, int16(0), int16(0), int16(0)]
+        worklist = [0]
+        while worklist:
+            start = worklist.pop()
+            end = self.block_end(leaders, start, len(decoded))
+            state = list(states[start])
+            for index in range(start, end):
+                self.transfer(decoded[index], state, constants)
+            for successor in self.successors(decoded, end, state[FLAG]):
+                before = states[successor]
+                merged = (
+                    list(state)
+                    if before is None
+                    else [merge(old, new) for old, new in zip(before, state)]
+                )
+                if before is None or not all(map(same, before, merged)):
+                    states[successor] = merged
+                    worklist.append(successor)
+        return states
+
+    def liveness(
+        self, decoded: list[DecodedInstruction], leaders: list[int]
+    ) -> dict[int, set]:
+        # живые на выходе из блока регистры и флаг; после HALT ничего не живо
+        live_in = {leader: set() for leader in leaders}
+        live_out = {leader: set() for leader in leaders}
+        changed = True
+        while changed:
+            changed = False
+            for start in reversed(leaders):
+                end = self.block_end(leaders, start, len(decoded))
+                live = set()
+                for successor in self.successors(decoded, end, UNKNOWN):
+                    live |= live_in[successor]
+                live_out[start] = set(live)
+                for index in range(end - 1, start - 1, -1):
+                    uses, defines = effects(decoded[index])
+                    live = (live - defines) | uses
+                if live != live_in[start]:
+                    live_in[start] = live
+                    changed = True
+        return live_out
+
+    def live_after(
+        self, decoded: list[DecodedInstruction], start: int, end: int, live_out: set
+    ) -> list[set]:
+        live = set(live_out)
+        after = [None] * (end - start)
+        for index in range(end - 1, start - 1, -1):
+            after[index - start] = set(live)
+            uses, defines = effects(decoded[index])
+            live = (live - defines) | uses
+        return after
+
+    def fold(
+        self,
+        instructions: list[Instruction],
+        decoded: list[DecodedInstruction],
+        leaders: list[int],
+        states: dict,
+        live: dict,
+        constants: dict,
+    ) -> tuple[bool, set[int]]:
+        changed = False
+        removed = set()
+        for start in leaders:
+            if states[start] is None:
+                continue
+            end = self.block_end(leaders, start, len(decoded))
+            live_after = self.live_after(decoded, start, end, live[start])
+            state = list(states[start])
+            for index in range(start, end):
+                instruction = decoded[index]
+                before = list(state)
+                self.transfer(instruction, state, constants)
+                if self.redundant(
+                    instruction, before, state, live_after[index - start]
+                ):
+                    removed.add(index)
+                    continue
+                replacement = self.replacement(
+                    instruction, state, live_after[index - start]
+                )
+                if replacement is not None:
+                    instructions[index] = replacement
+                    decoded[index] = self.decoder.predecode(replacement)
+                    self.folded += 1
+                    changed = True
+        return changed, removed
+
+    def redundant(
+        self, instruction: DecodedInstruction, before: list, after: list, live: set
+    ) -> bool:
+        opcode = instruction.opcode
+        if opcode in BRANCHES:
+            # переход, который никогда не выполняется
+            return known(before[FLAG]) and not before[FLAG]
+        if opcode in COMPARE_JUMPS:
+            # то же для JEQ/JNE, если выставленный им флаг дальше не читается
+            return (
+                known(after[FLAG])
+                and after[FLAG] != (opcode == Opcode.JEQ)
+                and FLAG not in live
+            )
+        if opcode in (Opcode.MOV, Opcode.LOAD):
+            # регистр уже содержит это значение той же разрядности
+            target = instruction.registers[0]
+            return known(after[target]) and same(before[target], after[target])
+        return False
+
+    def replacement(
+        self, instruction: DecodedInstruction, after: list, live: set
+    ) -> Instruction | None:
+        opcode = instruction.opcode
+        if opcode in BRANCHES:
+            # флаг известен и установлен: переход выполняется всегда
+            if known(after[FLAG]) and after[FLAG]:
+                return jump(Opcode.JMP, int(instruction.operand))
+            return None
+        if opcode in COMPARE_JUMPS:
+            if (
+                known(after[FLAG])
+                and after[FLAG] == (opcode == Opcode.JEQ)
+                and FLAG not in live
+            ):
+                return jump(Opcode.JMP, int(instruction.operand))
+            return None
+        if opcode == Opcode.LOAD:
+            target = instruction.registers[0]
+        elif opcode in ALU:
+            target = alu_registers(instruction)[0]
+        elif opcode in IMMEDIATE_ALU or opcode in (Opcode.INC, Opcode.DEC):
+            target = instruction.registers[0]
+        else:
+            return None
+        # MOV кладёт в регистр int16 из 15-битного операнда и не трогает флаг
+        value = after[target]
+        if self.immediate(value) and (opcode == Opcode.LOAD or FLAG not in live):
+            return {
+                "opcode": Opcode.MOV.value,
+                "args": [{"reg": f"R{target}"}, {"number": str(int(value))}],
+            }
+        if opcode in ALU:
+            return self.immediate_form(instruction, after)
+        return None
+
+    def immediate_form(
+        self, instruction: DecodedInstruction, after: list
+    ) -> Instruction | None:
+        # известный второй операнд становится непосредственным, регистр источника
+        # после этого может оказаться мёртвым
+        target, first, second = alu_registers(instruction)
+        if not self.immediate(after[second]):
+            if instruction.opcode not in COMMUTATIVE or not self.immediate(
+                after[first]
+            ):
+                return None
+            first, second = second, first
+        return {
+            "opcode": IMMEDIATE_FORMS[instruction.opcode].value,
+            "args": [
+                {"reg": f"R{target}"},
+                {"reg": f"R{first}"},
+                {"number": str(int(after[second]))},
+            ],
+        }
+
+    def immediate(self, value) -> bool:
+        # int16 из 15-битного операнда: разрядность результата не меняется
+        return type(value) is int16 and 0 <= value <= IMMEDIATE_MASK
+
+    def unreachable(
+        self,
+        instructions: list[Instruction],
+        decoded: list[DecodedInstruction],
+        leaders: list[int],
+        states: dict,
+    ) -> set[int]:
+        # JEQ/JNE с известным исходом остаётся, если его флаг ещё читается;
+        # вместо недостижимого блока, на который он указывает, ставится HALT
+        referenced = set()
+        for start in leaders:
+            end = self.block_end(leaders, start, len(decoded))
+            if states[start] is not None and decoded[end - 1].opcode in COMPARE_JUMPS:
+                referenced.update((int(decoded[end - 1].operand), end))
+        removed = set()
+        for start in leaders:
+            if states[start] is not None:
+                continue
+            end = self.block_end(leaders, start, len(decoded))
+            if start not in referenced:
+                removed.update(range(start, end))
+                continue
+            if decoded[start].opcode != Opcode.HALT:
+                instructions[start] = {"opcode": Opcode.HALT.value, "args": []}
+                decoded[start] = self.decoder.predecode(instructions[start])
+            removed.update(range(start + 1, end))
+        return removed
+
+    def pure(self, instruction: DecodedInstruction) -> bool:
+        # команды без побочных эффектов, которые не могут остановить машину
+        opcode = instruction.opcode
+        if opcode == Opcode.LOAD:
+            return (
+                len(instruction.registers) == 1
+                and int(instruction.operand) < self.memory_size
+            )
+        if opcode in ALU or opcode in IMMEDIATE_ALU:
+            return True
+        return opcode in (Opcode.MOV, Opcode.INC, Opcode.DEC, Opcode.CMP)
+
+    def dead(
+        self,
+        decoded: list[DecodedInstruction],
+        leaders: list[int],
+        states: dict,
+        live: dict,
+    ) -> set[int]:
+        dead = set()
+        for start in leaders:
+            if states[start] is None:
+                continue
+            end = self.block_end(leaders, start, len(decoded))
+            alive = set(live[start])
+            for index in range(end - 1, start - 1, -1):
+                uses, defines = effects(decoded[index])
+                if self.pure(decoded[index]) and not defines & alive:
+                    dead.add(index)
+                    continue
+                alive = (alive - defines) | uses
+        return dead
+
+    def remove(self, removed: set[int], columns: tuple[list, ...]):
+        if not removed:
+            return
+        instructions, decoded, _ = columns
+        kept = [index for index in range(len(decoded)) if index not in removed]
+        for index in kept:
+            if decoded[index].opcode in JUMPS:
+                # переход на удалённую команду ведёт на следующую оставшуюся
+                target = bisect.bisect_left(kept, int(decoded[index].operand))
+                instructions[index] = retarget(instructions[index], target)
+                decoded[index] = self.decoder.predecode(instructions[index])
+        for column in columns:
+            column[:] = [column[index] for index in kept]
+        self.removed += len(removed)
+
+    def layout(self, columns: tuple[list, ...]):
+        instructions, decoded, origins = columns
+        leaders = self.leaders(decoded)
+        blocks = {}
+        for start in leaders:
+            end = self.block_end(leaders, start, len(decoded))
+            last = decoded[end - 1]
+            if last.opcode == Opcode.HALT:
+                block = Block(list(range(start, end - 1)), "halt", end - 1)
+            elif last.opcode == Opcode.JMP:
+                block = Block(list(range(start, end - 1)), "jump", end - 1)
+                block.target = int(last.operand)
+            elif last.opcode in BRANCHES or last.opcode in COMPARE_JUMPS:
+                block = Block(list(range(start, end - 1)), "branch", end - 1)
+                block.branch = instructions[end - 1]
+                block.target = int(last.operand)
+                block.fall = end
+            else:
+                block = Block(list(range(start, end)), "fall", end - 1)
+                block.fall = end
+            blocks[start] = block
+
+        entry = self.thread(blocks)
+        order = self.order(blocks, entry, leaders)
+
+        emitted = []
+        for position, start in enumerate(order):
+            block = blocks[start]
+            following = order[position + 1] if position + 1 < len(order) else None
+            origin = origins[block.origin]
+            emitted.extend(
+                (origins[index], instructions[index]) for index in block.body
+            )
+            if block.kind == "halt":
+                emitted.append((origin, {"opcode": Opcode.HALT.value, "args": []}))
+            elif block.kind == "jump" and block.target != following:
+                emitted.append((origin, (jump(Opcode.JMP, 0), block.target, None)))
+            elif block.kind == "fall" and block.fall != following:
+                emitted.append((origin, (jump(Opcode.JMP, 0), block.fall, None)))
+            elif block.kind == "branch":
+                opcode = Opcode[block.branch["opcode"]]
+                target, fall = block.target, block.fall
+                if opcode in INVERTED and target == following:
+                    # JEQ/JNE на следующий блок обращается в переход на продолжение
+                    target, fall = fall, target
+                    opcode = INVERTED[opcode]
+                emitted.append((origin, (block.branch, target, opcode)))
+                if fall != following:
+                    # перехода по сброшенному флагу нет, JZ/JNZ не обращаются
+                    emitted.append((origin, (jump(Opcode.JMP, 0), fall, None)))
+            block.address = len(emitted)
+
+        # адрес блока - первая команда его тела или следующего блока, если тело пусто
+        addresses = {}
+        position = 0
+        for start in order:
+            addresses[start] = position
+            position = blocks[start].address
+        origins[:] = [origin for origin, _ in emitted]
+        instructions[:] = [
+            retarget(item[0], addresses[item[1]], item[2])
+            if isinstance(item, tuple)
+            else item
+            for _, item in emitted
+        ]
+        decoded[:] = [self.decoder.predecode(item) for item in instructions]
+
+    def follow(self, blocks: dict[int, Block], start: int) -> int:
+        # пустой блок с безусловным переходом пропускается
+        seen = set()
+        while start not in seen and not blocks[start].body:
+            if blocks[start].kind != "jump":
+                break
+            seen.add(start)
+            start = blocks[start].target
+        return start
+
+    def thread(self, blocks: dict[int, Block]) -> int:
+        for block in blocks.values():
+            if block.kind in ("jump", "branch"):
+                target = self.follow(blocks, block.target)
+                self.threaded += target != block.target
+                block.target = target
+            if block.kind in ("branch", "fall"):
+                fall = self.follow(blocks, block.fall)
+                self.threaded += fall != block.fall
+                block.fall = fall
+            if block.kind == "jump":
+                destination = blocks[block.target]
+                if not destination.body and destination.kind == "halt":
+                    # переход на HALT заменяется самим HALT
+                    block.kind = "halt"
+                    self.threaded += 1
+            if (
+                block.kind == "branch"
+                and block.target == block.fall
+                and Opcode[block.branch["opcode"]] in BRANCHES
+            ):
+                # JEQ/JNE остаются: они выставляют флаг
+                block.kind = "fall"
+                self.removed += 1
+        return self.follow(blocks, 0)
+
+    def order(
+        self, blocks: dict[int, Block], entry: int, leaders: list[int]
+    ) -> list[int]:
+        # цепочки блоков: за блоком ставится цель его безусловного перехода или
+        # продолжение, если они ещё не размещены; вход остаётся первым
+        reachable = set()
+        stack = [entry]
+        while stack:
+            start = stack.pop()
+            if start in reachable:
+                continue
+            reachable.add(start)
+            block = blocks[start]
+            stack.extend(
+                successor
+                for successor in (block.target, block.fall)
+                if successor is not None and block.kind != "halt"
+            )
+        order = []
+        placed = set()
+        start = entry
+        while start is not None:
+            while start is not None and start not in placed:
+                order.append(start)
+                placed.add(start)
+                start = self.preferred(blocks[start], placed)
+            start = next(
+                (
+                    leader
+                    for leader in leaders
+                    if leader in reachable and leader not in placed
+                ),
+                None,
+            )
+        return order
+
+    def preferred(self, block: Block, placed: set[int]) -> int | None:
+        if block.kind == "jump":
+            return block.target
+        if (
+            block.kind == "branch"
+            and Opcode[block.branch["opcode"]] in INVERTED
+            and block.fall in placed
+        ):
+            # JEQ/JNE обращается, и следом ставится цель перехода
+            return block.target
+        if block.kind in ("fall", "branch"):
+            # условный переход выполняется только по цели, продолжение ставится следом
+            return block.fall
+        return None
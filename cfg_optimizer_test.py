@@ -0,0 +1,156 @@
+import pytest
+
+from cfg_optimizer import CfgOptimizer
+from data_path import DataPath
+from fast_engine import FastEngine
+from output_port import BufferSink
+from translator import parse_asm
+
+# исходная программа, ожидаемый результат проходов и ввод
+CASES = {
+    "fold_to_mov": (
+        """
+        .data
+        .text
+            MOV R1, 6
+            MOV R2, 7
+            MUL R3, R1, R2
+            OUT R3, 1
+            HALT
+        """,
+        """
+        .data
+        .text
+            MOV R3, 42
+            OUT R3, 1
+            HALT
+        """,
+        [],
+    ),
+    "fold_to_immediate": (
+        """
+        .data
+        .text
+            IN R1, 0
+            MOV R2, 5
+            ADD R3, R1, R2
+            OUT R3, 1
+            HALT
+        """,
+        """
+        .data
+        .text
+            IN R1, 0
+            ADDI R3, R1, 5
+            OUT R3, 1
+            HALT
+        """,
+        ["<"],
+    ),
+    "unreachable_and_dead": (
+        """
+        .data
+        .text
+            MOV R1, 1
+            CMP R1, 1
+            JZ SKIP
+            OUT R1, 1
+        SKIP:
+            IN R2, 0
+            ADD R3, R2, R2
+            MOV R3, 66
+            OUT R3, 1
+            HALT
+        """,
+        """
+        .data
+        .text
+            IN R2, 0
+            MOV R3, 66
+            OUT R3, 1
+            HALT
+        """,
+        ["A"],
+    ),
+    "jump_threading": (
+        """
+        .data
+        .text
+        LOOP:
+            IN R1, 0
+            CMP R1, 10
+            JZ HOP
+            OUT R1, 1
+            JMP LOOP
+        HOP:
+            JMP END
+        END:
+            HALT
+        """,
+        """
+        .data
+        .text
+        LOOP:
+            IN R1, 0
+            CMP R1, 10
+            JZ END
+            OUT R1, 1
+            JMP LOOP
+        END:
+            HALT
+        """,
+        ["A", "B", 10],
+    ),
+    "compare_jump_inversion": (
+        """
+        .data
+        .text
+            IN R2, 0
+            JMP NEXT
+        CHECK:
+            IN R1, 0
+            JEQ R1, R2, END
+        NEXT:
+            OUT R2, 1
+            JMP CHECK
+        END:
+            HALT
+        """,
+        """
+        .data
+        .text
+            IN R2, 0
+        NEXT:
+            OUT R2, 1
+            IN R1, 0
+            JNE R1, R2, NEXT
+            HALT
+        """,
+        ["x", "a", "b", "x"],
+    ),
+}
+
+
+def run(program, tokens):
+    engine = FastEngine(
+        DataPath(program["data"], iter(tokens), BufferSink()), program["text"]
+    )
+    try:
+        engine.control_logic_procced()
+    except StopIteration:
+        pass
+    return engine.data_path.output_buffer.getvalue(), engine.tick
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_transformed_program(name):
+    source, expected, tokens = CASES[name]
+    original = parse_asm(source)
+    optimized = parse_asm(source, global_optimizer=CfgOptimizer())
+
+    assert optimized["text"] == parse_asm(expected)["text"]
+    # вывод тот же, а тактов не больше
+    output, ticks = run(optimized, tokens)
+    expected_output, expected_ticks = run(original, tokens)
+    assert output == expected_output
+    assert ticks < expected_ticks
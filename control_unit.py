@@ -1,26 +1,84 @@
 from __future__ import annotations
 
 import logging
+import math
+from collections import deque
+from enum import Enum
+from typing import TYPE_CHECKING, NamedTuple, TextIO
 
 from numpy import int16
 
-from data_path import DataPath
+from data_path import ONE, ZERO, DataPath
 from microcode import (
     ControlStore,
+    DecodedInstruction,
     Instruction,
     InstructionDecoder,
     Microcode,
     Signal,
     SignalValue,
 )
+from perf_counters import PerfCounters
+
+if TYPE_CHECKING:
+    from binary_trace import TraceWriter
+
+
+class TickLimitError(Exception):
+    pass
+
+
+class TraceLevel(Enum):
+    OFF = "off"
+    INSTRUCTION = "instruction"
+    MICROCODE = "microcode"
+
+
+class TraceRecord(NamedTuple):
+    tick: int
+    mc_addres: int16
+    instruction_pointer: int16
+    instruction_register: DecodedInstruction | None
+    address_register: int16
+    r1: int16
+    r2: int16
+    r3: int16
+    zero_flag: bool
+    data_register: int16
+    operand_register: int16
+
+
+def format_trace(record: TraceRecord) -> str:
+    action = (
+        record.instruction_register.opcode.value
+        + " "
+        + record.instruction_register.first_arg_val
+        + " "
+        + record.instruction_register.second_arg_val
+        if record.mc_addres not in [0, 1]
+        else "INSTR FETCH"
+    )
+    log_message = ""
+    log_message += f"TICK: {record.tick:<5} "
+    log_message += f"ACTION: {action!s:<12}  "
+    log_message += f"MC: {record.mc_addres:<4}  "
+    log_message += f"IP: {record.instruction_pointer:<4}  "
+    log_message += f"AR: {record.address_register:<4}  "
+    log_message += f"R1: {record.r1:<4}  "
+    log_message += f"R2: {record.r2:<4}  "
+    log_message += f"R3: {record.r3:<4}  "
+    log_message += f"Z: {int(record.zero_flag):<2}  "
+    log_message += f"DR: {record.data_register:<4}  "
+    log_message += f"OR: {record.operand_register}"
+    return log_message
 
 
 class ControlUnit:
     instruction_pointer: int16 = None
 
-    instructions_memory: list[Instruction] = None
+    instructions_memory: list[DecodedInstruction] = None
 
-    instruction_register: Instruction = None
+    instruction_register: DecodedInstruction = None
 
     data_path: DataPath = None
 
@@ -34,36 +92,93 @@ class ControlUnit:
 
     tick: int = None
 
+    # останов на первой границе инструкции, где tick >= tick_limit
+    tick_limit: int | float = None
+
     mux1: int16 = None
     mux2: int16 = None
 
+    trace_level: TraceLevel = None
+
+    # последние такты для посмертного дампа, None - история не ведётся
+    history: deque[TraceRecord] | None = None
+
+    trace_writer: TraceWriter | None = None
+
+    # счётчики производительности, None - не ведутся
+    counters: PerfCounters | None = None
+
+    # на каждом такте вызывается info(): журнал, история или счётчики
+    tracing: bool = None
+
     def __init__(self, data_path: DataPath, instructions: list[Instruction]):
         self.instruction_pointer = int16(0)
-        self.instructions_memory = instructions.copy()
         self.data_path = data_path
         self.instruction_decoder = InstructionDecoder()
+        self.instructions_memory = [
+            self.instruction_decoder.predecode(instruction)
+            for instruction in instructions
+        ]
         self.controle_store = ControlStore()
         self.mc_addres = int16(0)
         self.current_mc = self.controle_store.mc_memory[self.mc_addres]
         self.tick = 0
+        self.tick_limit = math.inf
         self.mux1 = int16(0)
         self.mux2 = int16(0)
+        self.configure_trace(TraceLevel.MICROCODE)
+
+    def configure_trace(
+        self,
+        trace_level: TraceLevel,
+        history_size: int = 0,
+        trace_writer: TraceWriter | None = None,
+    ):
+        self.trace_level = trace_level
+        self.history = deque(maxlen=history_size) if history_size > 0 else None
+        self.trace_writer = trace_writer
+        self.update_tracing()
+
+    def enable_counters(self) -> PerfCounters:
+        self.counters = PerfCounters(self)
+        self.update_tracing()
+        return self.counters
+
+    def update_tracing(self):
+        self.tracing = (
+            self.trace_level != TraceLevel.OFF
+            or self.history is not None
+            or self.trace_writer is not None
+            or self.counters is not None
+        )
 
     def signal_sel_mc_addr(self, signal: int16):
         match signal:
             case SignalValue.SEL_MC_ADDR_INC.value:
-                self.mux1 = self.mc_addres + int16(1)
+                self.mux1 = self.mc_addres + ONE
             case SignalValue.SEL_MC_ADDR_NEXT.value:
                 self.mux1 = self.instruction_decoder.mc_addres
             case SignalValue.SEL_MC_ADDR_NULL.value:
-                self.mux1 = int16(0)
+                self.mux1 = ZERO
 
     def signal_sel_ip(self, signal: int16):
         match signal:
             case SignalValue.SEL_IP_INC.value:
-                self.mux2 = self.instruction_pointer + int16(1)
+                self.mux2 = self.instruction_pointer + ONE
             case SignalValue.SEL_IP_OP.value:
                 self.mux2 = self.instruction_decoder.operand
+            case SignalValue.SEL_IP_OP_ZERO.value:
+                self.mux2 = (
+                    self.instruction_decoder.operand
+                    if self.data_path.alu.zero_flag
+                    else self.instruction_pointer + ONE
+                )
+            case SignalValue.SEL_IP_OP_NOT_ZERO.value:
+                self.mux2 = (
+                    self.instruction_pointer + ONE
+                    if self.data_path.alu.zero_flag
+                    else self.instruction_decoder.operand
+                )
 
     def signal_start_decode(self):
         self.instruction_decoder.zero_flag = self.data_path.alu.zero_flag
@@ -135,39 +250,59 @@ class ControlUnit:
             case Signal.OUT_BUF_WRITE:
                 self.data_path.signal_out_buf_write()
 
-    def info(self):
-        action = (
-            self.instruction_register["opcode"]
-            + " "
-            + self.instruction_decoder.first_arg_val
-            + " "
-            + self.instruction_decoder.second_arg_val
-            if self.mc_addres not in [0, 1]
-            else "INSTR FETCH"
+    def trace_record(self) -> TraceRecord:
+        return TraceRecord(
+            self.tick,
+            self.mc_addres,
+            self.instruction_pointer,
+            self.instruction_register,
+            self.data_path.address_register,
+            self.data_path.r1,
+            self.data_path.r2,
+            self.data_path.r3,
+            self.data_path.alu.zero_flag,
+            self.data_path.data_register,
+            self.data_path.operand_register,
         )
-        log_message = ""
-        log_message += f"TICK: {self.tick:<5} "
-        log_message += f"ACTION: {action!s:<12}  "
-        log_message += f"MC: {self.mc_addres:<4}  "
-        log_message += f"IP: {self.instruction_pointer:<4}  "
-        log_message += f"AR: {self.data_path.address_register:<4}  "
-        log_message += f"R1: {self.data_path.r1:<4}  "
-        log_message += f"R2: {self.data_path.r2:<4}  "
-        log_message += f"R3: {self.data_path.r3:<4}  "
-        log_message += f"Z: {int(self.data_path.alu.zero_flag):<2}  "
-        log_message += f"DR: {self.data_path.data_register:<4}  "
-        log_message += f"OR: {self.data_path.operand_register}"
-
-        logging.debug(log_message)
 
-    def control_logic_procced(self):
-        while True:
-            self.tick += 1
+    def info(self):
+        if self.counters is not None:
+            self.counters.count(self)
+
+        record = None
+        if self.history is not None or self.trace_writer is not None:
+            record = self.trace_record()
+            if self.history is not None:
+                self.history.append(record)
+            if self.trace_writer is not None:
+                self.trace_writer.write(record)
 
-            for signal, value in self.current_mc.items():
-                self.send_signal(signal, value)
+        if self.trace_level == TraceLevel.OFF:
+            return
+        if self.trace_level == TraceLevel.INSTRUCTION and self.mc_addres != 0:
+            return
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug(format_trace(record or self.trace_record()))
 
+    def dump_history(self, file: TextIO):
+        for record in self.history or ():
+            print(format_trace(record), file=file)
+
+    def step(self):
+        self.tick += 1
+
+        for signal, value in self.current_mc.items():
+            self.send_signal(signal, value)
+
+        if self.tracing:
             self.info()
 
-            self.send_signal(Signal.LATCH_MC_ADDR, SignalValue.LATCH)
-            self.send_signal(Signal.READ_MC, SignalValue.READ_MC)
+        self.send_signal(Signal.LATCH_MC_ADDR, SignalValue.LATCH)
+        self.send_signal(Signal.READ_MC, SignalValue.READ_MC)
+
+    def control_logic_procced(self):
+        while True:
+            if self.tick >= self.tick_limit and self.mc_addres == 0:
+                raise TickLimitError()
+
+            self.step()
@@ -1,8 +1,17 @@
 from __future__ import annotations
 
-from numpy import int16
+from array import array
+from collections.abc import Iterable
+from typing import BinaryIO
 
+from numpy import int16, int64
+
+from input_port import InputPort, Token
 from microcode import SignalValue
+from output_port import BufferSink, OutputSink
+
+ZERO = int16(0)
+ONE = int16(1)
 
 
 class ALU:
@@ -21,15 +30,68 @@ class ALU:
         self.zero_flag = False
 
 
+class WordArray:
+    # Ячейки лежат в одном непрерывном массиве int64. Ячейка хранит слово int16,
+    # пока в неё не записали результат АЛУ, расширенный до int64 (например,
+    # сумма в prob1), - такие ячейки отмечены в wide и читаются как int64.
+    values: array = None
+
+    wide: bytearray = None
+
+    # массивы разделены со снимком или другой копией и копируются перед записью
+    shared: bool = False
+
+    def __init__(self, data: list[int16], size: int):
+        self.values = array("q", [int16(el) for el in data])
+        self.values.frombytes(bytes(self.values.itemsize * (size - len(data))))
+        self.wide = bytearray(len(self.values))
+
+    @classmethod
+    def from_buffers(cls, values: array, wide: bytearray) -> WordArray:
+        word_array = cls.__new__(cls)
+        word_array.values = values
+        word_array.wide = wide
+        return word_array
+
+    def share(self) -> WordArray:
+        # копия при записи: обе стороны читают общие массивы, пока одна из них
+        # не начнёт писать
+        self.shared = True
+        copy = WordArray.from_buffers(self.values, self.wide)
+        copy.shared = True
+        return copy
+
+    def unshare(self):
+        self.values = self.values[:]
+        self.wide = self.wide[:]
+        self.shared = False
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, address: int16) -> int16 | int64:
+        if self.wide[address]:
+            return int64(self.values[address])
+        return int16(self.values[address])
+
+    def __setitem__(self, address: int16, value: int16 | int64):
+        if self.shared:
+            self.unshare()
+        self.values[address] = value
+        self.wide[address] = type(value) is not int16
+
+    def dump(self, file: BinaryIO):
+        self.values.tofile(file)
+
+
 class Memory:
-    memory: list[int16] = None
+    memory: WordArray = None
 
     output_value: int16 = None
 
     def __init__(self, data: list[int16]):
-        self.memory = [int16(el) for el in data]
-        self.memory.extend([int16(0)] * (1024 - len(data)))
-        self.output_value = int16(0)
+        self.memory = WordArray(data, max(1024, len(data)))
+        self.output_value = ZERO
 
 
 class DataPath:
@@ -49,8 +111,8 @@ class DataPath:
 
     alu: ALU = None
 
-    input_buffer: list[int16] = None
-    output_buffer: list[int16] = None
+    input_buffer: InputPort = None
+    output_buffer: OutputSink = None
 
     mux1: int16 = None
 
@@ -60,7 +122,12 @@ class DataPath:
 
     operand_bus: int16 = None
 
-    def __init__(self, data: list[int16], input_tokens: list[str]):
+    def __init__(
+        self,
+        data: list[int16],
+        input_tokens: Iterable[Token],
+        output_sink: OutputSink | None = None,
+    ):
         self.data_memory = Memory(data)
         self.data_register = int16(0)
         self.operand_register = int16(0)
@@ -69,8 +136,8 @@ class DataPath:
         self.r2 = int16(0)
         self.r3 = int16(0)
         self.alu = ALU()
-        self.input_buffer = input_tokens.copy()
-        self.output_buffer = []
+        self.input_buffer = InputPort(input_tokens)
+        self.output_buffer = output_sink if output_sink is not None else BufferSink()
         self.mux1 = int16(0)
         self.mux2 = int16(0)
         self.mux3 = int16(0)
@@ -113,7 +180,7 @@ class DataPath:
             case SignalValue.OPERATION_DEC.value:
                 self.alu.result = self.alu.first_operand - 1
 
-        if self.alu.result == int16(0):
+        if self.alu.result == ZERO:
             self.alu.zero_flag = True
         else:
             self.alu.zero_flag = False
@@ -127,9 +194,9 @@ class DataPath:
                 self.mux1 = self.operand_register
 
             case SignalValue.SEL_R_WRITE_INP_BUFF.value:
-                if len(self.input_buffer) == 0:
+                if not self.input_buffer:
                     raise EOFError()
-                symbol = self.input_buffer[0]
+                symbol = self.input_buffer.peek()
                 if isinstance(symbol, str):
                     symbol = int16(ord(symbol))
                 assert -128 <= symbol <= 127, "input token is out of bound: {}".format(
@@ -166,7 +233,7 @@ class DataPath:
         self.data_memory.memory[self.address_register] = self.mux2
 
     def signal_inp_buf_next(self):
-        self.input_buffer.pop(0)
+        self.input_buffer.advance()
 
     def signal_out_buf_next(self):
         self.output_buffer.append(chr(self.mux2))
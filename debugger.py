@@ -0,0 +1,368 @@
+from __future__ import annotations
+
+import argparse
+import bisect
+import shlex
+import sys
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
+from typing import TextIO
+
+from binary_object import load_program
+from control_unit import ControlUnit, TraceLevel, format_trace
+from data_path import DataPath
+from input_port import Token, read_input
+from mc_compiler import CompiledControlUnit
+from microcode import Instruction, Microcode, Signal
+from output_port import BufferSink
+from snapshot import Snapshot
+
+
+class RecordedInput:
+    # Прочитанные символы запоминаются, и машина, восстановленная с контрольной
+    # точки, получает тот же ввод, даже если исходный поток читать повторно нельзя.
+    tokens: list[Token] = None
+
+    source: Iterator[Token] = None
+
+    def __init__(self, source: Iterable[Token]):
+        self.tokens = []
+        self.source = iter(source)
+
+    def __iter__(self) -> Iterator[Token]:
+        index = 0
+        while True:
+            if index == len(self.tokens):
+                token = next(self.source, None)
+                if token is None:
+                    return
+                self.tokens.append(token)
+            yield self.tokens[index]
+            index += 1
+
+
+class Watch(ABC):
+    def reset(self, control_unit: ControlUnit):
+        pass
+
+    @abstractmethod
+    def hit(self, control_unit: ControlUnit, microcode: Microcode) -> bool: ...
+
+
+class MemoryWriteWatch(Watch):
+    address: int = None
+
+    def __init__(self, address: int):
+        self.address = address
+
+    def hit(self, control_unit: ControlUnit, microcode: Microcode) -> bool:
+        # в микрокоманде записи AR не меняется, поэтому после такта в нём адрес записи
+        return (
+            Signal.MEM_WRITE in microcode
+            and control_unit.data_path.address_register == self.address
+        )
+
+
+class RegisterWatch(Watch):
+    register: str = None
+
+    value: object = None
+
+    def __init__(self, register: str):
+        self.register = register
+
+    def reset(self, control_unit: ControlUnit):
+        self.value = getattr(control_unit.data_path, self.register)
+
+    def hit(self, control_unit: ControlUnit, microcode: Microcode) -> bool:
+        value = getattr(control_unit.data_path, self.register)
+        changed = value != self.value
+        self.value = value
+        return changed
+
+
+class InstructionWatch(Watch):
+    def hit(self, control_unit: ControlUnit, microcode: Microcode) -> bool:
+        # такт завершил инструкцию: следующей будет выборка
+        return control_unit.mc_addres == 0
+
+
+class TimeTravelDebugger:
+    instructions: list[Instruction] = None
+
+    engine: type[ControlUnit] = None
+
+    input: RecordedInput = None
+
+    control_unit: ControlUnit = None
+
+    # такт -> снимок; такты контрольных точек по возрастанию
+    checkpoints: dict[int, Snapshot] = None
+    checkpoint_ticks: list[int] = None
+
+    checkpoint_interval: int = None
+
+    max_checkpoints: int = None
+
+    # причина останова программы, None - машина может продолжать
+    halt: str | None = None
+
+    # самый длинный известный вывод; вывод на такте T - его начало
+    output_text: str = None
+
+    def __init__(
+        self,
+        instructions: list[Instruction],
+        data: list[int],
+        input_tokens: Iterable[Token],
+        checkpoint_interval: int = 10000,
+        max_checkpoints: int = 64,
+        engine: type[ControlUnit] = CompiledControlUnit,
+    ):
+        self.instructions = instructions
+        self.engine = engine
+        self.input = RecordedInput(input_tokens)
+        self.checkpoint_interval = checkpoint_interval
+        self.max_checkpoints = max_checkpoints
+        self.output_text = ""
+
+        data_path = DataPath(data, iter(self.input), BufferSink())
+        self.control_unit = engine(data_path, instructions)
+        self.control_unit.configure_trace(TraceLevel.OFF)
+        self.checkpoints = {}
+        self.checkpoint_ticks = []
+        self.checkpoint()
+
+    @property
+    def tick(self) -> int:
+        return self.control_unit.tick
+
+    def checkpoint(self):
+        tick = self.control_unit.tick
+        self.checkpoints[tick] = Snapshot.capture(self.control_unit)
+        self.checkpoint_ticks.append(tick)
+        if len(self.checkpoint_ticks) > self.max_checkpoints:
+            # Прореживание: остаётся каждая вторая точка (нулевая - всегда),
+            # а шаг удваивается, так что память ограничена при любой длине прогона.
+            for tick in self.checkpoint_ticks[1::2]:
+                del self.checkpoints[tick]
+            self.checkpoint_ticks = self.checkpoint_ticks[::2]
+            self.checkpoint_interval *= 2
+
+    def restore(self, tick: int):
+        self.output()
+        snapshot = self.checkpoints[tick]
+        self.control_unit = snapshot.restore(
+            self.instructions, iter(self.input), BufferSink(), self.engine
+        )
+        self.control_unit.configure_trace(TraceLevel.OFF)
+        self.halt = None
+
+    def forward(self, tick: int | float, watch: Watch | None = None) -> int | None:
+        # исполнение до такта tick; возвращает последний такт, где сработал watch
+        control_unit = self.control_unit
+        mc_memory = control_unit.controle_store.mc_memory
+        last_hit = None
+        if watch is not None:
+            watch.reset(control_unit)
+        while control_unit.tick < tick and self.halt is None:
+            microcode = mc_memory[control_unit.mc_addres]
+            try:
+                control_unit.step()
+            except StopIteration:
+                self.halt = "HALT"
+            except EOFError:
+                self.halt = "EOF"
+            except Exception as error:
+                self.halt = repr(error)
+            if self.halt is not None:
+                break
+            if watch is not None and watch.hit(control_unit, microcode):
+                last_hit = control_unit.tick
+            if (
+                control_unit.tick
+                >= self.checkpoint_ticks[-1] + self.checkpoint_interval
+            ):
+                self.checkpoint()
+        return last_hit
+
+    def goto(self, tick: int):
+        tick = max(tick, 0)
+        nearest = self.checkpoint_ticks[
+            bisect.bisect_right(self.checkpoint_ticks, tick) - 1
+        ]
+        # назад или вперёд за ближайшую контрольную точку - через восстановление
+        if tick < self.tick or nearest > self.tick:
+            self.restore(nearest)
+        self.forward(tick)
+
+    def reverse(self, watch: Watch) -> int | None:
+        # последний такт раньше текущего, где сработал watch: отрезки между
+        # контрольными точками переигрываются от текущего такта к началу
+        present = self.tick
+        end = present - 1
+        for start in reversed(list(self.checkpoint_ticks)):
+            if start > end:
+                continue
+            self.restore(start)
+            hit = self.forward(end, watch)
+            if hit is not None:
+                self.goto(hit)
+                return hit
+            end = start
+        self.goto(present)
+        return None
+
+    def step_back(self, ticks: int = 1):
+        self.goto(self.tick - ticks)
+
+    def previous_instruction(self) -> int | None:
+        hit = self.reverse(InstructionWatch())
+        if hit is None:
+            self.goto(0)
+        return hit
+
+    def next_instruction(self):
+        self.forward(self.tick + 1)
+        while self.control_unit.mc_addres != 0 and self.halt is None:
+            self.forward(self.tick + 1)
+
+    def last_write(self, address: int) -> int | None:
+        return self.reverse(MemoryWriteWatch(address))
+
+    def last_change(self, register: str) -> int | None:
+        return self.reverse(RegisterWatch(register))
+
+    def output(self) -> str:
+        sink = self.control_unit.data_path.output_buffer
+        if sink.position > len(self.output_text):
+            text = sink.getvalue()
+            self.output_text = self.output_text[: sink.position - len(text)] + text
+        return self.output_text[: sink.position]
+
+
+REGISTERS = {
+    "r1": "r1",
+    "r2": "r2",
+    "r3": "r3",
+    "ar": "address_register",
+    "dr": "data_register",
+    "or": "operand_register",
+}
+
+HELP = """\
+step [N]        forward N ticks (default 1)
+back [N]        backward N ticks (default 1)
+next            forward to the next instruction
+prev            backward to the previous instruction
+goto T          jump to tick T
+continue [T]    run until tick T or program stop
+last-write A    backward to the last write of memory address A
+last-change R   backward to the last change of R1, R2, R3, AR, DR or OR
+info            current state
+mem A [N]       N memory words from address A
+output          program output up to the current tick
+checkpoints     checkpoint ticks
+quit"""
+
+
+def print_state(debugger: TimeTravelDebugger, file: TextIO):
+    control_unit = debugger.control_unit
+    print(format_trace(control_unit.trace_record()), file=file)
+    if debugger.halt is not None:
+        print(f"stopped: {debugger.halt}", file=file)
+
+
+def run_command(debugger: TimeTravelDebugger, line: str, file: TextIO) -> bool:
+    words = shlex.split(line)
+    if not words:
+        return True
+    command, args = (
+        words[0],
+        [int(arg) if arg.lstrip("-").isdigit() else arg for arg in words[1:]],
+    )
+    match command, args:
+        case "step" | "s", [*count]:
+            debugger.forward(debugger.tick + (count[0] if count else 1))
+        case "back" | "b", [*count]:
+            debugger.step_back(count[0] if count else 1)
+        case "next" | "n", []:
+            debugger.next_instruction()
+        case "prev" | "p", []:
+            debugger.previous_instruction()
+        case "goto" | "g", [int(tick)]:
+            debugger.goto(tick)
+        case "continue" | "c", [*limit]:
+            debugger.forward(limit[0] if limit else float("inf"))
+        case "last-write" | "lw", [int(address)]:
+            if debugger.last_write(address) is None:
+                print(f"no write to {address} before this tick", file=file)
+        case "last-change" | "lc", [str(register)] if register.lower() in REGISTERS:
+            if debugger.last_change(REGISTERS[register.lower()]) is None:
+                print(f"{register} did not change before this tick", file=file)
+        case "info" | "i", []:
+            pass
+        case "mem" | "m", [int(address), *count]:
+            memory = debugger.control_unit.data_path.data_memory.memory
+            for offset in range(count[0] if count else 1):
+                print(f"{address + offset}: {memory[address + offset]}", file=file)
+            return True
+        case "output" | "o", []:
+            print(repr(debugger.output()), file=file)
+            return True
+        case "checkpoints", []:
+            print(" ".join(map(str, debugger.checkpoint_ticks)), file=file)
+            return True
+        case "quit" | "q", []:
+            return False
+        case _:
+            print(HELP, file=file)
+            return True
+    print_state(debugger, file)
+    return True
+
+
+def main(
+    object_file,
+    input_file,
+    checkpoint_interval=10000,
+    max_checkpoints=64,
+    commands=sys.stdin,
+):
+    program = load_program(object_file)
+    with open(input_file) as file:
+        debugger = TimeTravelDebugger(
+            program.get("text", []),
+            program.get("data", []),
+            read_input(file),
+            checkpoint_interval,
+            max_checkpoints,
+        )
+        print_state(debugger, sys.stdout)
+        for line in commands:
+            if not run_command(debugger, line, sys.stdout):
+                break
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="debugger.py",
+        epilog=HELP,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("object_file")
+    parser.add_argument("input_file")
+    parser.add_argument(
+        "--interval",
+        type=int,
+        default=10000,
+        help="initial checkpoint spacing in ticks",
+    )
+    parser.add_argument(
+        "--max-checkpoints",
+        type=int,
+        default=64,
+        help="thin out checkpoints and double the spacing beyond this count",
+    )
+    args = parser.parse_args()
+    main(args.object_file, args.input_file, args.interval, args.max_checkpoints)
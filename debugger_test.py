@@ -0,0 +1,77 @@
+from pathlib import Path
+
+import pytest
+
+from control_unit import TraceLevel
+from data_path import DataPath
+from debugger import TimeTravelDebugger
+from input_port import read_input
+from output_port import BufferSink
+from snapshot import Snapshot
+from translator import parse_asm
+
+PROGRAMS = Path(__file__).parent / "asm_programs"
+
+
+@pytest.fixture
+def program():
+    source = (PROGRAMS / "hello_user_name.asm").read_text(encoding="utf-8")
+    return parse_asm(source)
+
+
+def user_input():
+    with open(PROGRAMS / "user_name.txt", encoding="utf-8") as file:
+        return list(read_input(file))
+
+
+def replay(program, engine, tick):
+    # исполнение с нуля до такта tick без контрольных точек
+    control_unit = engine(
+        DataPath(program["data"], iter(user_input()), BufferSink()), program["text"]
+    )
+    control_unit.configure_trace(TraceLevel.OFF)
+    while control_unit.tick < tick:
+        control_unit.step()
+    return control_unit
+
+
+def assert_matches_replay(debugger, program):
+    expected = replay(program, debugger.engine, debugger.tick)
+    assert (
+        Snapshot.capture(debugger.control_unit).to_bytes()
+        == Snapshot.capture(expected).to_bytes()
+    )
+    assert debugger.output() == expected.data_path.output_buffer.getvalue()
+
+
+def new_debugger(program):
+    return TimeTravelDebugger(
+        program["text"],
+        program["data"],
+        user_input(),
+        checkpoint_interval=100,
+        max_checkpoints=8,
+    )
+
+
+@pytest.mark.parametrize("ticks", [1, 7, 150, 700])
+def test_step_back_matches_replay(program, ticks):
+    debugger = new_debugger(program)
+    debugger.forward(800)
+    debugger.step_back(ticks)
+    assert debugger.tick == 800 - ticks
+    assert_matches_replay(debugger, program)
+
+
+def test_reverse_watches_match_replay(program):
+    debugger = new_debugger(program)
+    debugger.forward(800)
+
+    hit = debugger.previous_instruction()
+    assert hit is not None
+    assert debugger.control_unit.mc_addres == 0
+    assert_matches_replay(debugger, program)
+
+    hit = debugger.last_change("r1")
+    assert hit is not None
+    assert_matches_replay(debugger, program)
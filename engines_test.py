@@ -0,0 +1,79 @@
+import warnings
+
+import pytest
+
+from control_unit import ControlUnit, TraceLevel
+from data_path import DataPath
+from machine import ENGINES
+
+# режимы с тактами исходного Control Store
+EXACT_ENGINES = ("microcode", "compiled", "fast", "jit")
+
+
+def register(name):
+    return {"reg": name}
+
+
+def number(value):
+    return {"number": str(value)}
+
+
+FAULTING_PROGRAMS = {
+    "load_out_of_range": [
+        {"opcode": "MOV", "args": [register("R2"), number(5000)]},
+        {"opcode": "LOAD", "args": [register("R1"), {"indirect_address": "R2"}]},
+    ],
+    "store_out_of_range": [
+        {"opcode": "MOV", "args": [register("R2"), number(5000)]},
+        {"opcode": "STORE", "args": [register("R1"), {"indirect_address": "R2"}]},
+    ],
+    "load_direct_out_of_range": [
+        {"opcode": "LOAD", "args": [register("R1"), number(5000)]},
+    ],
+    "out_of_chr_range": [
+        {"opcode": "MOV", "args": [register("R2"), number(-5)]},
+        {"opcode": "OUT", "args": [register("R2"), number(1)]},
+    ],
+    "end_of_input": [
+        {"opcode": "INC", "args": [register("R1")]},
+        {"opcode": "IN", "args": [register("R1"), number(0)]},
+    ],
+}
+
+
+def run_until_fault(engine, instructions):
+    control_unit = ENGINES[engine](DataPath([], iter([])), instructions)
+    if isinstance(control_unit, ControlUnit):
+        control_unit.configure_trace(TraceLevel.OFF)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        try:
+            control_unit.control_logic_procced()
+        except Exception as error:
+            return type(error).__name__, control_unit.tick
+    pytest.fail("program did not fault")
+
+
+@pytest.mark.parametrize("name", FAULTING_PROGRAMS)
+def test_fault_tick_matches_microcode(name):
+    # сбойная инструкция начисляет такты своей микропрограммы до сбоя
+    instructions = FAULTING_PROGRAMS[name]
+    expected = run_until_fault("microcode", instructions)
+    for engine in EXACT_ENGINES[1:]:
+        assert run_until_fault(engine, instructions) == expected, engine
+
+
+def test_unknown_opcode_fails_only_when_executed():
+    # транслятор пропускает неизвестный опкод: программа загружается,
+    # а сбой происходит при декодировании этой инструкции, как у неверных аргументов
+    unreachable = [
+        {"opcode": "HALT", "args": []},
+        {"opcode": "FOO", "args": [register("R1")]},
+    ]
+    reached = [
+        {"opcode": "INC", "args": [register("R1")]},
+        {"opcode": "FOO", "args": [register("R1")]},
+    ]
+    for engine in EXACT_ENGINES:
+        assert run_until_fault(engine, unreachable) == ("StopIteration", 2), engine
+        assert run_until_fault(engine, reached) == ("ValueError", 6), engine
@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import math
+
+from numpy import int16
+
+from control_unit import TickLimitError
+from data_path import ZERO, DataPath
+from isa import IMMEDIATE_ALU, Opcode
+from microcode import (
+    ControlStore,
+    DecodedInstruction,
+    Instruction,
+    InstructionDecoder,
+    Signal,
+    SignalValue,
+)
+
+
+def instruction_ticks(
+    control_store: ControlStore, instruction_decoder: InstructionDecoder
+) -> dict[int, int]:
+    fetch_ticks = len(control_store.microprogram(0))
+    return {
+        address: fetch_ticks + len(control_store.microprogram(address))
+        for address in set(instruction_decoder.mc_address_mapping.values())
+    }
+
+
+def jump_addresses(
+    control_store: ControlStore, instruction_decoder: InstructionDecoder
+) -> set[int]:
+    return {
+        address
+        for address in set(instruction_decoder.mc_address_mapping.values())
+        if any(
+            microcode.get(Signal.SEL_IP) == SignalValue.SEL_IP_OP.value
+            for microcode in control_store.microprogram(address)
+        )
+    }
+
+
+def alu_registers(instruction: DecodedInstruction) -> tuple[int, int, int | None]:
+    # трёхрегистровые команды: третий операнд - оставшийся из R1-R3;
+    # у команд с непосредственным операндом второго регистра нет
+    target = instruction.registers[0]
+    if instruction.opcode in IMMEDIATE_ALU:
+        return target, instruction.registers[1], None
+    if instruction.opcode == Opcode.ADD:
+        first, second = [index for index in (1, 2, 3) if index != target]
+    else:
+        first = instruction.registers[1]
+        second = 6 - target - first
+    return target, first, second
+
+
+# сигналы, на которых микропрограмма может остановиться исключением: адрес вне
+# памяти, символ вне диапазона chr(), конец или неверный символ ввода
+FAULT_SIGNALS = {
+    Signal.MEM_READ: None,
+    Signal.MEM_WRITE: None,
+    Signal.OUT_BUF_NEXT: None,
+    Signal.SEL_R_WRITE: SignalValue.SEL_R_WRITE_INP_BUFF.value,
+}
+
+
+def fault_ticks(
+    control_store: ControlStore, instruction_decoder: InstructionDecoder
+) -> dict[int, int]:
+    # такты от выборки до микрокоманды, на которой возникает исключение,
+    # включительно: столько начисляет ControlUnit до сбоя
+    fetch_ticks = len(control_store.microprogram(0))
+    ticks = {}
+    for address in set(instruction_decoder.mc_address_mapping.values()):
+        for offset, microcode in enumerate(control_store.microprogram(address)):
+            if any(
+                signal in microcode
+                and value
+                in (None, getattr(microcode[signal], "value", microcode[signal]))
+                for signal, value in FAULT_SIGNALS.items()
+            ):
+                ticks[address] = fetch_ticks + offset + 1
+                break
+    return ticks
+
+
+class FastEngine:
+    data_path: DataPath = None
+
+    instructions_memory: list[DecodedInstruction] = None
+
+    instruction_pointer: int = None
+
+    registers: list[int16] = None
+
+    zero_flag: bool = None
+
+    operand: int16 = None
+
+    tick: int = None
+
+    # останов на первой границе инструкции, где tick >= tick_limit
+    tick_limit: int | float = None
+
+    fetch_ticks: int = None
+
+    ticks_table: dict[int, int] = None
+
+    fault_ticks_table: dict[int, int] = None
+
+    jump_table: set[int] = None
+
+    mc_addres: int = None
+
+    def __init__(self, data_path: DataPath, instructions: list[Instruction]):
+        instruction_decoder = InstructionDecoder()
+        control_store = ControlStore()
+        self.data_path = data_path
+        self.instructions_memory = [
+            instruction_decoder.predecode(instruction) for instruction in instructions
+        ]
+        self.instruction_pointer = 0
+        self.registers = [int16(0)] * 4
+        self.zero_flag = False
+        self.operand = int16(0)
+        self.tick = 0
+        self.tick_limit = math.inf
+        self.fetch_ticks = len(control_store.microprogram(0))
+        self.ticks_table = instruction_ticks(control_store, instruction_decoder)
+        self.fault_ticks_table = fault_ticks(control_store, instruction_decoder)
+        self.jump_table = jump_addresses(control_store, instruction_decoder)
+        self.mc_addres = 0
+
+        self.dispatch_table = {
+            Opcode.MOV: self.execute_mov,
+            Opcode.LOAD: self.execute_load,
+            Opcode.STORE: self.execute_store,
+            Opcode.ADD: self.execute_alu,
+            Opcode.SUB: self.execute_alu,
+            Opcode.IDIV: self.execute_alu,
+            Opcode.DIV: self.execute_alu,
+            Opcode.MUL: self.execute_alu,
+            Opcode.INC: self.execute_inc,
+            Opcode.DEC: self.execute_dec,
+            Opcode.CMP: self.execute_cmp,
+            Opcode.JMP: self.execute_jump,
+            Opcode.JZ: self.execute_jump,
+            Opcode.JNZ: self.execute_jump,
+            Opcode.OUT: self.execute_out,
+            Opcode.IN: self.execute_in,
+            Opcode.ADDI: self.execute_alu_immediate,
+            Opcode.SUBI: self.execute_alu_immediate,
+            Opcode.IDIVI: self.execute_alu_immediate,
+            Opcode.DIVI: self.execute_alu_immediate,
+            Opcode.MULI: self.execute_alu_immediate,
+            Opcode.JEQ: self.execute_compare_jump,
+            Opcode.JNE: self.execute_compare_jump,
+        }
+
+    # значения регистров и памяти остаются теми же скалярами numpy, что и в DataPath,
+    # и проходят через те же операции, что и в ALU: разрядность результатов совпадает
+    def load_state(self):
+        self.registers[1:] = [self.data_path.r1, self.data_path.r2, self.data_path.r3]
+        self.zero_flag = self.data_path.alu.zero_flag
+
+    def store_state(self):
+        self.data_path.r1, self.data_path.r2, self.data_path.r3 = self.registers[1:]
+        self.data_path.alu.zero_flag = self.zero_flag
+
+    def alu_result(self, opcode: Opcode, first: int16, second: int16) -> int16:
+        match opcode:
+            case Opcode.ADD:
+                result = first + second
+            case Opcode.SUB:
+                result = first - second
+            case Opcode.IDIV:
+                result = first % second
+            case Opcode.DIV:
+                result = first // second
+            case Opcode.MUL:
+                result = first * second
+        self.zero_flag = result == ZERO
+        return result
+
+    def execute_mov(self, instruction: DecodedInstruction):
+        if len(instruction.registers) == 1:
+            self.registers[instruction.registers[0]] = self.operand
+        else:
+            target, source = instruction.registers
+            self.registers[target] = self.registers[source]
+
+    def execute_load(self, instruction: DecodedInstruction):
+        memory = self.data_path.data_memory.memory
+        if len(instruction.registers) == 1:
+            address = self.operand
+        else:
+            address = self.registers[instruction.registers[1]]
+        self.registers[instruction.registers[0]] = memory[address]
+
+    def execute_store(self, instruction: DecodedInstruction):
+        memory = self.data_path.data_memory.memory
+        if len(instruction.registers) == 1:
+            address = self.operand
+        else:
+            address = self.registers[instruction.registers[1]]
+        memory[address] = self.registers[instruction.registers[0]]
+
+    def execute_alu(self, instruction: DecodedInstruction):
+        target, first, second = alu_registers(instruction)
+        self.registers[target] = self.alu_result(
+            instruction.opcode, self.registers[first], self.registers[second]
+        )
+
+    def execute_alu_immediate(self, instruction: DecodedInstruction):
+        target, first, _ = alu_registers(instruction)
+        self.registers[target] = self.alu_result(
+            IMMEDIATE_ALU[instruction.opcode], self.registers[first], self.operand
+        )
+
+    def execute_inc(self, instruction: DecodedInstruction):
+        target = instruction.registers[0]
+        self.registers[target] = self.registers[target] + 1
+        self.zero_flag = self.registers[target] == ZERO
+
+    def execute_dec(self, instruction: DecodedInstruction):
+        target = instruction.registers[0]
+        self.registers[target] = self.registers[target] - 1
+        self.zero_flag = self.registers[target] == ZERO
+
+    def execute_cmp(self, instruction: DecodedInstruction):
+        first = self.registers[instruction.registers[0]]
+        if len(instruction.registers) == 1:
+            second = self.operand
+        else:
+            second = self.registers[instruction.registers[1]]
+        self.zero_flag = first - second == ZERO
+
+    def execute_jump(self, instruction: DecodedInstruction):
+        # переход выполняется, если выбранная декодером микропрограмма грузит IP
+        if self.mc_addres in self.jump_table:
+            self.instruction_pointer = int(self.operand)
+
+    def execute_compare_jump(self, instruction: DecodedInstruction):
+        first, second = instruction.registers
+        self.zero_flag = self.registers[first] - self.registers[second] == ZERO
+        if self.zero_flag == (instruction.opcode == Opcode.JEQ):
+            self.instruction_pointer = int(self.operand)
+
+    def execute_out(self, instruction: DecodedInstruction):
+        self.data_path.output_buffer.append(
+            chr(self.registers[instruction.registers[0]])
+        )
+
+    def execute_in(self, instruction: DecodedInstruction):
+        input_buffer = self.data_path.input_buffer
+        if not input_buffer:
+            raise EOFError()
+        symbol = input_buffer.peek()
+        if isinstance(symbol, str):
+            symbol = int16(ord(symbol))
+        assert -128 <= symbol <= 127, "input token is out of bound: {}".format(symbol)
+        self.registers[instruction.registers[0]] = symbol
+        self.data_path.signal_inp_buf_next()
+
+    def step(self):
+        if self.tick >= self.tick_limit:
+            raise TickLimitError()
+
+        instruction = self.instructions_memory[self.instruction_pointer]
+        if instruction.operand is not None:
+            self.operand = instruction.operand
+
+        if instruction.opcode == Opcode.HALT:
+            self.tick += self.fetch_ticks
+            raise StopIteration()
+
+        self.mc_addres = (
+            instruction.mc_addres_zero if self.zero_flag else instruction.mc_addres
+        )
+        if self.mc_addres is None:
+            self.tick += self.fetch_ticks
+            raise ValueError()
+
+        ip = self.instruction_pointer
+        self.instruction_pointer += 1
+        try:
+            self.dispatch_table[instruction.opcode](instruction)
+        except Exception:
+            # такты до сбойной микрокоманды, как в ControlUnit
+            self.instruction_pointer = ip
+            self.tick += self.fault_ticks_table.get(self.mc_addres, 0)
+            raise
+        self.tick += self.ticks_table[self.mc_addres]
+
+    def control_logic_procced(self):
+        self.load_state()
+        try:
+            while True:
+                self.step()
+        finally:
+            self.store_state()
@@ -8,6 +8,9 @@ import pytest
 
 import machine
 import translator
+from binary_object import is_binary_object
+from control_unit import TraceLevel
+from trace_digest import TraceDigest
 
 
 @pytest.mark.golden_test("golden/*_asm.yml")
@@ -18,23 +21,62 @@ def test_translator_asm_and_machine(golden, caplog):
         source = os.path.join(tmpdirname, "source.asm")
         input_stream = os.path.join(tmpdirname, "input.txt")
         target = os.path.join(tmpdirname, "target.o")
+        optimized = os.path.join(tmpdirname, "optimized.o")
 
         with open(source, "w", encoding="utf-8") as file:
             file.write(golden["in_source"])
         with open(input_stream, "w", encoding="utf-8") as file:
             file.write(golden["in_stdin"])
 
+        # in_log_digest - интервал контрольных точек: журнал не собирается
+        # целиком, а сверяется по дайджесту на всей длине прогона
+        interval = golden.get("in_log_digest")
+        trace_digest = TraceDigest(interval) if interval else None
         with contextlib.redirect_stdout(io.StringIO()) as stdout:
             translator.main(source, target)
-            machine.main(target, input_stream)
+            if trace_digest is None:
+                machine.main(target, input_stream)
+            else:
+                machine.main(
+                    target,
+                    input_stream,
+                    trace_level=TraceLevel.OFF.value,
+                    trace_digest=trace_digest,
+                )
+
+        # peephole и глобальная оптимизация не должны менять вывод программы
+        with contextlib.redirect_stdout(io.StringIO()) as optimized_stdout:
+            translator.main(source, optimized, optimize=True, global_optimize=True)
+            machine.main(optimized, input_stream, "fast", TraceLevel.OFF.value)
 
         with open(target, encoding="utf-8") as file:
             code = file.read()
 
         assert code == golden.out["out_code"]
         assert stdout.getvalue() == golden.out["out_stdout"]
-        if len(caplog.text) >= 124000:
+        assert optimized_stdout.getvalue() == stdout.getvalue()
+        if trace_digest is not None:
+            expected = golden.out["out_log_digest"]
+            assert trace_digest.as_dict() == expected, trace_digest.divergence(expected)
+        elif len(caplog.text) >= 124000:
             lines = caplog.text.splitlines()[:1000]
             assert "\n".join(lines) == golden.out["out_log"]
         else:
             assert caplog.text == golden.out["out_log"]
+
+
+@pytest.mark.golden_test("golden/*_asm.yml")
+def test_binary_object_runs_like_json(golden, tmp_path):
+    # двоичный объектный файл декодируется из машинных слов, вывод тот же
+    source = tmp_path / "source.asm"
+    input_stream = tmp_path / "input.txt"
+    target = tmp_path / "target.bin"
+    source.write_text(golden["in_source"], encoding="utf-8")
+    input_stream.write_text(golden["in_stdin"], encoding="utf-8")
+
+    translator.main(str(source), str(target), binary=True)
+    assert is_binary_object(str(target))
+    for engine in ("microcode", "fast"):
+        with contextlib.redirect_stdout(io.StringIO()) as stdout:
+            machine.main(str(target), str(input_stream), engine, TraceLevel.OFF.value)
+        assert stdout.getvalue() == golden.out["out_stdout"], engine
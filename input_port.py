@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+from itertools import islice
+from typing import TextIO
+
+ASCII_END_OF_LINE_CODE = 10
+
+CHUNK_SIZE = 1 << 16
+
+Token = str | int
+
+
+def read_chunks(file: TextIO, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    while chunk := file.read(chunk_size):
+        yield from chunk
+
+
+def strip_stream(chars: Iterable[str]) -> Iterator[str]:
+    # то же, что str.strip(): пробельные символы задерживаются, пока не станет
+    # ясно, что за ними идёт непробельный символ, а не конец ввода
+    pending = []
+    started = False
+    for char in chars:
+        if char.isspace():
+            if started:
+                pending.append(char)
+            continue
+        if pending:
+            yield from pending
+            pending.clear()
+        started = True
+        yield char
+
+
+def replace_escapes(chars: Iterable[str]) -> Iterator[Token]:
+    backslash = False
+    for char in chars:
+        if backslash:
+            backslash = False
+            if char == "n":
+                yield ASCII_END_OF_LINE_CODE
+                continue
+            yield "\\"
+        if char == "\\":
+            backslash = True
+        else:
+            yield char
+    if backslash:
+        yield "\\"
+
+
+def read_input(file: TextIO, chunk_size: int = CHUNK_SIZE) -> Iterator[Token]:
+    return replace_escapes(strip_stream(read_chunks(file, chunk_size)))
+
+
+class InputPort:
+    tokens: Iterator[Token] = None
+
+    # следующий символ ввода, None - ввод исчерпан
+    head: Token | None = None
+
+    # число уже прочитанных символов
+    position: int = None
+
+    def __init__(self, tokens: Iterable[Token], position: int = 0):
+        self.tokens = iter(tokens)
+        # восстановление со снимка: прочитанное до него пропускается
+        if position:
+            self.tokens = islice(self.tokens, position, None)
+        self.position = position
+        self.head = next(self.tokens, None)
+
+    def __bool__(self) -> bool:
+        return self.head is not None
+
+    def peek(self) -> Token:
+        return self.head
+
+    def advance(self):
+        self.head = next(self.tokens, None)
+        self.position += 1
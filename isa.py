@@ -19,9 +19,89 @@ class Opcode(Enum):
     HALT = "HALT"
     OUT = "OUT"
     IN = "IN"
+    ADDI = "ADDI"
+    SUBI = "SUBI"
+    IDIVI = "IDIVI"
+    DIVI = "DIVI"
+    MULI = "MULI"
+    JEQ = "JEQ"
+    JNE = "JNE"
+
+
+# команды АЛУ с непосредственным вторым операндом и их операции над регистрами
+IMMEDIATE_ALU = {
+    Opcode.ADDI: Opcode.ADD,
+    Opcode.SUBI: Opcode.SUB,
+    Opcode.IDIVI: Opcode.IDIV,
+    Opcode.DIVI: Opcode.DIV,
+    Opcode.MULI: Opcode.MUL,
+}
+
+# сравнение двух регистров с переходом: JEQ - при равенстве, JNE - при неравенстве
+COMPARE_JUMPS = frozenset((Opcode.JEQ, Opcode.JNE))
 
 
 class ArgType(Enum):
     REG = "reg"
     NUMBER = "number"
     INDIRECT_ADDRESS = "indirect_address"
+
+
+# Машинное слово инструкции (32 бита):
+# [31:27] опкод, [26:21] типы трёх аргументов по 2 бита,
+# [20:15] номера их регистров по 2 бита, [14:0] непосредственный операнд
+OPCODE_SHIFT = 27
+ARG_TYPE_SHIFTS = (25, 23, 21)
+REGISTER_SHIFTS = (19, 17, 15)
+ARG_TYPE_MASK = 0x3
+REGISTER_MASK = 0x3
+IMMEDIATE_MASK = 0x7FFF
+
+OPCODES = list(Opcode)
+# 0 - аргумента нет
+ARG_TYPES = [None, ArgType.REG, ArgType.NUMBER, ArgType.INDIRECT_ADDRESS]
+
+
+def encode_instruction(instruction: dict) -> int:
+    if instruction["opcode"] not in Opcode.__members__ or len(instruction["args"]) > 3:
+        raise ValueError()
+
+    word = OPCODES.index(Opcode[instruction["opcode"]]) << OPCODE_SHIFT
+    has_immediate = False
+    for position, arg in enumerate(instruction["args"]):
+        ((kind, value),) = arg.items()
+        arg_type = ArgType(kind)
+        word |= ARG_TYPES.index(arg_type) << ARG_TYPE_SHIFTS[position]
+        if arg_type == ArgType.NUMBER:
+            # слово хранит одно число, и оно должно читаться обратно той же строкой
+            if has_immediate or not value.isdigit() or int(value) > IMMEDIATE_MASK:
+                raise ValueError()
+            if str(int(value)) != value:
+                raise ValueError()
+            word |= int(value)
+            has_immediate = True
+        else:
+            register = value[1:]
+            if not register.isdigit() or f"R{int(register)}" != value:
+                raise ValueError()
+            if int(register) > REGISTER_MASK:
+                raise ValueError()
+            word |= int(register) << REGISTER_SHIFTS[position]
+    return word
+
+
+def decode_instruction(word: int) -> tuple[Opcode | None, list[tuple[ArgType, int]]]:
+    # поля слова как числа: номер регистра или непосредственный операнд;
+    # None - номер опкода вне системы команд
+    index = word >> OPCODE_SHIFT
+    opcode = OPCODES[index] if index < len(OPCODES) else None
+    args = []
+    for type_shift, register_shift in zip(ARG_TYPE_SHIFTS, REGISTER_SHIFTS):
+        arg_type = ARG_TYPES[(word >> type_shift) & ARG_TYPE_MASK]
+        if arg_type is None:
+            break
+        if arg_type == ArgType.NUMBER:
+            args.append((arg_type, word & IMMEDIATE_MASK))
+        else:
+            args.append((arg_type, (word >> register_shift) & REGISTER_MASK))
+    return opcode, args
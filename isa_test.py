@@ -0,0 +1,52 @@
+import pytest
+
+from isa import ArgType, Opcode, decode_instruction, encode_instruction
+
+
+def instruction(opcode, *args):
+    return {"opcode": opcode, "args": [dict([arg]) for arg in args]}
+
+
+@pytest.mark.parametrize(
+    ("source", "expected"),
+    [
+        (instruction("HALT"), (Opcode.HALT, [])),
+        (
+            instruction("MOV", ("reg", "R1"), ("number", "32767")),
+            (Opcode.MOV, [(ArgType.REG, 1), (ArgType.NUMBER, 32767)]),
+        ),
+        (
+            instruction("STORE", ("reg", "R3"), ("indirect_address", "R2")),
+            (Opcode.STORE, [(ArgType.REG, 3), (ArgType.INDIRECT_ADDRESS, 2)]),
+        ),
+        (
+            instruction("JEQ", ("reg", "R1"), ("reg", "R2"), ("number", "0")),
+            (Opcode.JEQ, [(ArgType.REG, 1), (ArgType.REG, 2), (ArgType.NUMBER, 0)]),
+        ),
+    ],
+)
+def test_word_round_trip(source, expected):
+    assert decode_instruction(encode_instruction(source)) == expected
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        instruction("MOV", ("reg", "R1"), ("number", "-1")),
+        instruction("MOV", ("reg", "R1"), ("number", "32768")),
+        instruction("MOV", ("reg", "R1"), ("number", "070")),
+        instruction("JEQ", ("reg", "R1"), ("number", "1"), ("number", "2")),
+        instruction("MOV", ("reg", "R4"), ("number", "1")),
+        instruction("MOV", ("reg", "R01"), ("number", "1")),
+        instruction("FOO", ("reg", "R1")),
+    ],
+)
+def test_unencodable_instruction(source):
+    # isa сообщает о неверной инструкции ValueError без текста
+    with pytest.raises(ValueError, match=r"^$"):
+        encode_instruction(source)
+
+
+def test_unknown_opcode_number():
+    # 5 бит опкода, команд меньше 32: лишние номера декодируются в None
+    assert decode_instruction(31 << 27) == (None, [])
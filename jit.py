@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from types import CodeType
+
+from numpy import int16
+
+from data_path import ZERO, DataPath
+from fast_engine import FastEngine, alu_registers
+from isa import COMPARE_JUMPS, IMMEDIATE_ALU, Opcode
+from microcode import DecodedInstruction, Instruction
+
+JUMP_OPCODES = (Opcode.JMP, Opcode.JZ, Opcode.JNZ, *COMPARE_JUMPS)
+
+ALU_OPERATORS = {
+    Opcode.ADD: "+",
+    Opcode.SUB: "-",
+    Opcode.IDIV: "%",
+    Opcode.DIV: "//",
+    Opcode.MUL: "*",
+}
+
+Block = Callable[..., tuple]
+
+
+class JitFaultError(Exception):
+    pass
+
+
+class JitEngine(FastEngine):
+    leaders: set[int] = None
+
+    code_cache: dict[int, CodeType] = None
+
+    blocks: dict[int, Block] = None
+
+    # такт начала последней инструкции блока относительно входа в блок
+    block_spans: dict[int, int] = None
+
+    namespace: dict = None
+
+    def __init__(self, data_path: DataPath, instructions: list[Instruction]):
+        super().__init__(data_path, instructions)
+        self.leaders = {0}
+        for address, instruction in enumerate(self.instructions_memory):
+            if instruction.opcode in JUMP_OPCODES:
+                self.leaders.add(address + 1)
+                if instruction.operand is not None:
+                    self.leaders.add(int(instruction.operand))
+        self.code_cache = {}
+        self.blocks = {}
+        self.block_spans = {}
+        self.namespace = {
+            "int16": int16,
+            "ZERO": ZERO,
+            "memory": data_path.data_memory.memory,
+            "input_buffer": data_path.input_buffer,
+            "inp_next": data_path.signal_inp_buf_next,
+            "output_append": data_path.output_buffer.append,
+            "spill": self.spill,
+            "JitFaultError": JitFaultError,
+        }
+
+    def compilable(self, address: int) -> bool:
+        if address >= len(self.instructions_memory):
+            return False
+        instruction = self.instructions_memory[address]
+        return (
+            instruction.opcode != Opcode.HALT
+            and instruction.mc_addres is not None
+            and instruction.mc_addres_zero is not None
+        )
+
+    def compile_instruction(
+        self, name: str, instruction: DecodedInstruction
+    ) -> list[str]:
+        registers = [f"r{index}" for index in instruction.registers]
+        lines = []
+        if instruction.operand is not None:
+            self.namespace[name] = instruction.operand
+            lines.append(f"operand = {name}")
+
+        match instruction.opcode:
+            case Opcode.MOV if len(registers) == 1:
+                lines.append(f"{registers[0]} = operand")
+            case Opcode.MOV:
+                lines.append(f"{registers[0]} = {registers[1]}")
+            case Opcode.LOAD if len(registers) == 1:
+                lines.append(f"{registers[0]} = memory[operand]")
+            case Opcode.LOAD:
+                lines.append(f"{registers[0]} = memory[{registers[1]}]")
+            case Opcode.STORE if len(registers) == 1:
+                lines.append(f"memory[operand] = {registers[0]}")
+            case Opcode.STORE:
+                lines.append(f"memory[{registers[1]}] = {registers[0]}")
+            case Opcode.ADD | Opcode.SUB | Opcode.IDIV | Opcode.DIV | Opcode.MUL:
+                target, first, second = alu_registers(instruction)
+                operator = ALU_OPERATORS[instruction.opcode]
+                lines.append(f"r{target} = r{first} {operator} r{second}")
+                lines.append(f"z = r{target} == ZERO")
+            case opcode if opcode in IMMEDIATE_ALU:
+                target, first, _ = alu_registers(instruction)
+                operator = ALU_OPERATORS[IMMEDIATE_ALU[opcode]]
+                lines.append(f"r{target} = r{first} {operator} operand")
+                lines.append(f"z = r{target} == ZERO")
+            case Opcode.INC:
+                lines.append(f"{registers[0]} = {registers[0]} + 1")
+                lines.append(f"z = {registers[0]} == ZERO")
+            case Opcode.DEC:
+                lines.append(f"{registers[0]} = {registers[0]} - 1")
+                lines.append(f"z = {registers[0]} == ZERO")
+            case Opcode.CMP if len(registers) == 1:
+                lines.append(f"z = {registers[0]} - operand == ZERO")
+            case Opcode.CMP | Opcode.JEQ | Opcode.JNE:
+                lines.append(f"z = {registers[0]} - {registers[1]} == ZERO")
+            case Opcode.OUT:
+                lines.append(f"output_append(chr({registers[0]}))")
+            case Opcode.IN:
+                lines.append("if not input_buffer:")
+                lines.append("    raise EOFError()")
+                lines.append("symbol = input_buffer.peek()")
+                lines.append("if isinstance(symbol, str):")
+                lines.append("    symbol = int16(ord(symbol))")
+                lines.append("assert -128 <= symbol <= 127")
+                lines.append(f"{registers[0]} = symbol")
+                lines.append("inp_next()")
+        return lines
+
+    def compile_jump(
+        self, address: int, instruction: DecodedInstruction, ticks: int
+    ) -> list[str]:
+        if instruction.operand is not None:
+            taken = str(int(instruction.operand))
+        else:
+            taken = "int(operand)"
+        exits = []
+        for zero_flag, mc_addres in enumerate(
+            (instruction.mc_addres, instruction.mc_addres_zero)
+        ):
+            if instruction.opcode in COMPARE_JUMPS:
+                # флаг только что выставлен самой командой
+                jumps = zero_flag == (instruction.opcode == Opcode.JEQ)
+            else:
+                jumps = mc_addres in self.jump_table
+            target = taken if jumps else str(address + 1)
+            exits.append((target, ticks + self.ticks_table[mc_addres]))
+
+        state = "r1, r2, r3, z, operand"
+        clear, zero = exits
+        if clear == zero:
+            return [f"return {clear[0]}, {state}, tick + {clear[1]}"]
+        return [
+            "if z:",
+            f"    return {zero[0]}, {state}, tick + {zero[1]}",
+            f"return {clear[0]}, {state}, tick + {clear[1]}",
+        ]
+
+    def compile_block(self, start: int) -> Block | None:
+        if not self.compilable(start):
+            return None
+
+        body = []
+        addresses = []
+        ticks_before = []
+        address = start
+        ticks = 0
+        while True:
+            if address != start and (
+                address in self.leaders or not self.compilable(address)
+            ):
+                body.append(f"return {address}, r1, r2, r3, z, operand, tick + {ticks}")
+                break
+
+            instruction = self.instructions_memory[address]
+            body.append(f"at = {len(addresses)}")
+            addresses.append(address)
+            ticks_before.append(ticks)
+            body.extend(
+                self.compile_instruction(f"operand_{start}_{address}", instruction)
+            )
+            if instruction.opcode in JUMP_OPCODES:
+                body.extend(self.compile_jump(address, instruction, ticks))
+                break
+
+            ticks += self.ticks_table[instruction.mc_addres]
+            address += 1
+
+        self.namespace[f"addresses_{start}"] = tuple(addresses)
+        self.namespace[f"ticks_{start}"] = tuple(ticks_before)
+        source = "\n".join(
+            [
+                f"def block_{start}(r1, r2, r3, z, operand, tick):",
+                "    try:",
+                *("        " + line for line in body),
+                "    except Exception:",
+                f"        spill(addresses_{start}[at], r1, r2, r3, z, operand,"
+                f" tick + ticks_{start}[at])",
+                "        raise JitFaultError() from None",
+            ]
+        )
+        self.code_cache[start] = compile(source, f"<block {start}>", "exec")
+        exec(self.code_cache[start], self.namespace)
+        self.blocks[start] = self.namespace[f"block_{start}"]
+        self.block_spans[start] = ticks_before[-1]
+        return self.blocks[start]
+
+    def spill(self, address, r1, r2, r3, zero_flag, operand, tick):
+        self.instruction_pointer = address
+        self.registers[1:] = [r1, r2, r3]
+        self.zero_flag = zero_flag
+        self.operand = operand
+        self.tick = tick
+
+    def run_blocks(self):
+        blocks = self.blocks
+        block_spans = self.block_spans
+        tick_limit = self.tick_limit
+        address = self.instruction_pointer
+        r1, r2, r3 = self.registers[1:]
+        z, operand, tick = self.zero_flag, self.operand, self.tick
+        try:
+            while True:
+                block = blocks.get(address)
+                if block is None:
+                    block = self.compile_block(address)
+                    if block is None:
+                        break
+                # блок, внутри которого наступит tick_limit, исполняет step()
+                if tick + block_spans[address] >= tick_limit:
+                    break
+                address, r1, r2, r3, z, operand, tick = block(
+                    r1, r2, r3, z, operand, tick
+                )
+        except JitFaultError:
+            # состояние сохранено на границе сбойной инструкции, её повторит
+            # step(): он и начислит такты микропрограммы до сбоя (fault_ticks)
+            return
+        self.spill(address, r1, r2, r3, z, operand, tick)
+
+    def control_logic_procced(self):
+        self.load_state()
+        try:
+            while True:
+                self.run_blocks()
+                self.step()
+        finally:
+            self.store_state()
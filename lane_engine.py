@@ -0,0 +1,414 @@
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import operator
+from collections.abc import Callable, Iterable
+from typing import NamedTuple
+
+import numpy as np
+from numpy import int16
+
+from binary_object import load_program
+from data_path import DataPath
+from fast_engine import alu_registers, fault_ticks, instruction_ticks, jump_addresses
+from input_port import InputPort, Token, read_input
+from isa import IMMEDIATE_ALU, Opcode
+from microcode import (
+    ControlStore,
+    DecodedInstruction,
+    Instruction,
+    InstructionDecoder,
+)
+
+ALU_OPERATIONS: dict[Opcode, Callable] = {
+    Opcode.ADD: operator.add,
+    Opcode.SUB: operator.sub,
+    Opcode.IDIV: operator.mod,
+    Opcode.DIV: operator.floordiv,
+    Opcode.MUL: operator.mul,
+}
+
+
+class LaneResult(NamedTuple):
+    output: str
+    tick: int
+    halt: str
+    error: str | None
+
+
+def operate(
+    operation: Callable,
+    first: np.ndarray,
+    first_wide: np.ndarray,
+    second: np.ndarray,
+    second_wide: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    # Как у скаляров numpy в ControlUnit: int16 с int16 дают int16 с 16-битным
+    # переполнением, если хотя бы один операнд уже расширен до int64 - результат int64.
+    with np.errstate(all="ignore"):
+        narrow = operation(first.astype(np.int16), second.astype(np.int16))
+        wide = operation(first, second)
+    result_wide = first_wide | second_wide
+    return np.where(result_wide, wide, narrow), result_wide
+
+
+class LaneEngine:
+    instructions_memory: list[DecodedInstruction] = None
+
+    lanes: int = None
+
+    # регистры R0-R3 по дорожкам; wide - значение расширено до int64
+    registers: np.ndarray = None
+    registers_wide: np.ndarray = None
+
+    memory: np.ndarray = None
+    memory_wide: np.ndarray = None
+
+    instruction_pointer: np.ndarray = None
+
+    zero_flag: np.ndarray = None
+
+    operand: np.ndarray = None
+
+    tick: np.ndarray = None
+
+    tick_limit: int | float = None
+
+    running: np.ndarray = None
+
+    halt: list[str | None] = None
+
+    errors: list[str | None] = None
+
+    inputs: list[InputPort] = None
+
+    outputs: list[list[str]] = None
+
+    fetch_ticks: int = None
+
+    ticks_table: dict[int, int] = None
+
+    fault_ticks_table: dict[int, int] = None
+
+    jump_table: set[int] = None
+
+    def __init__(
+        self,
+        instructions: list[Instruction],
+        data: list[int],
+        inputs: list[Iterable[Token]],
+    ):
+        instruction_decoder = InstructionDecoder()
+        control_store = ControlStore()
+        self.instructions_memory = [
+            instruction_decoder.predecode(instruction) for instruction in instructions
+        ]
+        self.lanes = len(inputs)
+
+        self.registers = np.zeros((4, self.lanes), dtype=np.int64)
+        self.registers_wide = np.zeros((4, self.lanes), dtype=bool)
+        # та же начальная память, что у DataPath
+        initial = DataPath(data, ()).data_memory.memory
+        self.memory = np.tile(
+            np.frombuffer(initial.values, dtype=np.int64), (self.lanes, 1)
+        )
+        self.memory_wide = np.zeros(self.memory.shape, dtype=bool)
+
+        self.instruction_pointer = np.zeros(self.lanes, dtype=np.int64)
+        self.zero_flag = np.zeros(self.lanes, dtype=bool)
+        self.operand = np.zeros(self.lanes, dtype=np.int64)
+        self.tick = np.zeros(self.lanes, dtype=np.int64)
+        self.tick_limit = math.inf
+        self.running = np.ones(self.lanes, dtype=bool)
+        self.halt = [None] * self.lanes
+        self.errors = [None] * self.lanes
+        self.inputs = [InputPort(tokens) for tokens in inputs]
+        self.outputs = [[] for _ in range(self.lanes)]
+
+        self.fetch_ticks = len(control_store.microprogram(0))
+        self.ticks_table = instruction_ticks(control_store, instruction_decoder)
+        self.fault_ticks_table = fault_ticks(control_store, instruction_decoder)
+        self.jump_table = jump_addresses(control_store, instruction_decoder)
+
+        self.dispatch_table = {
+            Opcode.MOV: self.execute_mov,
+            Opcode.LOAD: self.execute_load,
+            Opcode.STORE: self.execute_store,
+            Opcode.ADD: self.execute_alu,
+            Opcode.SUB: self.execute_alu,
+            Opcode.IDIV: self.execute_alu,
+            Opcode.DIV: self.execute_alu,
+            Opcode.MUL: self.execute_alu,
+            Opcode.INC: self.execute_inc,
+            Opcode.DEC: self.execute_dec,
+            Opcode.CMP: self.execute_cmp,
+            Opcode.JMP: self.execute_jump,
+            Opcode.JZ: self.execute_jump,
+            Opcode.JNZ: self.execute_jump,
+            Opcode.OUT: self.execute_out,
+            Opcode.IN: self.execute_in,
+            Opcode.ADDI: self.execute_alu_immediate,
+            Opcode.SUBI: self.execute_alu_immediate,
+            Opcode.IDIVI: self.execute_alu_immediate,
+            Opcode.DIVI: self.execute_alu_immediate,
+            Opcode.MULI: self.execute_alu_immediate,
+            Opcode.JEQ: self.execute_compare_jump,
+            Opcode.JNE: self.execute_compare_jump,
+        }
+
+    def stop(self, lanes: np.ndarray, halt: str, error: str | None = None):
+        self.running[lanes] = False
+        for lane in lanes.tolist():
+            self.halt[lane] = halt
+            self.errors[lane] = error
+
+    def address(
+        self, instruction: DecodedInstruction, lanes: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        if len(instruction.registers) == 1:
+            address = self.operand[lanes]
+        else:
+            address = self.registers[instruction.registers[1], lanes]
+        # индексация как у списка: отрицательный адрес считается с конца
+        size = self.memory.shape[1]
+        valid = (address >= -size) & (address < size)
+        if not valid.all():
+            self.stop(lanes[~valid], "ERROR", IndexError.__name__)
+        return address % size, valid
+
+    def execute_mov(self, instruction, lanes, zero):
+        target = instruction.registers[0]
+        if len(instruction.registers) == 1:
+            self.registers[target, lanes] = self.operand[lanes]
+            self.registers_wide[target, lanes] = False
+        else:
+            source = instruction.registers[1]
+            self.registers[target, lanes] = self.registers[source, lanes]
+            self.registers_wide[target, lanes] = self.registers_wide[source, lanes]
+
+    def execute_load(self, instruction, lanes, zero):
+        address, valid = self.address(instruction, lanes)
+        lanes, address = lanes[valid], address[valid]
+        target = instruction.registers[0]
+        self.registers[target, lanes] = self.memory[lanes, address]
+        self.registers_wide[target, lanes] = self.memory_wide[lanes, address]
+        return valid
+
+    def execute_store(self, instruction, lanes, zero):
+        address, valid = self.address(instruction, lanes)
+        lanes, address = lanes[valid], address[valid]
+        source = instruction.registers[0]
+        self.memory[lanes, address] = self.registers[source, lanes]
+        self.memory_wide[lanes, address] = self.registers_wide[source, lanes]
+        return valid
+
+    def execute_alu(self, instruction, lanes, zero):
+        target, first, second = alu_registers(instruction)
+        result, wide = operate(
+            ALU_OPERATIONS[instruction.opcode],
+            self.registers[first, lanes],
+            self.registers_wide[first, lanes],
+            self.registers[second, lanes],
+            self.registers_wide[second, lanes],
+        )
+        self.registers[target, lanes] = result
+        self.registers_wide[target, lanes] = wide
+        self.zero_flag[lanes] = result == 0
+
+    def execute_alu_immediate(self, instruction, lanes, zero):
+        target, first, _ = alu_registers(instruction)
+        result, wide = operate(
+            ALU_OPERATIONS[IMMEDIATE_ALU[instruction.opcode]],
+            self.registers[first, lanes],
+            self.registers_wide[first, lanes],
+            self.operand[lanes],
+            np.zeros(len(lanes), dtype=bool),
+        )
+        self.registers[target, lanes] = result
+        self.registers_wide[target, lanes] = wide
+        self.zero_flag[lanes] = result == 0
+
+    def execute_inc(self, instruction, lanes, zero):
+        # int16 + 1 в ControlUnit всегда даёт int64
+        target = instruction.registers[0]
+        self.registers[target, lanes] += 1
+        self.registers_wide[target, lanes] = True
+        self.zero_flag[lanes] = self.registers[target, lanes] == 0
+
+    def execute_dec(self, instruction, lanes, zero):
+        target = instruction.registers[0]
+        self.registers[target, lanes] -= 1
+        self.registers_wide[target, lanes] = True
+        self.zero_flag[lanes] = self.registers[target, lanes] == 0
+
+    def execute_cmp(self, instruction, lanes, zero):
+        first = instruction.registers[0]
+        if len(instruction.registers) == 1:
+            second = self.operand[lanes]
+            second_wide = np.zeros(len(lanes), dtype=bool)
+        else:
+            second = self.registers[instruction.registers[1], lanes]
+            second_wide = self.registers_wide[instruction.registers[1], lanes]
+        difference, _ = operate(
+            operator.sub,
+            self.registers[first, lanes],
+            self.registers_wide[first, lanes],
+            second,
+            second_wide,
+        )
+        self.zero_flag[lanes] = difference == 0
+
+    def execute_jump(self, instruction, lanes, zero):
+        taken = np.where(
+            zero,
+            instruction.mc_addres_zero in self.jump_table,
+            instruction.mc_addres in self.jump_table,
+        )
+        self.instruction_pointer[lanes[taken]] = self.operand[lanes[taken]]
+
+    def execute_compare_jump(self, instruction, lanes, zero):
+        self.execute_cmp(instruction, lanes, zero)
+        taken = self.zero_flag[lanes] == (instruction.opcode == Opcode.JEQ)
+        self.instruction_pointer[lanes[taken]] = self.operand[lanes[taken]]
+
+    def execute_out(self, instruction, lanes, zero):
+        source = instruction.registers[0]
+        valid = np.ones(len(lanes), dtype=bool)
+        for index, lane in enumerate(lanes.tolist()):
+            try:
+                self.outputs[lane].append(chr(self.registers[source, lane]))
+            except (ValueError, OverflowError) as error:
+                valid[index] = False
+                self.stop(np.array([lane]), "ERROR", type(error).__name__)
+        return valid
+
+    def execute_in(self, instruction, lanes, zero):
+        target = instruction.registers[0]
+        valid = np.ones(len(lanes), dtype=bool)
+        for index, lane in enumerate(lanes.tolist()):
+            input_port = self.inputs[lane]
+            if not input_port:
+                valid[index] = False
+                self.stop(np.array([lane]), "EOF")
+                continue
+            symbol = input_port.peek()
+            if isinstance(symbol, str):
+                symbol = int16(ord(symbol))
+            if not -128 <= symbol <= 127:
+                valid[index] = False
+                self.stop(np.array([lane]), "ERROR", AssertionError.__name__)
+                continue
+            self.registers[target, lane] = symbol
+            # символ, заменённый при разборе escape-последовательности, - int Python
+            self.registers_wide[target, lane] = not isinstance(symbol, int16)
+            input_port.advance()
+        return valid
+
+    def execute(self, address: int, lanes: np.ndarray):
+        if (
+            not -len(self.instructions_memory)
+            <= address
+            < len(self.instructions_memory)
+        ):
+            self.stop(lanes, "ERROR", IndexError.__name__)
+            return
+
+        instruction = self.instructions_memory[address]
+        if instruction.operand is not None:
+            self.operand[lanes] = instruction.operand
+
+        if instruction.opcode == Opcode.HALT:
+            self.tick[lanes] += self.fetch_ticks
+            self.stop(lanes, "HALT")
+            return
+
+        zero = self.zero_flag[lanes]
+        invalid = np.zeros(len(lanes), dtype=bool)
+        if instruction.mc_addres is None:
+            invalid |= ~zero
+        if instruction.mc_addres_zero is None:
+            invalid |= zero
+        if invalid.any():
+            self.tick[lanes[invalid]] += self.fetch_ticks
+            self.stop(lanes[invalid], "ERROR", ValueError.__name__)
+            lanes, zero = lanes[~invalid], zero[~invalid]
+            if len(lanes) == 0:
+                return
+
+        ticks = np.where(
+            zero,
+            self.ticks_table.get(instruction.mc_addres_zero, 0),
+            self.ticks_table.get(instruction.mc_addres, 0),
+        )
+        self.instruction_pointer[lanes] = address + 1
+        valid = self.dispatch_table[instruction.opcode](instruction, lanes, zero)
+        if valid is not None:
+            # дорожки со сбоем остаются на сбойной инструкции, такты начисляются
+            # до сбойной микрокоманды, как в ControlUnit
+            self.instruction_pointer[lanes[~valid]] = address
+            ticks[~valid] = np.where(
+                zero[~valid],
+                self.fault_ticks_table.get(instruction.mc_addres_zero, 0),
+                self.fault_ticks_table.get(instruction.mc_addres, 0),
+            )
+        self.tick[lanes] += ticks
+
+    def run(self) -> list[LaneResult]:
+        while True:
+            limited = np.flatnonzero(self.running & (self.tick >= self.tick_limit))
+            if len(limited):
+                self.stop(limited, "LIMIT")
+
+            active = np.flatnonzero(self.running)
+            if len(active) == 0:
+                break
+            # дорожки с одинаковым IP исполняют инструкцию одним векторным шагом
+            addresses = self.instruction_pointer[active]
+            for address in np.unique(addresses).tolist():
+                self.execute(address, active[addresses == address])
+
+        return [
+            LaneResult("".join(output), int(tick), halt, error)
+            for output, tick, halt, error in zip(
+                self.outputs, self.tick, self.halt, self.errors
+            )
+        ]
+
+
+def main(object_file, input_files, tick_limit=None):
+    program = load_program(object_file)
+    files = [open(input_file) for input_file in input_files]
+    try:
+        engine = LaneEngine(
+            program.get("text", []),
+            program.get("data", []),
+            [read_input(file) for file in files],
+        )
+        if tick_limit is not None:
+            engine.tick_limit = tick_limit
+        results = engine.run()
+    finally:
+        for file in files:
+            file.close()
+
+    for input_file, result in zip(input_files, results):
+        line = {
+            "input": input_file,
+            "stdout": result.output,
+            "tick": result.tick,
+            "halt": result.halt,
+        }
+        if result.error is not None:
+            line["error"] = result.error
+        print(json.dumps(line, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="lane_engine.py")
+    parser.add_argument("object_file")
+    parser.add_argument("input_files", nargs="+")
+    parser.add_argument("--tick-limit", type=int, default=None)
+    args = parser.parse_args()
+    main(args.object_file, args.input_files, args.tick_limit)
@@ -0,0 +1,68 @@
+from pathlib import Path
+
+import pytest
+
+from batch import execute_job
+from engines_test import FAULTING_PROGRAMS, run_until_fault
+from input_port import read_input
+from lane_engine import LaneEngine
+from translator import parse_asm, translate_to_json
+
+PROGRAMS = Path(__file__).parent / "asm_programs"
+
+# пустой ввод - EOF, символ вне диапазона int8 - сбой IN
+INPUTS = ["Alice\\n", "", "Bob", "Maximilian Alexander\\n", "Zoë\\n", "x\\nrest"]
+
+
+@pytest.mark.parametrize("name", ["hello_user_name", "cat"])
+def test_lanes_match_microcode(tmp_path, name):
+    source = (PROGRAMS / f"{name}.asm").read_text(encoding="utf-8")
+    object_file = tmp_path / f"{name}.json"
+    object_file.write_text(translate_to_json(source))
+    input_files = []
+    for index, text in enumerate(INPUTS):
+        input_file = tmp_path / f"input{index}.txt"
+        input_file.write_text(text, encoding="utf-8")
+        input_files.append(input_file)
+
+    program = parse_asm(source)
+    files = [open(input_file, encoding="utf-8") for input_file in input_files]
+    try:
+        engine = LaneEngine(
+            program["text"], program["data"], [read_input(file) for file in files]
+        )
+        results = engine.run()
+    finally:
+        for file in files:
+            file.close()
+
+    for input_file, result in zip(input_files, results):
+        expected = execute_job(
+            {"object": str(object_file), "input": str(input_file)}, "microcode"
+        )
+        assert result.output == expected["stdout"]
+        assert result.tick == expected["tick"]
+        assert result.halt == expected["halt"]
+        if expected["error"] is not None:
+            assert expected["error"].startswith(f"{result.error}(")
+
+
+@pytest.mark.parametrize("name", FAULTING_PROGRAMS)
+def test_fault_tick_matches_microcode(name):
+    instructions = FAULTING_PROGRAMS[name]
+    error, tick = run_until_fault("microcode", instructions)
+    [result] = LaneEngine(instructions, [], [[]]).run()
+    assert result.tick == tick
+    if error == "EOFError":
+        assert result.halt == "EOF"
+    else:
+        assert (result.halt, result.error) == ("ERROR", error)
+
+
+def test_unknown_opcode_fails_at_decode():
+    instructions = [
+        {"opcode": "INC", "args": [{"reg": "R1"}]},
+        {"opcode": "FOO", "args": [{"reg": "R1"}]},
+    ]
+    [result] = LaneEngine(instructions, [], [[]]).run()
+    assert (result.tick, result.halt, result.error) == (6, "ERROR", "ValueError")
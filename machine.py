@@ -1,13 +1,33 @@
 from __future__ import annotations
 
+import argparse
 import json
 import logging
+import math
 import sys
 
-from control_unit import ControlUnit
+from binary_object import load_program
+from binary_trace import TraceWriter
+from control_unit import ControlUnit, TickLimitError, TraceLevel
 from data_path import DataPath
-
-ASCII_END_OF_LINE_CODE = 10
+from fast_engine import FastEngine
+from input_port import read_input, replace_escapes
+from jit import JitEngine
+from mc_compiler import CompiledControlUnit
+from mc_optimizer import MergedControlUnit
+from output_port import FLUSH_THRESHOLD, FileSink, StdoutSink
+from pipeline import PipelinedControlUnit
+from snapshot import Snapshot
+from trace_digest import DIGEST_INTERVAL, TraceDigest
+
+ENGINES = {
+    "microcode": ControlUnit,
+    "compiled": CompiledControlUnit,
+    "fast": FastEngine,
+    "jit": JitEngine,
+    "merged": MergedControlUnit,
+    "pipelined": PipelinedControlUnit,
+}
 
 
 def load_json(filename):
@@ -16,44 +36,208 @@ def load_json(filename):
 
 
 def replace_escape_sequences(input_data: list[str]) -> list[str]:
-    i = len(input_data) - 1
-    while i > 0:
-        if input_data[i] == "n" and input_data[i - 1] == "\\":
-            input_data.pop(i - 1)
-            input_data[i - 1] = ASCII_END_OF_LINE_CODE
-            i -= 1
-        i -= 1
-
-    return input_data
-
-
-def main(object_file, input_file):
-    asm_data = load_json(object_file)
-
+    return list(replace_escapes(input_data))
+
+
+class TraceSinkConflictError(ValueError):
+    def __init__(self):
+        super().__init__("--binary-trace and --trace-digest are mutually exclusive")
+
+
+class UnsupportedOptionError(ValueError):
+    def __init__(self, option: str, engine: str):
+        super().__init__(f"{option} is not supported by the {engine} engine")
+
+
+def check_options(engine: str, trace_level: str, options: dict[str, object]):
+    # fast и jit не ведут потактового журнала и не хранят состояние Control Unit;
+    # в конвейере несколько инструкций за такт, ему подходят только журнал и счётчики
+    per_tick = issubclass(ENGINES[engine], ControlUnit)
+    if not per_tick and trace_level != TraceLevel.OFF.value:
+        raise UnsupportedOptionError("--trace", engine)
+    for option, value in options.items():
+        if not value:
+            continue
+        if not per_tick or (engine == "pipelined" and option != "--counters"):
+            raise UnsupportedOptionError(option, engine)
+
+
+def main(
+    object_file,
+    input_file,
+    engine="compiled",
+    trace_level=None,
+    history_size=0,
+    binary_trace=None,
+    output_file=None,
+    flush_threshold=FLUSH_THRESHOLD,
+    snapshot_file=None,
+    snapshot_tick=None,
+    restore_file=None,
+    counters_file=None,
+    trace_digest=None,
+):
+    if binary_trace and trace_digest is not None:
+        raise TraceSinkConflictError()
+    if trace_level is None:
+        per_tick = issubclass(ENGINES[engine], ControlUnit)
+        trace_level = (TraceLevel.MICROCODE if per_tick else TraceLevel.OFF).value
+    check_options(
+        engine,
+        trace_level,
+        {
+            "--history": history_size,
+            "--binary-trace": binary_trace,
+            "--trace-digest": trace_digest is not None,
+            "--snapshot": snapshot_file,
+            "--restore": restore_file,
+            "--counters": counters_file,
+        },
+    )
+    asm_data = load_program(object_file)
+
+    if trace_level != TraceLevel.OFF.value:
+        logging.basicConfig(level=logging.DEBUG, format="%(levelname)s | %(message)s")
+
+    if output_file:
+        output_sink = FileSink(output_file, flush_threshold)
+    else:
+        output_sink = StdoutSink(flush_threshold)
+
+    # ввод читается порциями по мере исполнения, поэтому файл открыт до останова
     with open(input_file) as file:
-        input_data = replace_escape_sequences(list(file.read().strip()))
-
-    logging.basicConfig(level=logging.DEBUG, format="%(levelname)s | %(message)s")
-
-    data_path = DataPath(data=asm_data.get("data", []), input_tokens=input_data)
-
-    control_unit = ControlUnit(data_path, asm_data.get("text", []))
-
-    try:
-        control_unit.control_logic_procced()
-    except StopIteration:
-        pass
-    except EOFError:
-        pass
-
-    print("".join(data_path.output_buffer), end="")
+        if restore_file:
+            # снимок хранит состояние Control Unit: только microcode и compiled
+            control_unit = Snapshot.load(restore_file).restore(
+                asm_data.get("text", []), read_input(file), output_sink, ENGINES[engine]
+            )
+        else:
+            data_path = DataPath(
+                data=asm_data.get("data", []),
+                input_tokens=read_input(file),
+                output_sink=output_sink,
+            )
+            control_unit = ENGINES[engine](data_path, asm_data.get("text", []))
+        trace_writer = TraceWriter(binary_trace) if binary_trace else trace_digest
+        if isinstance(control_unit, ControlUnit):
+            control_unit.configure_trace(
+                TraceLevel(trace_level), history_size, trace_writer
+            )
+        counters = control_unit.enable_counters() if counters_file else None
+
+        try:
+            if snapshot_file and snapshot_tick is not None:
+                control_unit.tick_limit = snapshot_tick
+                try:
+                    control_unit.control_logic_procced()
+                except TickLimitError:
+                    Snapshot.capture(control_unit).save(snapshot_file)
+                    control_unit.tick_limit = math.inf
+            control_unit.control_logic_procced()
+        except StopIteration:
+            pass
+        except EOFError:
+            dump_history(control_unit, "input buffer is empty")
+        except Exception as error:
+            dump_history(control_unit, repr(error))
+            raise
+        finally:
+            output_sink.close()
+            if trace_writer is not None:
+                trace_writer.close()
+            if counters is not None:
+                with open(counters_file, "w", encoding="utf-8") as counters_output:
+                    counters.dump(counters_output)
+
+    return control_unit
+
+
+def dump_history(control_unit, reason):
+    if getattr(control_unit, "history", None):
+        print(f"{reason}, last {len(control_unit.history)} ticks:", file=sys.stderr)
+        control_unit.dump_history(sys.stderr)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: machine.py <asm_file.json> <input_file>")
-        sys.exit(1)
-
-    object_file = sys.argv[1]
-    input_file = sys.argv[2]
-    main(object_file, input_file)
+    parser = argparse.ArgumentParser(prog="machine.py")
+    parser.add_argument("object_file")
+    parser.add_argument("input_file")
+    parser.add_argument("engine", nargs="?", default="compiled", choices=ENGINES)
+    parser.add_argument(
+        "--trace",
+        default=None,
+        help="default: microcode for per-tick engines, off for fast and jit",
+        choices=[level.value for level in TraceLevel],
+    )
+    parser.add_argument(
+        "--history",
+        type=int,
+        default=0,
+        help="keep last N ticks and dump them on crash or end of input",
+    )
+    parser.add_argument(
+        "--binary-trace",
+        metavar="PATH",
+        help="write every tick as a fixed-width record, see binary_trace.py",
+    )
+    parser.add_argument("--output", metavar="PATH", help="write program output to file")
+    parser.add_argument(
+        "--flush-threshold",
+        type=int,
+        default=FLUSH_THRESHOLD,
+        help="flush output after this many characters",
+    )
+    parser.add_argument(
+        "--snapshot",
+        metavar="PATH",
+        help="save machine state to file at --snapshot-at tick",
+    )
+    parser.add_argument(
+        "--snapshot-at",
+        type=int,
+        metavar="TICK",
+        help="first instruction boundary at or after this tick",
+    )
+    parser.add_argument(
+        "--restore", metavar="PATH", help="start from a saved machine state"
+    )
+    parser.add_argument(
+        "--counters",
+        metavar="PATH",
+        help="write performance counters to file as JSON",
+    )
+    parser.add_argument(
+        "--trace-digest",
+        metavar="PATH",
+        help="write rolling digest of the microcode trace as JSON, see trace_digest.py",
+    )
+    parser.add_argument(
+        "--digest-interval",
+        type=int,
+        default=DIGEST_INTERVAL,
+        help="ticks between digest checkpoints",
+    )
+    args = parser.parse_args()
+    trace_digest = (
+        TraceDigest(args.digest_interval, args.trace_digest)
+        if args.trace_digest
+        else None
+    )
+    try:
+        main(
+            args.object_file,
+            args.input_file,
+            args.engine,
+            args.trace,
+            args.history,
+            args.binary_trace,
+            args.output,
+            args.flush_threshold,
+            args.snapshot,
+            args.snapshot_at,
+            args.restore,
+            args.counters,
+            trace_digest,
+        )
+    except (TraceSinkConflictError, UnsupportedOptionError) as error:
+        parser.error(str(error))
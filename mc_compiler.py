@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+
+from control_unit import ControlUnit, TickLimitError
+from data_path import ALU, DataPath
+from microcode import ControlStore, Instruction, Microcode, Signal, SignalValue
+
+MicrocodeHandler = Callable[[ControlUnit, DataPath, ALU], None]
+
+# Пересылки, которые выполняет каждый управляющий сигнал. Для сигналов-селекторов
+# пересылка зависит от значения сигнала, неизвестные значения ничего не делают.
+SIGNAL_TRANSFERS: dict[Signal, str | dict[int, str]] = {
+    Signal.LATCH_IP: "cu.instruction_pointer = cu.mux2",
+    Signal.SEL_IP: {
+        SignalValue.SEL_IP_INC.value: "cu.mux2 = cu.instruction_pointer + 1",
+        SignalValue.SEL_IP_OP.value: "cu.mux2 = cu.instruction_decoder.operand",
+        SignalValue.SEL_IP_OP_ZERO.value: "cu.mux2 = cu.instruction_decoder.operand if alu.zero_flag else cu.instruction_pointer + 1",
+        SignalValue.SEL_IP_OP_NOT_ZERO.value: "cu.mux2 = cu.instruction_pointer + 1 if alu.zero_flag else cu.instruction_decoder.operand",
+    },
+    Signal.LATCH_IR: "cu.instruction_register = cu.instructions_memory[cu.instruction_pointer]",
+    Signal.LATCH_MC_ADDR: "cu.mc_addres = cu.mux1",
+    Signal.SEL_MC_ADDR: {
+        SignalValue.SEL_MC_ADDR_INC.value: "cu.mux1 = cu.mc_addres + 1",
+        SignalValue.SEL_MC_ADDR_NEXT.value: "cu.mux1 = cu.instruction_decoder.mc_addres",
+        SignalValue.SEL_MC_ADDR_NULL.value: "cu.mux1 = 0",
+    },
+    Signal.READ_MC: "cu.current_mc = cu.controle_store.mc_memory[cu.mc_addres]",
+    Signal.LATCH_R1: "dp.r1 = dp.mux1",
+    Signal.LATCH_R2: "dp.r2 = dp.mux1",
+    Signal.LATCH_R3: "dp.r3 = dp.mux1",
+    Signal.SEL_OP_1: {
+        SignalValue.SEL_OP_FIRST_R1.value: "alu.first_operand = dp.r1",
+        SignalValue.SEL_OP_FIRST_R2.value: "alu.first_operand = dp.r2",
+        SignalValue.SEL_OP_FIRST_R3.value: "alu.first_operand = dp.r3",
+    },
+    Signal.SEL_OP_2: {
+        SignalValue.SEL_OP_SECOND_R1.value: "alu.second_operand = dp.r1",
+        SignalValue.SEL_OP_SECOND_R2.value: "alu.second_operand = dp.r2",
+        SignalValue.SEL_OP_SECOND_R3.value: "alu.second_operand = dp.r3",
+        SignalValue.SEL_OP_SECOND_OP.value: "alu.second_operand = dp.operand_register",
+    },
+    Signal.OPERATION: {
+        SignalValue.OPERATION_ADD.value: "alu.result = alu.first_operand + alu.second_operand",
+        SignalValue.OPERATION_SUB.value: "alu.result = alu.first_operand - alu.second_operand",
+        SignalValue.OPERATION_IDIV.value: "alu.result = alu.first_operand % alu.second_operand",
+        SignalValue.OPERATION_DIV.value: "alu.result = alu.first_operand // alu.second_operand",
+        SignalValue.OPERATION_MUL.value: "alu.result = alu.first_operand * alu.second_operand",
+        SignalValue.OPERATION_INC.value: "alu.result = alu.first_operand + 1",
+        SignalValue.OPERATION_DEC.value: "alu.result = alu.first_operand - 1",
+    },
+    Signal.START_DECODE: "cu.signal_start_decode()",
+    Signal.SEL_ADDR: {
+        SignalValue.SEL_ADDRESS_OPERAND.value: "dp.mux3 = dp.operand_bus",
+        SignalValue.SEL_ADDRESS_MUX2.value: "dp.mux3 = dp.mux2",
+    },
+    Signal.LATCH_ADDR: "dp.address_register = dp.mux3",
+    Signal.MEM_READ: "dp.data_memory.output_value = dp.data_memory.memory[dp.address_register]",
+    Signal.MEM_WRITE: "dp.data_memory.memory[dp.address_register] = dp.mux2",
+    Signal.OUT_BUF_WRITE: "",
+    Signal.OUT_BUF_NEXT: "dp.signal_out_buf_next()",
+    Signal.INP_BUF_READ: "",
+    Signal.INP_BUF_NEXT: "dp.signal_inp_buf_next()",
+    Signal.LATCH_DR: "dp.data_register = dp.data_memory.output_value",
+    Signal.SEL_R_READ: {
+        SignalValue.SEL_R_READ_R1.value: "dp.mux2 = dp.r1",
+        SignalValue.SEL_R_READ_R2.value: "dp.mux2 = dp.r2",
+        SignalValue.SEL_R_READ_R3.value: "dp.mux2 = dp.r3",
+    },
+    Signal.SEL_R_WRITE: {
+        SignalValue.SEL_R_WRITE_ALU.value: "dp.mux1 = alu.result",
+        SignalValue.SEL_R_WRITE_OR.value: "dp.mux1 = dp.operand_register",
+        SignalValue.SEL_R_WRITE_INP_BUFF.value: "dp.signal_sel_r_write(2)",
+        SignalValue.SEL_R_WRITE_DR.value: "dp.mux1 = dp.data_register",
+        SignalValue.SEL_R_WRITE_MUX2.value: "dp.mux1 = dp.mux2",
+    },
+    Signal.LATCH_OR: "dp.operand_register = dp.operand_bus",
+}
+
+
+def compile_microcode(name: str, microcode: Microcode) -> str:
+    lines = [f"def {name}(cu, dp, alu):"]
+    for signal, value in microcode.items():
+        transfer = SIGNAL_TRANSFERS[signal]
+        if isinstance(transfer, dict):
+            transfer = transfer.get(value, "")
+        if transfer:
+            lines.append("    " + transfer)
+        if signal == Signal.OPERATION and transfer:
+            lines.append("    alu.zero_flag = bool(alu.result == 0)")
+    if len(lines) == 1:
+        lines.append("    pass")
+    return "\n".join(lines)
+
+
+def compile_control_store(control_store: ControlStore) -> list[MicrocodeHandler]:
+    names = [f"mc_{address}" for address in range(len(control_store.mc_memory))]
+    source = "\n\n".join(
+        compile_microcode(name, microcode)
+        for name, microcode in zip(names, control_store.mc_memory)
+    )
+    namespace = {}
+    exec(compile(source, "<control_store>", "exec"), namespace)
+    return [namespace[name] for name in names]
+
+
+class CompiledControlUnit(ControlUnit):
+    handlers: list[MicrocodeHandler] = None
+
+    def __init__(self, data_path: DataPath, instructions: list[Instruction]):
+        super().__init__(data_path, instructions)
+        self.handlers = compile_control_store(self.controle_store)
+
+    def step(self):
+        self.tick += 1
+
+        self.handlers[self.mc_addres](self, self.data_path, self.data_path.alu)
+
+        if self.tracing:
+            self.info()
+
+        self.mc_addres = self.mux1
+
+    def control_logic_procced(self):
+        handlers = self.handlers
+        data_path = self.data_path
+        alu = data_path.alu
+        while True:
+            if self.tick >= self.tick_limit and self.mc_addres == 0:
+                raise TickLimitError()
+
+            self.tick += 1
+
+            handlers[self.mc_addres](self, data_path, alu)
+
+            if self.tracing:
+                self.info()
+
+            self.mc_addres = self.mux1
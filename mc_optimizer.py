@@ -0,0 +1,337 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from enum import Enum
+
+from binary_object import load_program
+from control_unit import ControlUnit, TraceLevel
+from data_path import DataPath
+from input_port import read_input
+from microcode import (
+    ControlStore,
+    DecodedInstruction,
+    Instruction,
+    InstructionDecoder,
+    Microcode,
+    Signal,
+    SignalValue,
+)
+
+Effects = tuple[frozenset[str], frozenset[str]]
+
+
+def effects(reads: str, writes: str) -> Effects:
+    return frozenset(reads.split()), frozenset(writes.split())
+
+
+# Элементы, которые читает и записывает каждый управляющий сигнал: регистры,
+# защёлки, мультиплексоры (ip_mux и mc_mux - в Control Unit, mux1-mux3 - в
+# Data Path), АЛУ вместе с флагом, память и порты. Как в mc_compiler, для
+# сигналов-селекторов набор зависит от значения сигнала.
+SIGNAL_EFFECTS: dict[Signal, Effects | dict[int, Effects]] = {
+    Signal.LATCH_IP: effects("ip_mux", "ip"),
+    Signal.SEL_IP: {
+        SignalValue.SEL_IP_INC.value: effects("ip", "ip_mux"),
+        SignalValue.SEL_IP_OP.value: effects("decoder", "ip_mux"),
+        SignalValue.SEL_IP_OP_ZERO.value: effects("ip decoder alu", "ip_mux"),
+        SignalValue.SEL_IP_OP_NOT_ZERO.value: effects("ip decoder alu", "ip_mux"),
+    },
+    Signal.LATCH_IR: effects("ip", "ir"),
+    Signal.SEL_MC_ADDR: {
+        SignalValue.SEL_MC_ADDR_INC.value: effects("mc", "mc_mux"),
+        SignalValue.SEL_MC_ADDR_NEXT.value: effects("decoder", "mc_mux"),
+        SignalValue.SEL_MC_ADDR_NULL.value: effects("", "mc_mux"),
+    },
+    Signal.LATCH_R1: effects("mux1", "r1"),
+    Signal.LATCH_R2: effects("mux1", "r2"),
+    Signal.LATCH_R3: effects("mux1", "r3"),
+    Signal.SEL_OP_1: {
+        SignalValue.SEL_OP_FIRST_R1.value: effects("r1", "op1"),
+        SignalValue.SEL_OP_FIRST_R2.value: effects("r2", "op1"),
+        SignalValue.SEL_OP_FIRST_R3.value: effects("r3", "op1"),
+    },
+    Signal.SEL_OP_2: {
+        SignalValue.SEL_OP_SECOND_R1.value: effects("r1", "op2"),
+        SignalValue.SEL_OP_SECOND_R2.value: effects("r2", "op2"),
+        SignalValue.SEL_OP_SECOND_R3.value: effects("r3", "op2"),
+        SignalValue.SEL_OP_SECOND_OP.value: effects("or", "op2"),
+    },
+    Signal.OPERATION: {
+        SignalValue.OPERATION_ADD.value: effects("op1 op2", "alu"),
+        SignalValue.OPERATION_SUB.value: effects("op1 op2", "alu"),
+        SignalValue.OPERATION_IDIV.value: effects("op1 op2", "alu"),
+        SignalValue.OPERATION_DIV.value: effects("op1 op2", "alu"),
+        SignalValue.OPERATION_MUL.value: effects("op1 op2", "alu"),
+        SignalValue.OPERATION_INC.value: effects("op1", "alu"),
+        SignalValue.OPERATION_DEC.value: effects("op1", "alu"),
+    },
+    Signal.START_DECODE: effects("ir alu", "decoder operand_bus"),
+    Signal.SEL_ADDR: {
+        SignalValue.SEL_ADDRESS_OPERAND.value: effects("operand_bus", "mux3"),
+        SignalValue.SEL_ADDRESS_MUX2.value: effects("mux2", "mux3"),
+    },
+    Signal.LATCH_ADDR: effects("mux3", "ar"),
+    Signal.MEM_READ: effects("ar memory", "memory_out"),
+    Signal.MEM_WRITE: effects("ar mux2", "memory"),
+    Signal.OUT_BUF_WRITE: effects("", ""),
+    Signal.OUT_BUF_NEXT: effects("mux2 output", "output"),
+    Signal.INP_BUF_READ: effects("", ""),
+    Signal.INP_BUF_NEXT: effects("input", "input"),
+    Signal.LATCH_DR: effects("memory_out", "dr"),
+    Signal.SEL_R_READ: {
+        SignalValue.SEL_R_READ_R1.value: effects("r1", "mux2"),
+        SignalValue.SEL_R_READ_R2.value: effects("r2", "mux2"),
+        SignalValue.SEL_R_READ_R3.value: effects("r3", "mux2"),
+    },
+    Signal.SEL_R_WRITE: {
+        SignalValue.SEL_R_WRITE_ALU.value: effects("alu", "mux1"),
+        SignalValue.SEL_R_WRITE_OR.value: effects("or", "mux1"),
+        SignalValue.SEL_R_WRITE_INP_BUFF.value: effects("input", "mux1"),
+        SignalValue.SEL_R_WRITE_DR.value: effects("dr", "mux1"),
+        SignalValue.SEL_R_WRITE_MUX2.value: effects("mux2", "mux1"),
+    },
+    Signal.LATCH_OR: effects("operand_bus", "or"),
+}
+
+# у памяти данных один порт: чтение и запись в одном такте невозможны
+SHARED_UNITS = {Signal.MEM_READ: "memory_port", Signal.MEM_WRITE: "memory_port"}
+
+
+def signal_effects(signal: Signal, value) -> Effects:
+    signal_effect = SIGNAL_EFFECTS[signal]
+    if isinstance(signal_effect, dict):
+        # в Control Store встречаются и значения SignalValue, и их .value
+        return signal_effect[getattr(value, "value", value)]
+    return signal_effect
+
+
+class MicrocodeOptimizer:
+    # Слияние соседних микрокоманд одной микропрограммы. Сигналы микрокоманды
+    # срабатывают в порядке записи, и защёлкнутое значение видно следующим
+    # сигналам того же такта (так устроены выборка и ADDI), поэтому вторая
+    # микрокоманда может идти в том же такте следом за первой, если:
+    # - у них нет общего поля (каждое поле микрокоманды хранит одно значение),
+    #   кроме одинаковых сигналов, чьи входы и выход с первого срабатывания
+    #   не изменились - повтор такого сигнала не нужен;
+    # - ни один элемент не записывается обеими микрокомандами;
+    # - общий блок (порт памяти) нужен только одной из них.
+    # Следующая микрокоманда определяется полем SEL_MC_ADDR второй.
+    merged: int = None
+
+    def __init__(self):
+        self.merged = 0
+
+    def optimize(
+        self, control_store: ControlStore, mc_address_mapping: dict
+    ) -> tuple[ControlStore, dict[int, int]]:
+        # возвращает новый Control Store и новые адреса входов микропрограмм
+        memory = []
+        relocation = {}
+        for entry in sorted({0, *mc_address_mapping.values()}):
+            relocation[entry] = len(memory)
+            program = control_store.microprogram(entry)
+            words = [dict(program[0])]
+            for microcode in program[1:]:
+                merged = self.merge(words[-1], microcode)
+                if merged is None:
+                    words.append(dict(microcode))
+                else:
+                    words[-1] = merged
+                    self.merged += 1
+            memory.extend(words)
+            if entry == 0:
+                # журнал считает адреса 0 и 1 выборкой (format_trace), поэтому
+                # адрес 1 остаётся за ней, даже если она уместилась в один такт
+                memory.extend(dict(microcode) for microcode in program[len(memory) : 2])
+        optimized = ControlStore()
+        optimized.mc_memory = memory
+        return optimized, relocation
+
+    def merge(self, first: Microcode, second: Microcode) -> Microcode | None:
+        if Signal.SEL_MC_ADDR not in second:
+            return None
+        merged = {
+            signal: value
+            for signal, value in first.items()
+            if signal != Signal.SEL_MC_ADDR
+        }
+        written = set()
+        units = set()
+        for signal, value in merged.items():
+            written |= signal_effects(signal, value)[1]
+            if signal in SHARED_UNITS:
+                units.add(SHARED_UNITS[signal])
+
+        for signal, value in second.items():
+            if signal == Signal.SEL_MC_ADDR:
+                continue
+            reads, writes = signal_effects(signal, value)
+            if signal in merged:
+                if merged[signal] != value or self.clobbered(
+                    merged, signal, reads | writes
+                ):
+                    return None
+                continue
+            if writes & written or SHARED_UNITS.get(signal) in units:
+                return None
+            merged[signal] = value
+            written |= writes
+            if signal in SHARED_UNITS:
+                units.add(SHARED_UNITS[signal])
+
+        merged[Signal.SEL_MC_ADDR] = second[Signal.SEL_MC_ADDR]
+        return merged
+
+    def clobbered(self, merged: Microcode, signal: Signal, elements: set) -> bool:
+        # изменился ли после срабатывания signal хотя бы один из elements
+        signals = list(merged.items())
+        position = list(merged).index(signal)
+        return any(
+            signal_effects(later, value)[1] & elements
+            for later, value in signals[position + 1 :]
+        )
+
+
+def relocate(
+    instruction: DecodedInstruction, relocation: dict[int, int]
+) -> DecodedInstruction:
+    return instruction._replace(
+        mc_addres=relocation.get(instruction.mc_addres),
+        mc_addres_zero=relocation.get(instruction.mc_addres_zero),
+    )
+
+
+class MergedControlUnit(ControlUnit):
+    # Control Unit с Control Store после MicrocodeOptimizer: те же сигналы,
+    # но соседние микрокоманды слиты, поэтому тактов на инструкцию меньше
+    optimizer: MicrocodeOptimizer = None
+
+    def __init__(self, data_path: DataPath, instructions: list[Instruction]):
+        super().__init__(data_path, instructions)
+        decoder = self.instruction_decoder
+        self.optimizer = MicrocodeOptimizer()
+        self.controle_store, relocation = self.optimizer.optimize(
+            self.controle_store, decoder.mc_address_mapping
+        )
+        decoder.mc_address_mapping = {
+            key: relocation[address]
+            for key, address in decoder.mc_address_mapping.items()
+        }
+        # инструкции могли прийти уже декодированными под исходный Control Store
+        self.instructions_memory = [
+            relocate(instruction, relocation)
+            for instruction in self.instructions_memory
+        ]
+        self.current_mc = self.controle_store.mc_memory[self.mc_addres]
+
+
+def architectural_state(control_unit: ControlUnit) -> tuple:
+    # значения сравниваются вместе с разрядностью, как в снимке; память
+    # не копируется, состояние сравнивается сразу
+    data_path = control_unit.data_path
+    memory = data_path.data_memory.memory
+    return (
+        int(control_unit.instruction_pointer),
+        *((type(value), value) for value in (data_path.r1, data_path.r2, data_path.r3)),
+        data_path.alu.zero_flag,
+        memory.values,
+        memory.wide,
+        data_path.output_buffer.getvalue(),
+    )
+
+
+def retire(control_unit: ControlUnit) -> str | None:
+    # исполнение до следующей выборки; имя исключения, если машина остановилась
+    try:
+        control_unit.step()
+        while control_unit.mc_addres != 0:
+            control_unit.step()
+    except Exception as exception:
+        return type(exception).__name__
+    return None
+
+
+def cosimulate(
+    instructions: list[Instruction],
+    data: list[int],
+    input_tokens,
+    instruction_limit: int = 1_000_000,
+) -> tuple[str | None, ControlUnit, MergedControlUnit]:
+    # исходная и оптимизированная машины исполняют программу по инструкциям,
+    # архитектурное состояние сравнивается после каждой; возвращается описание
+    # первого расхождения или None
+    input_tokens = list(input_tokens)
+    reference = ControlUnit(DataPath(data, iter(input_tokens)), instructions)
+    merged = MergedControlUnit(DataPath(data, iter(input_tokens)), instructions)
+    reference.configure_trace(TraceLevel.OFF)
+    merged.configure_trace(TraceLevel.OFF)
+    for retired in range(instruction_limit):
+        halt, merged_halt = retire(reference), retire(merged)
+        if halt != merged_halt:
+            return f"instruction {retired}: {halt} != {merged_halt}", reference, merged
+        if architectural_state(reference) != architectural_state(merged):
+            return f"instruction {retired}: state differs", reference, merged
+        if halt is not None:
+            return None, reference, merged
+    return None, reference, merged
+
+
+def key_part(part) -> str:
+    # ключ mc_address_mapping: опкод, номера регистров, тип аргумента, флаг Z
+    if isinstance(part, Enum):
+        return part.value
+    if type(part) is int:
+        return f"R{part}"
+    return str(part)
+
+
+def print_report(
+    control_store: ControlStore,
+    optimized: ControlStore,
+    relocation: dict[int, int],
+    mc_address_mapping: dict,
+):
+    # такты каждой инструкции вместе с выборкой до и после слияния
+    fetch = len(control_store.microprogram(0))
+    merged_fetch = len(optimized.microprogram(0))
+    print(f"{'instruction':<24} ticks")
+    for key, address in sorted(mc_address_mapping.items(), key=lambda item: item[1]):
+        before = fetch + len(control_store.microprogram(address))
+        after = merged_fetch + len(optimized.microprogram(relocation[address]))
+        name = " ".join(key_part(part) for part in key)
+        print(f"{name:<24} {before} -> {after}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="mc_optimizer.py")
+    parser.add_argument("object_file", nargs="?", help="co-simulate this program")
+    parser.add_argument("input_file", nargs="?")
+    parser.add_argument("--instruction-limit", type=int, default=1_000_000)
+    args = parser.parse_args()
+    if args.object_file is None:
+        control_store = ControlStore()
+        mapping = InstructionDecoder().mc_address_mapping
+        optimizer = MicrocodeOptimizer()
+        optimized, relocation = optimizer.optimize(control_store, mapping)
+        print_report(control_store, optimized, relocation, mapping)
+        print(
+            f"{len(control_store.mc_memory)} -> {len(optimized.mc_memory)}"
+            f" microinstructions, {optimizer.merged} merged",
+            file=sys.stderr,
+        )
+        sys.exit(0)
+    if args.input_file is None:
+        parser.error("input_file is required with object_file")
+    program = load_program(args.object_file)
+    with open(args.input_file) as file:
+        divergence, reference, merged = cosimulate(
+            program.get("text", []),
+            program.get("data", []),
+            read_input(file),
+            args.instruction_limit,
+        )
+    print(f"ticks: {reference.tick} -> {merged.tick}")
+    if divergence:
+        print(divergence, file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,24 @@
+from pathlib import Path
+
+import pytest
+
+from input_port import read_input
+from mc_optimizer import cosimulate
+from translator import parse_asm
+
+PROGRAMS = Path(__file__).parent / "asm_programs"
+
+
+@pytest.mark.parametrize("name", sorted(path.stem for path in PROGRAMS.glob("*.asm")))
+def test_merged_matches_microcode(name):
+    # слитые микрокоманды дают то же состояние после каждой инструкции
+    program = parse_asm((PROGRAMS / f"{name}.asm").read_text(encoding="utf-8"))
+    with open(PROGRAMS / "user_name.txt", encoding="utf-8") as file:
+        divergence, reference, merged = cosimulate(
+            program["text"], program["data"], read_input(file)
+        )
+    assert divergence is None, divergence
+    assert merged.data_path.output_buffer.getvalue() == (
+        reference.data_path.output_buffer.getvalue()
+    )
+    assert merged.tick < reference.tick
@@ -1,11 +1,11 @@
 from __future__ import annotations
 
 from enum import Enum, auto
-from typing import Dict, List, Union
+from typing import Dict, List, NamedTuple, Union
 
 from numpy import int16
 
-from isa import ArgType, Opcode
+from isa import IMMEDIATE_ALU, ArgType, Opcode, decode_instruction
 
 
 class Signal(Enum):
@@ -40,6 +40,8 @@ class SignalValue(Enum):
     LATCH = 1
     SEL_IP_INC = 0
     SEL_IP_OP = 1
+    SEL_IP_OP_ZERO = 2
+    SEL_IP_OP_NOT_ZERO = 3
     SEL_MC_ADDR_INC = 0
     SEL_MC_ADDR_NEXT = 1
     SEL_MC_ADDR_NULL = 2
@@ -77,6 +79,43 @@ Instruction = Dict[str, Union[Opcode, List[Dict[ArgType, str]]]]
 
 Microcode = Dict[Signal, SignalValue]
 
+REGISTER_NAMES = ("R1", "R2", "R3")
+
+# номер регистра в машинном слове и в ключах mc_address_mapping
+REGISTER_NUMBERS = {name: number for number, name in enumerate(REGISTER_NAMES, 1)}
+
+# с этого адреса идут микропрограммы ADDI ... MULI (по две микрокоманды на пару
+# регистров в порядке IMMEDIATE_ALU), за ними JEQ и JNE (по одной на пару)
+IMMEDIATE_ALU_ADDRESS = 127
+
+IMMEDIATE_OPERATIONS = {
+    Opcode.ADDI: SignalValue.OPERATION_ADD,
+    Opcode.SUBI: SignalValue.OPERATION_SUB,
+    Opcode.IDIVI: SignalValue.OPERATION_IDIV,
+    Opcode.DIVI: SignalValue.OPERATION_DIV,
+    Opcode.MULI: SignalValue.OPERATION_MUL,
+}
+
+# порядок операндов не важен: сравнение - вычитание с проверкой на ноль
+COMPARE_PAIRS = (("R1", "R2"), ("R1", "R3"), ("R2", "R3"))
+
+COMPARE_JUMP_SELECTORS = {
+    Opcode.JEQ: SignalValue.SEL_IP_OP_ZERO,
+    Opcode.JNE: SignalValue.SEL_IP_OP_NOT_ZERO,
+}
+
+
+class DecodedInstruction(NamedTuple):
+    # None - опкод не из системы команд, такая инструкция сбоит при декодировании
+    opcode: Opcode | None
+    # адрес микропрограммы при z_flag = 0 и при z_flag = 1 (различаются у JZ/JNZ)
+    mc_addres: int | None
+    mc_addres_zero: int | None
+    operand: int16 | None
+    registers: tuple[int, ...]
+    first_arg_val: str
+    second_arg_val: str
+
 
 class InstructionDecoder:
     operand: int16 = None
@@ -85,11 +124,16 @@ class InstructionDecoder:
 
     zero_flag: bool = None
 
+    # текст аргументов текущей инструкции для журнала
     first_arg_val: str = None
     second_arg_val: str = None
-    second_arg_type: ArgType = None
+
+    # номера регистров и типы аргументов декодируемой инструкции
+    first_register: int | None = None
+    second_register: int | None = None
     first_arg_type: ArgType = None
-    third_arg_val: str = None
+    second_arg_type: ArgType = None
+    third_arg_type: ArgType = None
 
     def __init__(self):
         self.operand = 0
@@ -114,183 +158,304 @@ class InstructionDecoder:
             Opcode.OUT: self.handle_out,
             Opcode.IN: self.handle_in,
             Opcode.HALT: self.handle_halt,
+            Opcode.ADDI: self.handle_addi,
+            Opcode.SUBI: self.handle_subi,
+            Opcode.IDIVI: self.handle_idivi,
+            Opcode.DIVI: self.handle_divi,
+            Opcode.MULI: self.handle_muli,
+            Opcode.JEQ: self.handle_jeq,
+            Opcode.JNE: self.handle_jne,
         }
 
         self.mc_address_mapping = {
-            ("MOV", "R1", ArgType.NUMBER): 2,
-            ("MOV", "R2", ArgType.NUMBER): 3,
-            ("MOV", "R3", ArgType.NUMBER): 4,
-            ("MOV", "R1", "R2"): 5,
-            ("MOV", "R2", "R1"): 6,
-            ("MOV", "R2", "R3"): 7,
-            ("MOV", "R3", "R2"): 8,
-            ("MOV", "R1", "R3"): 9,
-            ("MOV", "R3", "R1"): 10,
-            ("LOAD", "R1", ArgType.NUMBER): 11,
-            ("LOAD", "R2", ArgType.NUMBER): 13,
-            ("LOAD", "R3", ArgType.NUMBER): 15,
-            ("LOAD", "R1", "R2"): 23,
-            ("LOAD", "R1", "R3"): 26,
-            ("LOAD", "R2", "R1"): 29,
-            ("LOAD", "R2", "R3"): 32,
-            ("LOAD", "R3", "R1"): 35,
-            ("LOAD", "R3", "R2"): 38,
-            ("STORE", "R1", ArgType.NUMBER): 17,
-            ("STORE", "R2", ArgType.NUMBER): 19,
-            ("STORE", "R3", ArgType.NUMBER): 21,
-            ("STORE", "R1", "R2"): 41,
-            ("STORE", "R1", "R3"): 43,
-            ("STORE", "R2", "R1"): 45,
-            ("STORE", "R2", "R3"): 47,
-            ("STORE", "R3", "R1"): 49,
-            ("STORE", "R3", "R2"): 51,
-            ("ADD", "R1"): 53,
-            ("ADD", "R2"): 55,
-            ("ADD", "R3"): 57,
-            ("SUB", "R1", "R2"): 59,
-            ("SUB", "R2", "R1"): 61,
-            ("SUB", "R3", "R1"): 63,
-            ("SUB", "R1", "R3"): 103,
-            ("SUB", "R2", "R3"): 105,
-            ("SUB", "R3", "R2"): 107,
-            ("IDIV", "R1", "R2"): 65,
-            ("IDIV", "R2", "R1"): 67,
-            ("IDIV", "R3", "R1"): 69,
-            ("IDIV", "R1", "R3"): 109,
-            ("IDIV", "R2", "R3"): 111,
-            ("IDIV", "R3", "R2"): 113,
-            ("DIV", "R1", "R2"): 71,
-            ("DIV", "R2", "R1"): 73,
-            ("DIV", "R3", "R1"): 75,
-            ("DIV", "R1", "R3"): 97,
-            ("DIV", "R2", "R3"): 99,
-            ("DIV", "R3", "R2"): 101,
-            ("MUL", "R1", "R2"): 115,
-            ("MUL", "R2", "R1"): 117,
-            ("MUL", "R3", "R1"): 119,
-            ("DEC", "R1"): 121,
-            ("DEC", "R2"): 123,
-            ("DEC", "R3"): 125,
-            ("INC", "R1"): 77,
-            ("INC", "R2"): 79,
-            ("INC", "R3"): 81,
-            ("CMP", "R1", "R2"): 83,
-            ("CMP", "R2", "R3"): 84,
-            ("CMP", "R1", "R3"): 85,
-            ("CMP", "R1", ArgType.NUMBER): 94,
-            ("CMP", "R2", ArgType.NUMBER): 95,
-            ("CMP", "R3", ArgType.NUMBER): 96,
-            ("JMP",): 86,
-            ("JZ", True): 86,
-            ("JZ", False): 93,
-            ("JNZ", True): 93,
-            ("JNZ", False): 86,
-            ("OUT", "R1"): 87,
-            ("OUT", "R2"): 88,
-            ("OUT", "R3"): 89,
-            ("IN", "R1"): 90,
-            ("IN", "R2"): 91,
-            ("IN", "R3"): 92,
+            (Opcode.MOV, 1, ArgType.NUMBER): 2,
+            (Opcode.MOV, 2, ArgType.NUMBER): 3,
+            (Opcode.MOV, 3, ArgType.NUMBER): 4,
+            (Opcode.MOV, 1, 2): 5,
+            (Opcode.MOV, 2, 1): 6,
+            (Opcode.MOV, 2, 3): 7,
+            (Opcode.MOV, 3, 2): 8,
+            (Opcode.MOV, 1, 3): 9,
+            (Opcode.MOV, 3, 1): 10,
+            (Opcode.LOAD, 1, ArgType.NUMBER): 11,
+            (Opcode.LOAD, 2, ArgType.NUMBER): 13,
+            (Opcode.LOAD, 3, ArgType.NUMBER): 15,
+            (Opcode.LOAD, 1, 2): 23,
+            (Opcode.LOAD, 1, 3): 26,
+            (Opcode.LOAD, 2, 1): 29,
+            (Opcode.LOAD, 2, 3): 32,
+            (Opcode.LOAD, 3, 1): 35,
+            (Opcode.LOAD, 3, 2): 38,
+            (Opcode.STORE, 1, ArgType.NUMBER): 17,
+            (Opcode.STORE, 2, ArgType.NUMBER): 19,
+            (Opcode.STORE, 3, ArgType.NUMBER): 21,
+            (Opcode.STORE, 1, 2): 41,
+            (Opcode.STORE, 1, 3): 43,
+            (Opcode.STORE, 2, 1): 45,
+            (Opcode.STORE, 2, 3): 47,
+            (Opcode.STORE, 3, 1): 49,
+            (Opcode.STORE, 3, 2): 51,
+            (Opcode.ADD, 1): 53,
+            (Opcode.ADD, 2): 55,
+            (Opcode.ADD, 3): 57,
+            (Opcode.SUB, 1, 2): 59,
+            (Opcode.SUB, 2, 1): 61,
+            (Opcode.SUB, 3, 1): 63,
+            (Opcode.SUB, 1, 3): 103,
+            (Opcode.SUB, 2, 3): 105,
+            (Opcode.SUB, 3, 2): 107,
+            (Opcode.IDIV, 1, 2): 65,
+            (Opcode.IDIV, 2, 1): 67,
+            (Opcode.IDIV, 3, 1): 69,
+            (Opcode.IDIV, 1, 3): 109,
+            (Opcode.IDIV, 2, 3): 111,
+            (Opcode.IDIV, 3, 2): 113,
+            (Opcode.DIV, 1, 2): 71,
+            (Opcode.DIV, 2, 1): 73,
+            (Opcode.DIV, 3, 1): 75,
+            (Opcode.DIV, 1, 3): 97,
+            (Opcode.DIV, 2, 3): 99,
+            (Opcode.DIV, 3, 2): 101,
+            (Opcode.MUL, 1, 2): 115,
+            (Opcode.MUL, 2, 1): 117,
+            (Opcode.MUL, 3, 1): 119,
+            (Opcode.DEC, 1): 121,
+            (Opcode.DEC, 2): 123,
+            (Opcode.DEC, 3): 125,
+            (Opcode.INC, 1): 77,
+            (Opcode.INC, 2): 79,
+            (Opcode.INC, 3): 81,
+            (Opcode.CMP, 1, 2): 83,
+            (Opcode.CMP, 2, 3): 84,
+            (Opcode.CMP, 1, 3): 85,
+            (Opcode.CMP, 1, ArgType.NUMBER): 94,
+            (Opcode.CMP, 2, ArgType.NUMBER): 95,
+            (Opcode.CMP, 3, ArgType.NUMBER): 96,
+            (Opcode.JMP,): 86,
+            (Opcode.JZ, True): 86,
+            (Opcode.JZ, False): 93,
+            (Opcode.JNZ, True): 93,
+            (Opcode.JNZ, False): 86,
+            (Opcode.OUT, 1): 87,
+            (Opcode.OUT, 2): 88,
+            (Opcode.OUT, 3): 89,
+            (Opcode.IN, 1): 90,
+            (Opcode.IN, 2): 91,
+            (Opcode.IN, 3): 92,
         }
 
+        address = IMMEDIATE_ALU_ADDRESS
+        for opcode in IMMEDIATE_ALU:
+            for target in REGISTER_NUMBERS.values():
+                for source in REGISTER_NUMBERS.values():
+                    key = (opcode, target, source, ArgType.NUMBER)
+                    self.mc_address_mapping[key] = address
+                    address += 2
+
+        for opcode in COMPARE_JUMP_SELECTORS:
+            for first, second in COMPARE_PAIRS:
+                pair = (REGISTER_NUMBERS[first], REGISTER_NUMBERS[second])
+                self.mc_address_mapping[(opcode, *pair)] = address
+                self.mc_address_mapping[(opcode, *reversed(pair))] = address
+                address += 1
+
     def set_mc_address(self, command, *args):
         key = (command, *args)
         self.mc_addres = self.mc_address_mapping.get(key, None)
         if self.mc_addres is None:
             raise ValueError()
 
-    def decode(self, instruction: Instruction):
-        opcode = Opcode[instruction["opcode"]]
-        args = instruction["args"]
-        self.first_arg_val = ""
-        self.first_arg_type = None
-        self.second_arg_val = ""
-        self.second_arg_type = None
-
-        if len(args) > 0:
-            self.first_arg_val = next(iter(args[0].values()))
-            self.first_arg_type = ArgType[next(iter(args[0].keys())).upper()]
-            if self.first_arg_type == ArgType.NUMBER:
-                self.operand = int16(int(self.first_arg_val))
-
-        if len(args) > 1:
-            self.second_arg_val = next(iter(args[1].values()))
-            self.second_arg_type = ArgType[next(iter(args[1].keys())).upper()]
-            if self.second_arg_type == ArgType.NUMBER:
-                self.operand = int16(int(self.second_arg_val))
-
-        handler = self.dispatch_table.get(opcode)
-        if handler:
-            handler()
+    def parse_args(self, args: list[tuple[ArgType, int | None]]) -> int16 | None:
+        # в ключ mc_address_mapping идёт номер регистра; у числа и отсутствующего
+        # аргумента - None, который не совпадает ни с одним ключом
+        operand = None
+        types = [None, None, None]
+        registers = [None, None, None]
+        for position, (arg_type, value) in enumerate(args[:3]):
+            types[position] = arg_type
+            if arg_type == ArgType.NUMBER:
+                operand = int16(value)
+            else:
+                registers[position] = value
+        self.first_arg_type, self.second_arg_type, self.third_arg_type = types
+        self.first_register, self.second_register, _ = registers
+        return operand
+
+    def entry_address(self, opcode: Opcode, zero_flag: bool) -> int | None:
+        if opcode == Opcode.HALT:
+            return None
+        self.zero_flag = zero_flag
+        try:
+            self.dispatch_table[opcode]()
+        except ValueError:
+            return None
+        return self.mc_addres
+
+    def predecode(
+        self, instruction: Instruction | int | DecodedInstruction
+    ) -> DecodedInstruction:
+        # инструкция из JSON, машинное слово из двоичного объектного файла
+        # или уже декодированная инструкция (повторный запуск той же программы)
+        if isinstance(instruction, DecodedInstruction):
+            return instruction
+        if isinstance(instruction, dict):
+            opcode = Opcode.__members__.get(instruction["opcode"])
+            texts = [next(iter(arg.values())) for arg in instruction["args"]]
+            args = []
+            registers = []
+            for arg, text in zip(instruction["args"], texts):
+                arg_type = ArgType[next(iter(arg.keys())).upper()]
+                if arg_type == ArgType.NUMBER:
+                    args.append((arg_type, int(text)))
+                else:
+                    # микропрограмма есть только у R1-R3, записанных без нулей
+                    args.append((arg_type, REGISTER_NUMBERS.get(text)))
+                    registers.append(int(text[1:]))
+        else:
+            opcode, args = decode_instruction(int(instruction))
+            registers = [
+                value for arg_type, value in args if arg_type != ArgType.NUMBER
+            ]
+            # текст аргументов нужен только журналу
+            texts = [
+                str(value) if arg_type == ArgType.NUMBER else f"R{value}"
+                for arg_type, value in args
+            ]
+        if opcode is None:
+            return DecodedInstruction(None, None, None, None, (), "", "")
+
+        operand = self.parse_args(args)
+        texts += ["", ""]
+
+        decoded = DecodedInstruction(
+            opcode=opcode,
+            mc_addres=self.entry_address(opcode, zero_flag=False),
+            mc_addres_zero=self.entry_address(opcode, zero_flag=True),
+            operand=operand,
+            registers=tuple(registers),
+            first_arg_val=texts[0],
+            second_arg_val=texts[1],
+        )
+        self.zero_flag = False
+        self.mc_addres = 0
+        return decoded
+
+    def decode(self, instruction: DecodedInstruction):
+        self.first_arg_val = instruction.first_arg_val
+        self.second_arg_val = instruction.second_arg_val
+        if instruction.operand is not None:
+            self.operand = instruction.operand
+
+        if instruction.opcode == Opcode.HALT:
+            self.handle_halt()
+
+        if self.zero_flag:
+            self.mc_addres = instruction.mc_addres_zero
+        else:
+            self.mc_addres = instruction.mc_addres
+        if self.mc_addres is None:
+            raise ValueError()
 
     def handle_mov(self):
         if (
             self.first_arg_type == ArgType.REG
             and self.second_arg_type == ArgType.NUMBER
         ):
-            self.set_mc_address("MOV", self.first_arg_val, self.second_arg_type)
+            self.set_mc_address(Opcode.MOV, self.first_register, self.second_arg_type)
         else:
-            self.set_mc_address("MOV", self.first_arg_val, self.second_arg_val)
+            self.set_mc_address(Opcode.MOV, self.first_register, self.second_register)
 
     def handle_load(self):
         if (
             self.first_arg_type == ArgType.REG
             and self.second_arg_type == ArgType.NUMBER
         ):
-            self.set_mc_address("LOAD", self.first_arg_val, self.second_arg_type)
+            self.set_mc_address(Opcode.LOAD, self.first_register, self.second_arg_type)
         else:
-            self.set_mc_address("LOAD", self.first_arg_val, self.second_arg_val)
+            self.set_mc_address(Opcode.LOAD, self.first_register, self.second_register)
 
     def handle_store(self):
         if (
             self.first_arg_type == ArgType.REG
             and self.second_arg_type == ArgType.NUMBER
         ):
-            self.set_mc_address("STORE", self.first_arg_val, self.second_arg_type)
+            self.set_mc_address(Opcode.STORE, self.first_register, self.second_arg_type)
         else:
-            self.set_mc_address("STORE", self.first_arg_val, self.second_arg_val)
+            self.set_mc_address(Opcode.STORE, self.first_register, self.second_register)
 
     def handle_add(self):
-        self.set_mc_address("ADD", self.first_arg_val)
+        self.set_mc_address(Opcode.ADD, self.first_register)
 
     def handle_sub(self):
-        self.set_mc_address("SUB", self.first_arg_val, self.second_arg_val)
+        self.set_mc_address(Opcode.SUB, self.first_register, self.second_register)
 
     def handle_idiv(self):
-        self.set_mc_address("IDIV", self.first_arg_val, self.second_arg_val)
+        self.set_mc_address(Opcode.IDIV, self.first_register, self.second_register)
 
     def handle_div(self):
-        self.set_mc_address("DIV", self.first_arg_val, self.second_arg_val)
+        self.set_mc_address(Opcode.DIV, self.first_register, self.second_register)
 
     def handle_mul(self):
-        self.set_mc_address("MUL", self.first_arg_val, self.second_arg_val)
+        self.set_mc_address(Opcode.MUL, self.first_register, self.second_register)
 
     def handle_inc(self):
-        self.set_mc_address("INC", self.first_arg_val)
+        self.set_mc_address(Opcode.INC, self.first_register)
 
     def handle_dec(self):
-        self.set_mc_address("DEC", self.first_arg_val)
+        self.set_mc_address(Opcode.DEC, self.first_register)
 
     def handle_cmp(self):
         if self.second_arg_type == ArgType.NUMBER:
-            self.set_mc_address("CMP", self.first_arg_val, self.second_arg_type)
+            self.set_mc_address(Opcode.CMP, self.first_register, self.second_arg_type)
         else:
-            self.set_mc_address("CMP", self.first_arg_val, self.second_arg_val)
+            self.set_mc_address(Opcode.CMP, self.first_register, self.second_register)
+
+    def handle_alu_immediate(self, command: Opcode):
+        self.set_mc_address(
+            command, self.first_register, self.second_register, self.third_arg_type
+        )
+
+    def handle_addi(self):
+        self.handle_alu_immediate(Opcode.ADDI)
+
+    def handle_subi(self):
+        self.handle_alu_immediate(Opcode.SUBI)
+
+    def handle_idivi(self):
+        self.handle_alu_immediate(Opcode.IDIVI)
+
+    def handle_divi(self):
+        self.handle_alu_immediate(Opcode.DIVI)
+
+    def handle_muli(self):
+        self.handle_alu_immediate(Opcode.MULI)
+
+    def handle_compare_jump(self, command: Opcode):
+        # третий аргумент - адрес перехода
+        if self.third_arg_type != ArgType.NUMBER:
+            raise ValueError()
+        self.set_mc_address(command, self.first_register, self.second_register)
+
+    def handle_jeq(self):
+        self.handle_compare_jump(Opcode.JEQ)
+
+    def handle_jne(self):
+        self.handle_compare_jump(Opcode.JNE)
 
     def handle_jmp(self):
-        self.set_mc_address("JMP")
+        self.set_mc_address(Opcode.JMP)
 
     def handle_jz(self):
-        self.set_mc_address("JZ", self.zero_flag)
+        self.set_mc_address(Opcode.JZ, self.zero_flag)
 
     def handle_jnz(self):
-        self.set_mc_address("JNZ", not self.zero_flag)
+        self.set_mc_address(Opcode.JNZ, not self.zero_flag)
 
     def handle_out(self):
-        self.set_mc_address("OUT", self.first_arg_val)
+        self.set_mc_address(Opcode.OUT, self.first_register)
 
     def handle_in(self):
-        self.set_mc_address("IN", self.first_arg_val)
+        self.set_mc_address(Opcode.IN, self.first_register)
 
     def handle_halt(self):
         raise StopIteration()
@@ -1431,3 +1596,69 @@ class ControlStore:
                 Signal.SEL_MC_ADDR: SignalValue.SEL_MC_ADDR_NULL.value,
             }
         )
+
+        first_operand = dict(
+            zip(
+                REGISTER_NAMES,
+                (
+                    SignalValue.SEL_OP_FIRST_R1,
+                    SignalValue.SEL_OP_FIRST_R2,
+                    SignalValue.SEL_OP_FIRST_R3,
+                ),
+            )
+        )
+        second_operand = dict(
+            zip(
+                REGISTER_NAMES,
+                (
+                    SignalValue.SEL_OP_SECOND_R1,
+                    SignalValue.SEL_OP_SECOND_R2,
+                    SignalValue.SEL_OP_SECOND_R3,
+                ),
+            )
+        )
+        latch = dict(
+            zip(REGISTER_NAMES, (Signal.LATCH_R1, Signal.LATCH_R2, Signal.LATCH_R3))
+        )
+
+        # 127-216: ADDI/SUBI/IDIVI/DIVI/MULI r_target, r_source, <number>
+        for opcode in IMMEDIATE_ALU:
+            for target in REGISTER_NAMES:
+                for source in REGISTER_NAMES:
+                    self.mc_memory.append(
+                        {
+                            Signal.LATCH_OR: SignalValue.LATCH.value,
+                            Signal.SEL_OP_1: first_operand[source].value,
+                            Signal.SEL_OP_2: SignalValue.SEL_OP_SECOND_OP.value,
+                            Signal.OPERATION: IMMEDIATE_OPERATIONS[opcode].value,
+                            Signal.SEL_MC_ADDR: SignalValue.SEL_MC_ADDR_INC.value,
+                        }
+                    )
+                    self.mc_memory.append(
+                        {
+                            Signal.SEL_R_WRITE: SignalValue.SEL_R_WRITE_ALU.value,
+                            latch[target]: SignalValue.LATCH.value,
+                            Signal.SEL_MC_ADDR: SignalValue.SEL_MC_ADDR_NULL.value,
+                        }
+                    )
+
+        # 217-222: JEQ/JNE r, r, <direct_address> - флаг выставляется как у CMP,
+        # IP выбирается по только что вычисленному флагу
+        for opcode, selector in COMPARE_JUMP_SELECTORS.items():
+            for first, second in COMPARE_PAIRS:
+                self.mc_memory.append(
+                    {
+                        Signal.SEL_OP_1: first_operand[first].value,
+                        Signal.SEL_OP_2: second_operand[second].value,
+                        Signal.OPERATION: SignalValue.OPERATION_SUB.value,
+                        Signal.SEL_IP: selector.value,
+                        Signal.SEL_MC_ADDR: SignalValue.SEL_MC_ADDR_NULL.value,
+                    }
+                )
+
+    def microprogram(self, address: int) -> list[Microcode]:
+        program = [self.mc_memory[address]]
+        while program[-1].get(Signal.SEL_MC_ADDR) == SignalValue.SEL_MC_ADDR_INC.value:
+            address += 1
+            program.append(self.mc_memory[address])
+        return program
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import io
+import sys
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import TextIO
+
+FLUSH_THRESHOLD = 1 << 13
+
+
+class OutputSink(ABC):
+    buffer: list[str] = None
+
+    flush_threshold: int = None
+
+    # символов, сброшенных через write (включая выведенные до снимка)
+    flushed: int = None
+
+    def __init__(self, flush_threshold: int = FLUSH_THRESHOLD):
+        self.buffer = []
+        self.flush_threshold = flush_threshold
+        self.flushed = 0
+
+    @property
+    def position(self) -> int:
+        return self.flushed + len(self.buffer)
+
+    def append(self, symbol: str):
+        self.buffer.append(symbol)
+        if len(self.buffer) >= self.flush_threshold:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.write("".join(self.buffer))
+            self.flushed += len(self.buffer)
+            self.buffer.clear()
+
+    @abstractmethod
+    def write(self, text: str): ...
+
+    def close(self):
+        self.flush()
+
+
+class BufferSink(OutputSink):
+    # весь вывод остаётся в памяти, порог сброса не используется
+    chunks: list[str] = None
+
+    def __init__(self):
+        super().__init__(flush_threshold=sys.maxsize)
+        self.chunks = []
+
+    def write(self, text: str):
+        self.chunks.append(text)
+
+    def getvalue(self) -> str:
+        self.flush()
+        return "".join(self.chunks)
+
+
+class StdoutSink(OutputSink):
+    def write(self, text: str):
+        # sys.stdout берётся при каждой записи, чтобы работал redirect_stdout
+        sys.stdout.write(text)
+
+    def flush(self):
+        super().flush()
+        sys.stdout.flush()
+
+
+class FileSink(OutputSink):
+    file: TextIO = None
+
+    def __init__(self, path: str | Path, flush_threshold: int = FLUSH_THRESHOLD):
+        super().__init__(flush_threshold)
+        self.file = Path(path).open("w", encoding="utf-8")
+
+    def write(self, text: str):
+        self.file.write(text)
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+
+class BytesSink(OutputSink):
+    stream: io.BytesIO = None
+
+    def __init__(self, flush_threshold: int = FLUSH_THRESHOLD):
+        super().__init__(flush_threshold)
+        self.stream = io.BytesIO()
+
+    def write(self, text: str):
+        self.stream.write(text.encode("utf-8", "surrogatepass"))
+
+    def getvalue(self) -> bytes:
+        self.flush()
+        return self.stream.getvalue()
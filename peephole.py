@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import bisect
+import itertools
+import re
+
+from fast_engine import alu_registers
+from isa import COMPARE_JUMPS, IMMEDIATE_ALU, Opcode
+from microcode import DecodedInstruction, Instruction, InstructionDecoder
+
+IDENTIFIER = re.compile(r"\w+")
+
+REGISTERS = frozenset((1, 2, 3))
+
+JUMPS = frozenset((Opcode.JMP, Opcode.JZ, Opcode.JNZ, *COMPARE_JUMPS))
+
+ALU = frozenset((Opcode.ADD, Opcode.SUB, Opcode.IDIV, Opcode.DIV, Opcode.MUL))
+
+# команды АЛУ, выставляющие флаг нуля по результату
+ARITHMETIC = ALU | frozenset(IMMEDIATE_ALU) | {Opcode.INC, Opcode.DEC}
+
+ZERO = ("const", 0)
+
+
+def relocatable(
+    text_section: list[str], labels: dict[str, int], text_labels: dict[str, int]
+) -> bool:
+    # адреса команд сдвигаются, поэтому переходы должны идти только по меткам,
+    # а адреса меток .text не должны использоваться как данные
+    if not all(
+        IDENTIFIER.fullmatch(label) and not label.isdigit()
+        for label in itertools.chain(labels, text_labels)
+    ):
+        return False
+    for command in text_section:
+        opcode, *args = command.replace(",", " ").split()
+        if opcode not in Opcode.__members__:
+            return False
+        if Opcode[opcode] in JUMPS:
+            # адрес перехода - последний аргумент, у JEQ/JNE перед ним два регистра
+            arity = 3 if Opcode[opcode] in COMPARE_JUMPS else 1
+            if len(args) != arity or args[-1] not in text_labels:
+                return False
+            if any(arg in text_labels for arg in args[:-1]):
+                return False
+        elif any(token in text_labels for token in IDENTIFIER.findall(command)):
+            return False
+    return True
+
+
+class Peephole:
+    # Оптимизация секции .text до разрешения меток. Окно - участок между
+    # метками: на входе по метке о регистрах, памяти и флаге ничего не известно,
+    # условный переход окно не прерывает, JMP и HALT завершают его.
+    # Прямой проход нумерует значения и удаляет повторные LOAD, STORE того же
+    # значения, MOV уже лежащего в регистре значения и CMP при уже выставленном
+    # тем же сравнением флаге; LOAD значения, которое есть в другом регистре,
+    # заменяется на более короткий MOV, а CMP двух регистров со следующим за ним
+    # JZ/JNZ - на JEQ с тем же флагом. Обратный проход удаляет MOV в регистр,
+    # который перезаписывается раньше, чем читается, и STORE, перекрытые
+    # следующим STORE по тому же адресу.
+    removed: int = None
+
+    rewritten: int = None
+
+    decoder: InstructionDecoder = None
+
+    def __init__(self):
+        self.removed = 0
+        self.rewritten = 0
+        self.decoder = InstructionDecoder()
+
+    def optimize(
+        self,
+        text_section: list[str],
+        instructions: list[Instruction],
+        labels: dict[str, int],
+        text_labels: dict[str, int],
+    ) -> list[int]:
+        # text_section и instructions меняются на месте, text_labels получают
+        # новые адреса; возвращается номер исходной команды для каждой оставшейся
+        origins = list(range(len(text_section)))
+        if not relocatable(text_section, labels, text_labels):
+            return origins
+        try:
+            decoded = [self.decoder.predecode(item) for item in instructions]
+        except (KeyError, ValueError, OverflowError):
+            return origins
+
+        columns = (text_section, instructions, decoded, origins)
+        while True:
+            removed = self.forward(
+                text_section, instructions, decoded, set(text_labels.values())
+            )
+            self.remove(removed, columns, text_labels)
+            # обратный проход видит результат прямого
+            dead = self.backward(decoded, set(text_labels.values()))
+            self.remove(dead, columns, text_labels)
+            if not removed and not dead:
+                return origins
+
+    def remove(
+        self, removed: set[int], columns: tuple[list, ...], text_labels: dict[str, int]
+    ):
+        if not removed:
+            return
+        kept = [index for index in range(len(columns[0])) if index not in removed]
+        for label, address in text_labels.items():
+            # метка удалённой команды переходит на следующую оставшуюся
+            text_labels[label] = bisect.bisect_left(kept, address)
+        for column in columns:
+            column[:] = [column[index] for index in kept]
+        self.removed += len(removed)
+
+    def forward(
+        self,
+        text_section: list[str],
+        instructions: list[Instruction],
+        decoded: list[DecodedInstruction],
+        entries: set[int],
+    ) -> set[int]:
+        removed = set()
+        values = itertools.count()
+        registers = {}
+        memory = {}
+        zero_flag = None
+        closed = True
+
+        for index, instruction in enumerate(decoded):
+            if index in entries or closed:
+                registers = {register: next(values) for register in REGISTERS}
+                memory = {}
+                zero_flag = None
+                closed = False
+            if not self.valid(instruction):
+                closed = True
+                continue
+            opcode = instruction.opcode
+            operands = instruction.registers
+            if opcode == Opcode.MOV:
+                value = (
+                    ("const", int(instruction.operand))
+                    if len(operands) == 1
+                    else registers[operands[1]]
+                )
+                if registers[operands[0]] == value:
+                    removed.add(index)
+                registers[operands[0]] = value
+            elif opcode == Opcode.LOAD and len(operands) == 1:
+                # ячейка возвращает значение той же разрядности, что в неё записали
+                address = int(instruction.operand)
+                value = memory.setdefault(address, next(values))
+                target = operands[0]
+                sources = [r for r in sorted(REGISTERS) if registers[r] == value]
+                if target in sources:
+                    removed.add(index)
+                elif sources:
+                    self.rewrite(
+                        index, text_section, instructions, decoded, target, sources[0]
+                    )
+                registers[target] = value
+            elif opcode == Opcode.STORE and len(operands) == 1:
+                address = int(instruction.operand)
+                if memory.get(address) == registers[operands[0]]:
+                    removed.add(index)
+                memory[address] = registers[operands[0]]
+            elif opcode == Opcode.STORE:
+                memory = {}
+            elif opcode in (Opcode.LOAD, Opcode.IN):
+                registers[operands[0]] = next(values)
+            elif opcode in ARITHMETIC:
+                target = alu_registers(instruction)[0] if opcode in ALU else operands[0]
+                registers[target] = next(values)
+                # флаг нуля результата - то же, что CMP результата с нулём
+                zero_flag = ("cmp", registers[target], ZERO)
+            elif opcode == Opcode.CMP:
+                second = (
+                    ("const", int(instruction.operand))
+                    if len(operands) == 1
+                    else registers[operands[1]]
+                )
+                comparison = ("cmp", registers[operands[0]], second)
+                if zero_flag == comparison:
+                    removed.add(index)
+                zero_flag = comparison
+            elif opcode in COMPARE_JUMPS:
+                zero_flag = ("cmp", registers[operands[0]], registers[operands[1]])
+            elif opcode in (Opcode.JZ, Opcode.JNZ) and self.fusible(
+                index, decoded, removed, entries
+            ):
+                # JZ и JNZ выполняются при установленном флаге, как JEQ
+                first, second = decoded[index - 1].registers
+                removed.add(index - 1)
+                self.fuse(index, text_section, instructions, decoded, first, second)
+            elif opcode in (Opcode.JMP, Opcode.HALT):
+                closed = True
+        return removed
+
+    def backward(
+        self, decoded: list[DecodedInstruction], entries: set[int]
+    ) -> set[int]:
+        removed = set()
+        live = set(REGISTERS)
+        # адреса, перезаписываемые дальше в окне до любого чтения
+        overwritten = set()
+
+        for index in range(len(decoded) - 1, -1, -1):
+            instruction = decoded[index]
+            opcode = instruction.opcode
+            operands = instruction.registers
+            # после перехода, останова или перед меткой всё считается живым
+            boundary = (
+                not self.valid(instruction) or opcode in JUMPS or opcode == Opcode.HALT
+            )
+            if boundary or index + 1 in entries:
+                live = set(REGISTERS)
+                overwritten = set()
+            if boundary:
+                continue
+            if opcode == Opcode.MOV:
+                if operands[0] not in live:
+                    removed.add(index)
+                    continue
+                live.discard(operands[0])
+                live.update(operands[1:])
+            elif opcode == Opcode.STORE and len(operands) == 1:
+                address = int(instruction.operand)
+                if address in overwritten:
+                    removed.add(index)
+                    continue
+                overwritten.add(address)
+                live.add(operands[0])
+            elif opcode in ALU:
+                target, first, second = alu_registers(instruction)
+                live.discard(target)
+                live.update((first, second))
+            elif opcode in IMMEDIATE_ALU:
+                live.discard(operands[0])
+                live.add(operands[1])
+            elif opcode in (Opcode.LOAD, Opcode.IN):
+                live.discard(operands[0])
+                live.update(operands[1:])
+                if opcode == Opcode.LOAD and len(operands) == 1:
+                    overwritten.discard(int(instruction.operand))
+                else:
+                    # чтение по неизвестному адресу или останов по концу ввода
+                    overwritten = set()
+            else:
+                # STORE по адресу из регистра, INC, DEC, CMP, OUT
+                live.update(operands)
+                if opcode == Opcode.STORE:
+                    overwritten = set()
+        return removed
+
+    def valid(self, instruction: DecodedInstruction) -> bool:
+        # команда без микропрограммы останавливает машину: граница окна
+        return instruction.opcode == Opcode.HALT or (
+            instruction.mc_addres is not None and instruction.mc_addres_zero is not None
+        )
+
+    def fusible(
+        self,
+        index: int,
+        decoded: list[DecodedInstruction],
+        removed: set[int],
+        entries: set[int],
+    ) -> bool:
+        # на переход не ведёт метка, перед ним - оставшийся CMP двух регистров
+        if index == 0 or index in entries or index - 1 in removed:
+            return False
+        previous = decoded[index - 1]
+        return (
+            previous.opcode == Opcode.CMP
+            and len(previous.registers) == 2
+            and self.valid(previous)
+        )
+
+    def fuse(
+        self,
+        index: int,
+        text_section: list[str],
+        instructions: list[Instruction],
+        decoded: list[DecodedInstruction],
+        first: int,
+        second: int,
+    ):
+        _, label = text_section[index].split()
+        text_section[index] = f"JEQ R{first}, R{second}, {label}"
+        instructions[index] = {
+            "opcode": Opcode.JEQ.value,
+            "args": [
+                {"reg": f"R{first}"},
+                {"reg": f"R{second}"},
+                *instructions[index]["args"],
+            ],
+        }
+        decoded[index] = self.decoder.predecode(instructions[index])
+        self.rewritten += 1
+
+    def rewrite(
+        self,
+        index: int,
+        text_section: list[str],
+        instructions: list[Instruction],
+        decoded: list[DecodedInstruction],
+        target: int,
+        source: int,
+    ):
+        text_section[index] = f"MOV R{target}, R{source}"
+        instructions[index] = {
+            "opcode": Opcode.MOV.value,
+            "args": [{"reg": f"R{target}"}, {"reg": f"R{source}"}],
+        }
+        decoded[index] = self.decoder.predecode(instructions[index])
+        self.rewritten += 1
@@ -0,0 +1,178 @@
+import pytest
+
+from cfg_optimizer_test import run
+from peephole import Peephole
+from translator import parse_asm
+
+# исходная программа, ожидаемый результат прохода, ввод,
+# число удалённых и заменённых команд
+CASES = {
+    "redundant_load": (
+        """
+        .data
+        x: 33
+        .text
+            LOAD R1, x
+            LOAD R1, x
+            LOAD R2, x
+            ADD R3, R1, R2
+            OUT R3, 1
+            HALT
+        """,
+        """
+        .data
+        x: 33
+        .text
+            LOAD R1, x
+            MOV R2, R1
+            ADD R3, R1, R2
+            OUT R3, 1
+            HALT
+        """,
+        [],
+        (1, 1),
+    ),
+    "dead_mov": (
+        """
+        .data
+        .text
+            MOV R1, 5
+            MOV R1, 65
+            OUT R1, 1
+            HALT
+        """,
+        """
+        .data
+        .text
+            MOV R1, 65
+            OUT R1, 1
+            HALT
+        """,
+        [],
+        (1, 0),
+    ),
+    "overwritten_store": (
+        """
+        .data
+        x: 0
+        .text
+            IN R1, 0
+            STORE R1, x
+            INC R1
+            STORE R1, x
+            OUT R1, 1
+            HALT
+        """,
+        """
+        .data
+        x: 0
+        .text
+            IN R1, 0
+            INC R1
+            STORE R1, x
+            OUT R1, 1
+            HALT
+        """,
+        ["A"],
+        (1, 0),
+    ),
+    "duplicate_cmp": (
+        """
+        .data
+        .text
+            IN R1, 0
+            CMP R1, 65
+            JZ END
+            CMP R1, 65
+            JZ END
+            OUT R1, 1
+        END:
+            HALT
+        """,
+        """
+        .data
+        .text
+            IN R1, 0
+            CMP R1, 65
+            JZ END
+            JZ END
+            OUT R1, 1
+        END:
+            HALT
+        """,
+        ["B"],
+        (1, 0),
+    ),
+    "cmp_jz_fusion": (
+        """
+        .data
+        .text
+            IN R1, 0
+            IN R2, 0
+            CMP R1, R2
+            JZ END
+            OUT R1, 1
+        END:
+            HALT
+        """,
+        """
+        .data
+        .text
+            IN R1, 0
+            IN R2, 0
+            JEQ R1, R2, END
+            OUT R1, 1
+        END:
+            HALT
+        """,
+        ["A", "B"],
+        (1, 1),
+    ),
+    "labels_after_removal": (
+        """
+        .data
+        .text
+            IN R1, 0
+            MOV R2, 1
+            MOV R2, 3
+        LOOP:
+            OUT R1, 1
+            DEC R2
+            JZ END
+            JMP LOOP
+        END:
+            HALT
+        """,
+        """
+        .data
+        .text
+            IN R1, 0
+            MOV R2, 3
+        LOOP:
+            OUT R1, 1
+            DEC R2
+            JZ END
+            JMP LOOP
+        END:
+            HALT
+        """,
+        ["A"],
+        (1, 0),
+    ),
+}
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_rewritten_window(name):
+    source, expected, tokens, counts = CASES[name]
+    optimizer = Peephole()
+    original = parse_asm(source)
+    optimized = parse_asm(source, optimizer=optimizer)
+
+    assert optimized["text"] == parse_asm(expected)["text"]
+    assert (optimizer.removed, optimizer.rewritten) == counts
+    # вывод тот же, а тактов меньше
+    output, ticks = run(optimized, tokens)
+    expected_output, expected_ticks = run(original, tokens)
+    assert output == expected_output
+    assert ticks < expected_ticks
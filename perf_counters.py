@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import json
+from collections import defaultdict
+from typing import TYPE_CHECKING, TextIO
+
+from isa import COMPARE_JUMPS, Opcode
+from microcode import ControlStore, Signal, SignalValue
+
+if TYPE_CHECKING:
+    from control_unit import ControlUnit
+
+
+class PerfCounters:
+    # На каждом такте обновляются только гистограмма микрокоманд и счётчики по
+    # опкоду; обращения к памяти, сигналы, переходы и ввод-вывод выводятся из
+    # гистограммы по содержимому Control Store при чтении.
+    control_unit: ControlUnit = None
+
+    control_store: ControlStore = None
+
+    # число исполнений каждой микрокоманды по mc_addres
+    microcode: list[int] = None
+
+    opcode_ticks: dict[Opcode, int] = None
+
+    retired: dict[Opcode, int] = None
+
+    # у JEQ/JNE направление выбирается по флагу внутри микрокоманды
+    compare_jumps_taken: int = None
+
+    # такт, с которого ведётся счёт (машина могла быть восстановлена из снимка)
+    start_tick: int = None
+
+    def __init__(self, control_unit: ControlUnit):
+        self.control_unit = control_unit
+        self.control_store = control_unit.controle_store
+        self.microcode = [0] * len(self.control_store.mc_memory)
+        self.opcode_ticks = defaultdict(int)
+        self.retired = defaultdict(int)
+        self.compare_jumps_taken = 0
+        self.start_tick = control_unit.tick
+
+    def count(self, control_unit: ControlUnit):
+        self.microcode[control_unit.mc_addres] += 1
+        opcode = control_unit.instruction_register.opcode
+        self.opcode_ticks[opcode] += 1
+        # следующей будет выборка: инструкция завершена
+        if control_unit.mux1 == 0:
+            self.retired[opcode] += 1
+            if opcode in COMPARE_JUMPS:
+                zero_flag = control_unit.data_path.alu.zero_flag
+                self.compare_jumps_taken += zero_flag == (opcode == Opcode.JEQ)
+
+    def settle(self):
+        # такт останова прерывается исключением до count (HALT при декодировании,
+        # сбой микрокоманды): он учитывается за микрокомандой и инструкцией,
+        # на которых машина остановилась, а HALT считается завершённой
+        control_unit = self.control_unit
+        instruction = control_unit.instruction_register
+        if instruction is None or control_unit.tick == self.start_tick + sum(
+            self.microcode
+        ):
+            return
+        self.microcode[control_unit.mc_addres] += 1
+        self.opcode_ticks[instruction.opcode] += 1
+        if instruction.opcode == Opcode.HALT:
+            self.retired[Opcode.HALT] += 1
+
+    def signal_count(self, predicate) -> int:
+        return sum(
+            count
+            for microcode, count in zip(self.control_store.mc_memory, self.microcode)
+            if predicate(microcode)
+        )
+
+    def branches(self) -> dict[str, int]:
+        mapping = self.control_unit.instruction_decoder.mc_address_mapping
+        jumps = {Opcode.JMP, Opcode.JZ, Opcode.JNZ}
+        entries = {address for key, address in mapping.items() if key[0] in jumps}
+        taken = {
+            address
+            for address in entries
+            if any(
+                microcode.get(Signal.SEL_IP) == SignalValue.SEL_IP_OP.value
+                for microcode in self.control_store.microprogram(address)
+            )
+        }
+        compare = {
+            address for key, address in mapping.items() if key[0] in COMPARE_JUMPS
+        }
+        compare_jumps = sum(self.microcode[address] for address in compare)
+        return {
+            "taken": sum(self.microcode[address] for address in taken)
+            + self.compare_jumps_taken,
+            "not_taken": sum(self.microcode[address] for address in entries - taken)
+            + compare_jumps
+            - self.compare_jumps_taken,
+        }
+
+    def as_dict(self) -> dict:
+        # можно вызывать во время прогона: значения на момент вызова
+        self.settle()
+        ticks = self.control_unit.tick
+        instructions = sum(self.retired.values())
+        # LATCH_MC_ADDR и READ_MC Control Unit выставляет на каждом такте сам
+        executed = sum(self.microcode)
+        signals = {
+            signal.name: self.signal_count(lambda microcode, s=signal: s in microcode)
+            for signal in Signal
+        }
+        signals[Signal.LATCH_MC_ADDR.name] += executed
+        signals[Signal.READ_MC.name] += executed
+        return {
+            "ticks": ticks,
+            "instructions": instructions,
+            "cpi": ticks / instructions if instructions else None,
+            "opcodes": {
+                opcode.value: {
+                    "retired": self.retired[opcode],
+                    "ticks": self.opcode_ticks[opcode],
+                    "cpi": (
+                        self.opcode_ticks[opcode] / self.retired[opcode]
+                        if self.retired[opcode]
+                        else None
+                    ),
+                }
+                for opcode in Opcode
+                if self.opcode_ticks[opcode]
+            },
+            "microcode": {
+                str(address): count
+                for address, count in enumerate(self.microcode)
+                if count
+            },
+            "memory": {
+                "reads": signals[Signal.MEM_READ.name],
+                "writes": signals[Signal.MEM_WRITE.name],
+            },
+            "signals": {name: count for name, count in signals.items() if count},
+            "branches": self.branches(),
+            "io": {
+                "input": signals[Signal.INP_BUF_NEXT.name],
+                "output": signals[Signal.OUT_BUF_NEXT.name],
+            },
+        }
+
+    def dump(self, file: TextIO):
+        json.dump(self.as_dict(), file, indent=2)
+        file.write("\n")
@@ -0,0 +1,67 @@
+import json
+from collections import defaultdict
+from pathlib import Path
+
+import pytest
+
+import machine
+from control_unit import TraceLevel
+from data_path import DataPath
+from fast_engine import FastEngine
+from profiler import Profiler
+from translator import translate_to_json
+
+PROGRAMS = Path(__file__).parent / "asm_programs"
+
+
+def fast_profile(object_file):
+    program = json.loads(object_file.read_text())
+    engine = FastEngine(DataPath(program["data"], iter([])), program["text"])
+    profiler = Profiler(len(engine.instructions_memory))
+    profiler.run(engine)
+    retired = defaultdict(int)
+    ticks = defaultdict(int)
+    for instruction, executions, spent in zip(
+        engine.instructions_memory, profiler.executions, profiler.ticks
+    ):
+        retired[instruction.opcode.value] += executions
+        ticks[instruction.opcode.value] += spent
+    return engine, retired, ticks
+
+
+@pytest.mark.parametrize("engine", ["microcode", "compiled"])
+def test_counters_match_fast_profile(tmp_path, engine):
+    object_file = tmp_path / "prob1.json"
+    object_file.write_text(translate_to_json((PROGRAMS / "prob1.asm").read_text()))
+    input_file = tmp_path / "input.txt"
+    input_file.write_text("")
+    counters_file = tmp_path / "counters.json"
+
+    control_unit = machine.main(
+        str(object_file),
+        str(input_file),
+        engine,
+        TraceLevel.OFF.value,
+        output_file=str(tmp_path / "output.txt"),
+        counters_file=str(counters_file),
+    )
+    counters = json.loads(counters_file.read_text())
+    fast, retired, ticks = fast_profile(object_file)
+
+    assert counters["ticks"] == control_unit.tick == fast.tick
+    assert counters["instructions"] == sum(retired.values())
+    for opcode, entry in counters["opcodes"].items():
+        assert entry["retired"] == retired[opcode], opcode
+        assert entry["cpi"] == pytest.approx(ticks[opcode] / retired[opcode]), opcode
+    assert set(counters["opcodes"]) == set(retired)
+
+
+def test_counters_rejected_for_fast_engine(tmp_path):
+    with pytest.raises(machine.UnsupportedOptionError, match="--counters"):
+        machine.main(
+            str(tmp_path / "missing.json"),
+            str(tmp_path / "missing.txt"),
+            "fast",
+            TraceLevel.OFF.value,
+            counters_file=str(tmp_path / "counters.json"),
+        )
@@ -0,0 +1,445 @@
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+from collections import Counter
+from collections.abc import Callable
+from enum import Enum
+from typing import TextIO
+
+from numpy import int16
+
+from binary_object import load_program
+from control_unit import ControlUnit, TickLimitError, TraceLevel
+from data_path import DataPath
+from input_port import read_input
+from mc_optimizer import Effects, architectural_state, retire, signal_effects
+from microcode import (
+    ControlStore,
+    DecodedInstruction,
+    Instruction,
+    Signal,
+    SignalValue,
+)
+
+# Элементы Control Unit, которые в конвейере свои у каждой инструкции: IP и
+# следующий IP, IR, защёлки декодера с шиной операнда, адрес микрокоманды.
+# Они едут по конвейеру вместе с инструкцией и конфликтов не дают.
+PRIVATE = frozenset(("ip", "ip_mux", "ir", "decoder", "operand_bus", "mc", "mc_mux"))
+
+# слово из одних этих сигналов в конце микропрограммы - запись результата
+WRITE_BACK = frozenset(
+    (Signal.SEL_R_WRITE, Signal.LATCH_R1, Signal.LATCH_R2, Signal.LATCH_R3)
+)
+
+STALL_CAUSES = ("stage", "data", "flag", "resource")
+
+
+class Stage(Enum):
+    IF = "IF"
+    ID = "ID"
+    EX = "EX"
+    WB = "WB"
+
+
+class Slot:
+    # инструкция в конвейере и её собственные защёлки
+    ip: int = None
+
+    next_ip: int16 = None
+
+    instruction: DecodedInstruction | None = None
+
+    operand: int16 = None
+
+    # адрес следующей микрокоманды: 1 - декодирование, None - не декодирована
+    mc_addres: int | None = None
+
+    stage: Stage = None
+
+    # исключение выборки или декодирования: возникает, только когда
+    # инструкция становится старшей, иначе её могут сбросить
+    fault: Exception | None = None
+
+    def __init__(self, ip: int):
+        self.ip = ip
+        self.next_ip = int16(ip + 1)
+        self.stage = Stage.IF
+
+
+class PipelinedControlUnit(ControlUnit):
+    # Конвейер IF -> ID -> EX -> WB над тем же Control Store. IF и ID - слова 0
+    # и 1 (выборка и декодирование), EX - слова исполнения, WB - последнее
+    # слово микропрограммы, если оно только пишет результат в регистр. В каждой
+    # ступени не больше одной инструкции, за такт инструкция исполняет не больше
+    # одного слова. Слова такта срабатывают от старшей инструкции к младшей,
+    # поэтому записанное старшей в этом такте младшая уже видит - это
+    # продвижение (forwarding). Младшая ждёт (stall), если:
+    # - stage: нужная ступень занята, например многотактовой EX;
+    # - data: она читает элемент, который старшая ещё запишет, или запись
+    #   идёт в этом же такте, а продвижение отключено;
+    # - flag: то же для флага нуля, который JZ/JNZ читают при декодировании;
+    # - resource: она пишет элемент, который старшая ещё читает или пишет,
+    #   или нужен занятый в этом такте порт памяти.
+    # Выборка идёт подряд (переход считается невыполненным); если слово с
+    # SEL_IP выбрало не следующий адрес, младшие инструкции сбрасываются,
+    # а выборка в том же такте начинается с адреса перехода.
+    forwarding: bool = None
+
+    slots: list[Slot] = None
+
+    fetch_pointer: int = None
+
+    # ступень, чтения, записи и блоки каждого слова Control Store без
+    # собственных элементов инструкции; остаток - объединение по словам
+    # от адреса до конца микропрограммы
+    stages: dict[int, Stage] = None
+
+    word_effects: dict[int, tuple[frozenset, frozenset, frozenset]] = None
+
+    remaining: dict[int, Effects] = None
+
+    retired: int = None
+
+    stalls: Counter = None
+
+    forwarded: int = None
+
+    flushes: int = None
+
+    squashed: int = None
+
+    # вызывается после каждой завершённой инструкции (совместный прогон)
+    on_retire: Callable[[], None] | None = None
+
+    retired_in_tick: bool = None
+
+    # адрес инструкции, исполнившей слово каждой ступени в этом такте
+    executed: dict[Stage, int] = None
+
+    def __init__(
+        self,
+        data_path: DataPath,
+        instructions: list[Instruction],
+        forwarding: bool = True,
+    ):
+        super().__init__(data_path, instructions)
+        self.forwarding = forwarding
+        self.slots = []
+        self.fetch_pointer = 0
+        self.retired = 0
+        self.stalls = Counter({cause: 0 for cause in STALL_CAUSES})
+        self.forwarded = 0
+        self.flushes = 0
+        self.squashed = 0
+        self.retired_in_tick = False
+        self.executed = {}
+        self.classify(self.controle_store)
+
+    def classify(self, control_store: ControlStore):
+        entries = set(self.instruction_decoder.mc_address_mapping.values())
+        self.stages = {0: Stage.IF, 1: Stage.ID}
+        self.word_effects = {}
+        for address, microcode in enumerate(control_store.mc_memory):
+            reads, writes, units = set(), set(), set()
+            for signal, value in microcode.items():
+                if signal == Signal.SEL_MC_ADDR:
+                    continue
+                signal_reads, signal_writes = signal_effects(signal, value)
+                reads |= signal_reads
+                writes |= signal_writes
+                if signal in (Signal.MEM_READ, Signal.MEM_WRITE):
+                    units.add("memory_port")
+            self.word_effects[address] = (
+                frozenset(reads - PRIVATE),
+                frozenset(writes - PRIVATE),
+                frozenset(units),
+            )
+            if address > 1:
+                last = (
+                    microcode.get(Signal.SEL_MC_ADDR)
+                    == SignalValue.SEL_MC_ADDR_NULL.value
+                )
+                write_back = set(microcode) - {Signal.SEL_MC_ADDR} <= WRITE_BACK
+                self.stages[address] = (
+                    Stage.WB
+                    if last and write_back and address not in entries
+                    else Stage.EX
+                )
+
+        self.remaining = {}
+        for address in range(len(control_store.mc_memory) - 1, 1, -1):
+            reads, writes, _ = self.word_effects[address]
+            chained = (
+                control_store.mc_memory[address].get(Signal.SEL_MC_ADDR)
+                == SignalValue.SEL_MC_ADDR_INC.value
+            )
+            if chained and address + 1 in self.remaining:
+                next_reads, next_writes = self.remaining[address + 1]
+                reads, writes = reads | next_reads, writes | next_writes
+            self.remaining[address] = (reads, writes)
+
+    def enable_counters(self) -> PipelineCounters:
+        self.counters = PipelineCounters(self)
+        return self.counters
+
+    def update_tracing(self):
+        # счётчики конвейера ведутся всегда, на такт влияет только журнал
+        self.tracing = self.trace_level != TraceLevel.OFF
+
+    def word(self, slot: Slot) -> tuple[Stage, frozenset, frozenset, frozenset]:
+        if slot.mc_addres == 1:
+            # декодирование читает флаг, только если от него зависит вход
+            instruction = slot.instruction
+            flag = instruction.mc_addres != instruction.mc_addres_zero
+            reads = frozenset(("alu",)) if flag else frozenset()
+            return Stage.ID, reads, frozenset(), frozenset()
+        return self.stages[slot.mc_addres], *self.word_effects[slot.mc_addres]
+
+    def hazard(
+        self, slot: Slot, older: list[tuple[Slot, frozenset, frozenset]]
+    ) -> str | None:
+        # older - старшие инструкции с записями и блоками их слов этого такта
+        stage, reads, writes, units = self.word(slot)
+        if any(other.stage == stage for other, _, _ in older):
+            return "stage"
+        forwarded = False
+        for other, written, used in older:
+            future_reads, future_writes = (
+                self.remaining[other.mc_addres]
+                if other.mc_addres is not None and other.mc_addres > 1
+                else (frozenset(), frozenset())
+            )
+            if units & used or writes & (written | future_reads | future_writes):
+                return "resource"
+            if reads & future_writes or (reads & written and not self.forwarding):
+                return "flag" if stage == Stage.ID else "data"
+            forwarded |= bool(reads & written)
+        self.forwarded += forwarded
+        return None
+
+    def load(self, slot: Slot):
+        self.instruction_pointer = int16(slot.ip)
+        self.mux2 = slot.next_ip
+        self.instruction_register = slot.instruction
+        self.instruction_decoder.operand = slot.operand
+        self.data_path.operand_bus = slot.operand
+        self.mc_addres = slot.mc_addres
+
+    def fetch(self):
+        slot = Slot(self.fetch_pointer)
+        self.fetch_pointer += 1
+        try:
+            slot.instruction = self.instructions_memory[slot.ip]
+            slot.mc_addres = 1
+        except IndexError as error:
+            slot.fault = error
+        self.slots.append(slot)
+        self.executed[Stage.IF] = slot.ip
+
+    def decode(self, slot: Slot):
+        self.load(slot)
+        try:
+            self.signal_start_decode()
+        except (StopIteration, ValueError) as error:
+            slot.fault = error
+            return
+        slot.operand = self.instruction_decoder.operand
+        slot.mc_addres = self.instruction_decoder.mc_addres
+        slot.stage = Stage.ID
+        self.executed[Stage.ID] = slot.ip
+
+    def execute(self, slot: Slot) -> bool:
+        # True, если выбран не следующий адрес и младшие нужно сбросить
+        microcode = self.controle_store.mc_memory[slot.mc_addres]
+        self.load(slot)
+        for signal, value in microcode.items():
+            if signal != Signal.SEL_MC_ADDR:
+                self.send_signal(signal, value)
+        slot.next_ip = self.mux2
+        slot.stage = self.stages[slot.mc_addres]
+        self.executed[slot.stage] = slot.ip
+        if microcode[Signal.SEL_MC_ADDR] == SignalValue.SEL_MC_ADDR_INC.value:
+            slot.mc_addres += 1
+        else:
+            slot.mc_addres = None
+        return Signal.SEL_IP in microcode and int(slot.next_ip) != slot.ip + 1
+
+    def raise_fault(self, slot: Slot):
+        self.instruction_pointer = int16(slot.ip)
+        raise slot.fault
+
+    def step(self):
+        self.tick += 1
+        self.retired_in_tick = False
+        self.executed = {}
+
+        older = []
+        index = 0
+        while index < len(self.slots):
+            slot = self.slots[index]
+            if slot.fault is not None:
+                if index == 0:
+                    self.raise_fault(slot)
+                break
+            cause = self.hazard(slot, older)
+            if cause is not None:
+                # младшие стоят за ней, простой считается один раз
+                self.stalls[cause] += 1
+                break
+            if slot.mc_addres == 1:
+                self.decode(slot)
+                if slot.fault is not None and index == 0:
+                    self.raise_fault(slot)
+                older.append((slot, frozenset(), frozenset()))
+                index += 1
+                continue
+            _, _, writes, units = self.word(slot)
+            redirect = self.execute(slot)
+            older.append((slot, writes, units))
+            if redirect:
+                self.flushes += 1
+                self.squashed += len(self.slots) - index - 1
+                del self.slots[index + 1 :]
+                self.fetch_pointer = int(slot.next_ip)
+            if slot.mc_addres is None:
+                self.retire(slot)
+                del self.slots[index]
+            else:
+                index += 1
+
+        if not any(slot.stage == Stage.IF for slot in self.slots):
+            self.fetch()
+
+        if self.tracing:
+            self.info()
+
+    def retire(self, slot: Slot):
+        self.instruction_pointer = int16(slot.ip)
+        self.instruction_register = slot.instruction
+        self.retired += 1
+        self.retired_in_tick = True
+        if self.on_retire is not None:
+            self.on_retire()
+
+    def info(self):
+        if self.trace_level == TraceLevel.INSTRUCTION and not self.retired_in_tick:
+            return
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug(self.format_tick())
+
+    def format_tick(self) -> str:
+        # "-" - в ступени пузырь: простой или сброс
+        log_message = f"TICK: {self.tick:<5} "
+        for stage in Stage:
+            log_message += f"{stage.value}: {self.executed.get(stage, '-'):<4}  "
+        log_message += f"R1: {self.data_path.r1:<4}  "
+        log_message += f"R2: {self.data_path.r2:<4}  "
+        log_message += f"R3: {self.data_path.r3:<4}  "
+        log_message += f"Z: {int(self.data_path.alu.zero_flag)}"
+        return log_message
+
+    def control_logic_procced(self):
+        while True:
+            if self.tick >= self.tick_limit:
+                raise TickLimitError()
+
+            self.step()
+
+
+class PipelineCounters:
+    control_unit: PipelinedControlUnit = None
+
+    def __init__(self, control_unit: PipelinedControlUnit):
+        self.control_unit = control_unit
+
+    def as_dict(self) -> dict:
+        control_unit = self.control_unit
+        ticks = control_unit.tick
+        instructions = control_unit.retired
+        return {
+            "ticks": ticks,
+            "instructions": instructions,
+            "cpi": ticks / instructions if instructions else None,
+            "stalls": dict(control_unit.stalls),
+            "forwarded": control_unit.forwarded,
+            "flushes": control_unit.flushes,
+            "squashed": control_unit.squashed,
+        }
+
+    def dump(self, file: TextIO):
+        json.dump(self.as_dict(), file, indent=2)
+        file.write("\n")
+
+
+def cosimulate(
+    instructions: list[Instruction],
+    data: list[int],
+    input_tokens,
+    forwarding: bool = True,
+    instruction_limit: int = 1_000_000,
+) -> tuple[str | None, ControlUnit, PipelinedControlUnit]:
+    # микрокодовая машина исполняет по инструкции на каждую завершённую в
+    # конвейере, состояние сравнивается в момент завершения; возвращается
+    # описание первого расхождения или None
+    input_tokens = list(input_tokens)
+    reference = ControlUnit(DataPath(data, iter(input_tokens)), instructions)
+    pipelined = PipelinedControlUnit(
+        DataPath(data, iter(input_tokens)), instructions, forwarding
+    )
+    reference.configure_trace(TraceLevel.OFF)
+    pipelined.configure_trace(TraceLevel.OFF)
+    divergences = []
+
+    def compare():
+        halt = retire(reference)
+        if halt is not None:
+            divergences.append(f"instruction {pipelined.retired}: {halt} != None")
+        elif architectural_state(reference) != architectural_state(pipelined):
+            divergences.append(f"instruction {pipelined.retired}: state differs")
+
+    pipelined.on_retire = compare
+    halt = None
+    try:
+        while not divergences and pipelined.retired < instruction_limit:
+            pipelined.step()
+    except Exception as exception:
+        halt = type(exception).__name__
+    if divergences:
+        return divergences[0], reference, pipelined
+    if halt is not None:
+        reference_halt = retire(reference)
+        if reference_halt != halt:
+            return f"halt: {reference_halt} != {halt}", reference, pipelined
+        if architectural_state(reference) != architectural_state(pipelined):
+            return "halt: state differs", reference, pipelined
+    return None, reference, pipelined
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="pipeline.py")
+    parser.add_argument("object_file")
+    parser.add_argument("input_file")
+    parser.add_argument(
+        "--no-forwarding",
+        action="store_true",
+        help="stall on every read-after-write instead of forwarding",
+    )
+    parser.add_argument("--instruction-limit", type=int, default=1_000_000)
+    args = parser.parse_args()
+    program = load_program(args.object_file)
+    with open(args.input_file) as file:
+        divergence, reference, pipelined = cosimulate(
+            program.get("text", []),
+            program.get("data", []),
+            read_input(file),
+            not args.no_forwarding,
+            args.instruction_limit,
+        )
+    print(f"ticks: {reference.tick} -> {pipelined.tick}")
+    PipelineCounters(pipelined).dump(sys.stdout)
+    if divergence:
+        print(divergence, file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,67 @@
+from pathlib import Path
+
+import pytest
+
+from input_port import read_input
+from pipeline import cosimulate
+from translator import parse_asm
+
+PROGRAMS = Path(__file__).parent / "asm_programs"
+
+# три прохода цикла: ADD -> SUB -> STORE -> LOAD по данным, MOV R3 пишет
+# регистр, который ещё пишет SUB, JZ читает флаг DEC; переход выполняется
+# три раза (JMP дважды, JZ на выходе) и каждый раз сбрасывает выбранную команду
+HAZARDS = """
+.data
+x: 0
+.text
+    MOV R1, 3
+LOOP:
+    ADD R2, R1, R1
+    SUB R3, R2, R1
+    STORE R3, x
+    LOAD R2, x
+    MOV R3, R1
+    DEC R1
+    JZ END
+    JMP LOOP
+END:
+    HALT
+"""
+
+
+@pytest.mark.parametrize("forwarding", [True, False])
+@pytest.mark.parametrize("name", sorted(path.stem for path in PROGRAMS.glob("*.asm")))
+def test_pipeline_matches_microcode(name, forwarding):
+    # состояние совпадает в момент завершения каждой инструкции
+    program = parse_asm((PROGRAMS / f"{name}.asm").read_text(encoding="utf-8"))
+    with open(PROGRAMS / "user_name.txt", encoding="utf-8") as file:
+        divergence, reference, pipelined = cosimulate(
+            program["text"], program["data"], read_input(file), forwarding
+        )
+    assert divergence is None, divergence
+    assert pipelined.data_path.output_buffer.getvalue() == (
+        reference.data_path.output_buffer.getvalue()
+    )
+    assert pipelined.tick < reference.tick
+
+
+@pytest.mark.parametrize(
+    ("forwarding", "ticks", "stalls", "forwarded"),
+    [
+        (True, 35, {"stage": 3, "data": 0, "flag": 0, "resource": 3}, 9),
+        (False, 44, {"stage": 3, "data": 6, "flag": 3, "resource": 3}, 0),
+    ],
+)
+def test_hazard_counters(forwarding, ticks, stalls, forwarded):
+    program = parse_asm(HAZARDS)
+    divergence, _, pipelined = cosimulate(
+        program["text"], program["data"], [], forwarding
+    )
+    assert divergence is None, divergence
+    counters = pipelined.enable_counters().as_dict()
+    assert counters["instructions"] == 24
+    assert counters["ticks"] == ticks
+    assert counters["stalls"] == stalls
+    assert counters["forwarded"] == forwarded
+    assert (counters["flushes"], counters["squashed"]) == (3, 3)
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from typing import NamedTuple, TextIO
+
+from binary_object import load_program
+from control_unit import TickLimitError
+from data_path import DataPath
+from fast_engine import FastEngine
+from input_port import read_input
+
+
+class HotSpot(NamedTuple):
+    key: str
+    executions: int
+    ticks: int
+    share: float
+
+
+class Profiler:
+    # счётчики по номеру инструкции
+    executions: list[int] = None
+
+    ticks: list[int] = None
+
+    # запись source map транслятора для каждой инструкции
+    source_map: list[dict] | None = None
+
+    halt: str = None
+
+    def __init__(self, size: int, source_map: list[dict] | None = None):
+        self.executions = [0] * size
+        self.ticks = [0] * size
+        self.source_map = source_map
+
+    def run(self, engine: FastEngine):
+        # FastEngine исполняет по одной инструкции за шаг и начисляет ей такты
+        # её микропрограммы, поэтому такты совпадают с потактовой моделью
+        executions = self.executions
+        ticks = self.ticks
+        engine.load_state()
+        try:
+            while True:
+                address = engine.instruction_pointer
+                before = engine.tick
+                try:
+                    engine.step()
+                finally:
+                    if 0 <= address < len(executions):
+                        executions[address] += 1
+                        ticks[address] += engine.tick - before
+        except StopIteration:
+            self.halt = "HALT"
+        except EOFError:
+            self.halt = "EOF"
+        except TickLimitError:
+            self.halt = "LIMIT"
+        except Exception as error:
+            self.halt = repr(error)
+        finally:
+            engine.store_state()
+
+    def location(self, address: int) -> dict:
+        if self.source_map is not None and address < len(self.source_map):
+            return self.source_map[address]
+        return {"line": None, "label": None, "source": f"#{address}"}
+
+    def line_key(self, address: int) -> str:
+        location = self.location(address)
+        if location["line"] is None:
+            return location["source"]
+        return f"{location['line']}: {location['source']}"
+
+    def label_key(self, address: int) -> str:
+        return self.location(address)["label"] or "<no label>"
+
+    def hot_spots(self, by: str = "line") -> list[HotSpot]:
+        key = self.line_key if by == "line" else self.label_key
+        executions = defaultdict(int)
+        ticks = defaultdict(int)
+        for address in range(len(self.ticks)):
+            if self.executions[address]:
+                executions[key(address)] += self.executions[address]
+                ticks[key(address)] += self.ticks[address]
+        total = sum(self.ticks) or 1
+        return sorted(
+            (
+                HotSpot(name, executions[name], ticks[name], ticks[name] / total)
+                for name in ticks
+            ),
+            key=lambda spot: spot.ticks,
+            reverse=True,
+        )
+
+    def write_collapsed(self, file: TextIO):
+        # формат collapsed stacks (flamegraph.pl, speedscope): кадры через ';',
+        # затем число тактов; ';' внутри кадра заменяется
+        for address in range(len(self.ticks)):
+            if self.ticks[address]:
+                frames = [self.label_key(address), self.line_key(address)]
+                stack = ";".join(frame.replace(";", ",") for frame in frames)
+                print(f"{stack} {self.ticks[address]}", file=file)
+
+
+def print_hot_spots(hot_spots: list[HotSpot], title: str, file: TextIO, top: int):
+    print(f"{title:<40} {'executions':>12} {'ticks':>12} {'%':>7}", file=file)
+    for spot in hot_spots[:top]:
+        print(
+            f"{spot.key[:40]:<40} {spot.executions:>12} {spot.ticks:>12} "
+            f"{spot.share * 100:>6.2f}%",
+            file=file,
+        )
+
+
+def main(
+    object_file,
+    input_file,
+    source_map_file=None,
+    collapsed_file=None,
+    top=20,
+    tick_limit=None,
+):
+    program = load_program(object_file)
+    source_map = None
+    if source_map_file:
+        with open(source_map_file, encoding="utf-8") as file:
+            source_map = json.load(file)["instructions"]
+
+    with open(input_file) as file:
+        data_path = DataPath(program.get("data", []), read_input(file))
+        engine = FastEngine(data_path, program.get("text", []))
+        if tick_limit is not None:
+            engine.tick_limit = tick_limit
+        profiler = Profiler(len(engine.instructions_memory), source_map)
+        profiler.run(engine)
+
+    print(f"stopped: {profiler.halt}, ticks: {engine.tick}", file=sys.stderr)
+    print_hot_spots(profiler.hot_spots("line"), "line", sys.stdout, top)
+    print(file=sys.stdout)
+    print_hot_spots(profiler.hot_spots("label"), "label", sys.stdout, top)
+
+    if collapsed_file:
+        with open(collapsed_file, "w", encoding="utf-8") as file:
+            profiler.write_collapsed(file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="profiler.py")
+    parser.add_argument("object_file")
+    parser.add_argument("input_file")
+    parser.add_argument(
+        "--source-map", metavar="PATH", help="source map written by translator.py"
+    )
+    parser.add_argument(
+        "--collapsed", metavar="PATH", help="write collapsed stacks for flamegraph"
+    )
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--tick-limit", type=int, default=None)
+    args = parser.parse_args()
+    main(
+        args.object_file,
+        args.input_file,
+        args.source_map,
+        args.collapsed,
+        args.top,
+        args.tick_limit,
+    )
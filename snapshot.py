@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import argparse
+import operator
+import struct
+import zlib
+from array import array
+from collections.abc import Iterable
+from pathlib import Path
+
+from numpy import int16, int64
+
+from control_unit import ControlUnit
+from data_path import DataPath, WordArray
+from input_port import InputPort, Token
+from microcode import Instruction
+from output_port import OutputSink
+
+MAGIC = b"CSASNAP\x00"
+VERSION = 1
+
+HEADER = struct.Struct("<8sH")
+# тип значения (индекс в SCALAR_TYPES) и само значение
+SCALAR = struct.Struct("<Bq")
+# позиции портов ввода и вывода, размер памяти
+PORTS = struct.Struct("<QQI")
+
+# Регистры хранятся вместе с типом: int16, расширенный int64 и int Python
+# (символ из escape-последовательности) ведут себя в АЛУ по-разному.
+SCALAR_TYPES = [type(None), bool, int, int16, int64]
+
+# состояние Control Unit и Data Path на границе тактов
+FIELDS = [
+    "tick",
+    "instruction_pointer",
+    "mc_addres",
+    "mux1",
+    "mux2",
+    "instruction_decoder.operand",
+    "instruction_decoder.mc_addres",
+    "instruction_decoder.zero_flag",
+    "data_path.address_register",
+    "data_path.data_register",
+    "data_path.operand_register",
+    "data_path.r1",
+    "data_path.r2",
+    "data_path.r3",
+    "data_path.mux1",
+    "data_path.mux2",
+    "data_path.mux3",
+    "data_path.operand_bus",
+    "data_path.data_memory.output_value",
+    "data_path.alu.first_operand",
+    "data_path.alu.second_operand",
+    "data_path.alu.result",
+    "data_path.alu.zero_flag",
+]
+
+
+def set_field(target: object, field: str, value):
+    path, _, name = field.rpartition(".")
+    if path:
+        target = operator.attrgetter(path)(target)
+    setattr(target, name, value)
+
+
+class Snapshot:
+    # значения FIELDS в том же порядке
+    registers: list = None
+
+    # номер инструкции в IR, None - IR ещё не загружался
+    instruction_register: int | None = None
+
+    input_position: int = None
+
+    output_position: int = None
+
+    memory: WordArray = None
+
+    @classmethod
+    def capture(cls, control_unit: ControlUnit) -> Snapshot:
+        snapshot = cls()
+        snapshot.registers = [
+            operator.attrgetter(field)(control_unit) for field in FIELDS
+        ]
+        if control_unit.instruction_register is not None:
+            snapshot.instruction_register = control_unit.instructions_memory.index(
+                control_unit.instruction_register
+            )
+        data_path = control_unit.data_path
+        snapshot.input_position = data_path.input_buffer.position
+        snapshot.output_position = data_path.output_buffer.position
+        # память не копируется: машина скопирует её сама при первой записи
+        snapshot.memory = data_path.data_memory.memory.share()
+        return snapshot
+
+    def restore(
+        self,
+        instructions: list[Instruction],
+        input_tokens: Iterable[Token],
+        output_sink: OutputSink | None = None,
+        engine: type[ControlUnit] = ControlUnit,
+    ) -> ControlUnit:
+        # input_tokens - ввод с самого начала, прочитанная до снимка часть
+        # пропускается; вывод продолжается с позиции снимка
+        data_path = DataPath([], (), output_sink)
+        data_path.input_buffer = InputPort(input_tokens, self.input_position)
+        data_path.output_buffer.flushed = self.output_position
+        data_path.data_memory.memory = self.memory.share()
+
+        control_unit = engine(data_path, instructions)
+        for field, value in zip(FIELDS, self.registers):
+            set_field(control_unit, field, value)
+        if self.instruction_register is not None:
+            control_unit.instruction_register = control_unit.instructions_memory[
+                self.instruction_register
+            ]
+        control_unit.current_mc = control_unit.controle_store.mc_memory[
+            control_unit.mc_addres
+        ]
+        return control_unit
+
+    def to_bytes(self) -> bytes:
+        payload = [
+            SCALAR.pack(SCALAR_TYPES.index(type(value)), value or 0)
+            for value in [*self.registers, self.instruction_register]
+        ]
+        payload.append(
+            PORTS.pack(self.input_position, self.output_position, len(self.memory))
+        )
+        payload.append(self.memory.values.tobytes())
+        payload.append(bytes(self.memory.wide))
+        return HEADER.pack(MAGIC, VERSION) + zlib.compress(b"".join(payload))
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> Snapshot:
+        magic, version = HEADER.unpack_from(blob)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError()
+        payload = zlib.decompress(blob[HEADER.size :])
+
+        scalars = []
+        for offset in range(0, SCALAR.size * (len(FIELDS) + 1), SCALAR.size):
+            tag, value = SCALAR.unpack_from(payload, offset)
+            scalars.append(None if tag == 0 else SCALAR_TYPES[tag](value))
+        offset = SCALAR.size * (len(FIELDS) + 1)
+
+        snapshot = cls()
+        snapshot.registers = scalars[:-1]
+        snapshot.instruction_register = scalars[-1]
+        snapshot.input_position, snapshot.output_position, size = PORTS.unpack_from(
+            payload, offset
+        )
+        offset += PORTS.size
+        values = array("q")
+        values.frombytes(payload[offset : offset + values.itemsize * size])
+        offset += values.itemsize * size
+        wide = bytearray(payload[offset : offset + size])
+        snapshot.memory = WordArray.from_buffers(values, wide)
+        return snapshot
+
+    def save(self, path: str | Path):
+        Path(path).write_bytes(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str | Path) -> Snapshot:
+        return cls.from_bytes(Path(path).read_bytes())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="snapshot.py")
+    parser.add_argument("snapshot_file")
+    args = parser.parse_args()
+    snapshot = Snapshot.load(args.snapshot_file)
+    for field, value in zip(FIELDS, snapshot.registers):
+        print(f"{field}: {value!r}")
+    print(f"instruction_register: {snapshot.instruction_register}")
+    print(f"input_position: {snapshot.input_position}")
+    print(f"output_position: {snapshot.output_position}")
+    print(f"memory: {len(snapshot.memory)} words")
@@ -0,0 +1,67 @@
+from pathlib import Path
+
+import pytest
+from numpy import int64
+
+from control_unit import ControlUnit, TraceLevel
+from data_path import DataPath
+from input_port import read_input
+from mc_compiler import CompiledControlUnit
+from output_port import BufferSink
+from snapshot import Snapshot
+from translator import parse_asm
+
+PROGRAMS = Path(__file__).parent / "asm_programs"
+
+
+def start(engine):
+    program = parse_asm((PROGRAMS / "hello_user_name.asm").read_text(encoding="utf-8"))
+    with open(PROGRAMS / "user_name.txt", encoding="utf-8") as file:
+        tokens = list(read_input(file))
+    control_unit = engine(
+        DataPath(program["data"], iter(tokens), BufferSink()), program["text"]
+    )
+    control_unit.configure_trace(TraceLevel.OFF)
+    return control_unit, program["text"], tokens
+
+
+def run_to_halt(control_unit):
+    try:
+        while True:
+            control_unit.step()
+    except StopIteration:
+        pass
+    return control_unit.tick, control_unit.data_path.output_buffer.getvalue()
+
+
+@pytest.mark.parametrize("engine", [ControlUnit, CompiledControlUnit])
+@pytest.mark.parametrize("tick", [0, 1, 250, 600])
+def test_round_trip_reproduces_state(engine, tick):
+    control_unit, instructions, tokens = start(engine)
+    while control_unit.tick < tick:
+        control_unit.step()
+    # ячейка с расширенным результатом АЛУ, программа её не читает
+    control_unit.data_path.data_memory.memory[1000] = int64(1 << 40)
+    snapshot = Snapshot.capture(control_unit)
+
+    restored = Snapshot.from_bytes(snapshot.to_bytes())
+    assert restored.registers == snapshot.registers
+    assert [type(value) for value in restored.registers] == [
+        type(value) for value in snapshot.registers
+    ]
+    assert restored.instruction_register == snapshot.instruction_register
+    assert restored.input_position == snapshot.input_position
+    assert restored.output_position == snapshot.output_position
+    assert restored.memory.values == snapshot.memory.values
+    assert restored.memory.wide == snapshot.memory.wide
+    assert restored.memory[1000] == int64(1 << 40)
+    assert type(restored.memory[1000]) is int64
+    assert restored.to_bytes() == snapshot.to_bytes()
+
+    # продолжение с восстановленного снимка совпадает с непрерывным прогоном
+    printed = control_unit.data_path.output_buffer.getvalue()
+    resumed = restored.restore(instructions, iter(tokens), BufferSink(), engine)
+    resumed_tick, resumed_output = run_to_halt(resumed)
+    expected_tick, expected_output = run_to_halt(control_unit)
+    assert resumed_tick == expected_tick
+    assert printed + resumed_output == expected_output
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+from binary_trace import LOG_PREFIX
+from control_unit import TraceRecord, format_trace
+
+DIGEST_INTERVAL = 1000
+
+# длина контрольной точки в шестнадцатеричных символах
+CHECKPOINT_LENGTH = 16
+
+
+class TraceDigest:
+    # Журнал уровня microcode без хранения текста: строки журнала подаются в
+    # накопительный sha256, каждые interval тактов запоминается его текущее
+    # значение. Совпадение контрольных точек до i-й означает совпадение журнала
+    # до конца i-го окна, поэтому первое расхождение локализуется окном.
+    interval: int = None
+
+    ticks: int = None
+
+    checkpoints: list[str] = None
+
+    hasher: hashlib._Hash = None
+
+    # JSON пишется при close, в том числе после сбоя машины
+    path: str | None = None
+
+    def __init__(self, interval: int = DIGEST_INTERVAL, path: str | None = None):
+        if interval <= 0:
+            raise ValueError()
+        self.interval = interval
+        self.path = path
+        self.ticks = 0
+        self.checkpoints = []
+        self.hasher = hashlib.sha256()
+
+    @classmethod
+    def from_log(cls, lines, interval: int = DIGEST_INTERVAL) -> TraceDigest:
+        digest = cls(interval)
+        for line in lines:
+            digest.update(line.rstrip("\n").removeprefix(LOG_PREFIX))
+        return digest
+
+    def update(self, line: str):
+        self.hasher.update(line.encode())
+        self.hasher.update(b"\n")
+        self.ticks += 1
+        if self.ticks % self.interval == 0:
+            self.checkpoints.append(self.hasher.hexdigest()[:CHECKPOINT_LENGTH])
+
+    # интерфейс TraceWriter: Control Unit передаёт запись каждого такта
+    def write(self, record: TraceRecord):
+        self.update(format_trace(record))
+
+    def close(self):
+        if self.path is not None:
+            with open(self.path, "w", encoding="utf-8") as file:
+                json.dump(self.as_dict(), file, indent=1)
+
+    def as_dict(self) -> dict:
+        return {
+            "interval": self.interval,
+            "ticks": self.ticks,
+            "checkpoints": list(self.checkpoints),
+            "digest": self.hasher.hexdigest(),
+        }
+
+    def divergence(self, expected: dict) -> str | None:
+        if expected == self.as_dict():
+            return None
+        if expected["interval"] != self.interval:
+            return f"digest interval {self.interval}, expected {expected['interval']}"
+        window = 0
+        for actual, reference in zip(self.checkpoints, expected["checkpoints"]):
+            if actual != reference:
+                break
+            window += 1
+        first = window * self.interval + 1
+        last = min(first + self.interval - 1, max(self.ticks, expected["ticks"]))
+        return (
+            f"trace diverges in window {window} (ticks {first}..{last}),"
+            f" {self.ticks} ticks, expected {expected['ticks']}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="trace_digest.py")
+    parser.add_argument("log_file", help="text log of machine.py --trace microcode")
+    parser.add_argument("--interval", type=int, default=DIGEST_INTERVAL)
+    parser.add_argument(
+        "--expected", metavar="PATH", help="digest JSON to compare with"
+    )
+    args = parser.parse_args()
+    with open(args.log_file, encoding="utf-8") as file:
+        digest = TraceDigest.from_log(file, args.interval)
+    if args.expected:
+        message = digest.divergence(
+            json.loads(Path(args.expected).read_text(encoding="utf-8"))
+        )
+        if message:
+            print(message, file=sys.stderr)
+            sys.exit(1)
+    else:
+        json.dump(digest.as_dict(), sys.stdout, indent=1)
+        print()
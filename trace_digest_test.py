@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+import machine
+from control_unit import TraceLevel
+from engines_test import FAULTING_PROGRAMS, run_until_fault
+from trace_digest import TraceDigest
+
+
+def test_digest_written_after_fault(tmp_path):
+    # дайджест сбойного прогона нужен для поиска расхождения, поэтому он
+    # записывается при закрытии журнала, а не после возврата из main
+    instructions = FAULTING_PROGRAMS["load_out_of_range"]
+    object_file = tmp_path / "program.json"
+    object_file.write_text(json.dumps({"data": [], "text": instructions}))
+    input_file = tmp_path / "input.txt"
+    input_file.write_text("")
+    digest_file = tmp_path / "digest.json"
+
+    with pytest.raises(IndexError):
+        machine.main(
+            object_file,
+            input_file,
+            "microcode",
+            TraceLevel.OFF.value,
+            output_file=tmp_path / "output.txt",
+            trace_digest=TraceDigest(4, digest_file),
+        )
+
+    digest = json.loads(digest_file.read_text(encoding="utf-8"))
+    _, tick = run_until_fault("microcode", instructions)
+    # строка такта сбоя в журнал не попадает
+    assert digest["ticks"] == tick - 1
+    assert len(digest["checkpoints"]) == (tick - 1) // 4
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+
+# временный файл старше этого (в секундах) остался от прерванной записи
+STALE_TEMPORARY_AGE = 3600
+
+
+class TranslationCache:
+    directory: Path = None
+
+    max_bytes: int = None
+
+    hits: int = None
+
+    misses: int = None
+
+    def __init__(self, directory: str | Path, max_bytes: int = 64 << 20):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(*parts: str | bytes) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, str):
+                part = part.encode("utf-8")
+            # длина перед частью, чтобы разные разбиения не давали один ключ
+            digest.update(len(part).to_bytes(8, "little"))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}.obj"
+
+    def get(self, key: str) -> bytes | None:
+        path = self.path(key)
+        try:
+            payload = path.read_bytes()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # время изменения служит отметкой последнего использования для LRU
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return payload
+
+    def put(self, key: str, payload: bytes):
+        # запись во временный файл и атомарное переименование: другие процессы
+        # видят либо старое содержимое, либо полностью записанное новое
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(payload)
+            Path(temporary).replace(self.path(key))
+        except BaseException:
+            Path(temporary).unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    def evict(self):
+        # свежие .tmp могут дописываться другим процессом, их не трогаем
+        stale = time.time() - STALE_TEMPORARY_AGE
+        for path in self.directory.glob("*.tmp"):
+            try:
+                if path.stat().st_mtime < stale:
+                    path.unlink()
+            except FileNotFoundError:
+                continue
+
+        entries = []
+        for path in self.directory.glob("*.obj"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
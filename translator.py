@@ -1,12 +1,23 @@
 from __future__ import annotations
 
+import argparse
 import json
 import re
 import sys
-
+from pathlib import Path
+from typing import NamedTuple
+
+import binary_object
+import cfg_optimizer
+import isa
+import peephole
+from binary_object import load_program, pack_object
+from cfg_optimizer import CfgOptimizer
 from control_unit import Instruction
+from input_port import ASCII_END_OF_LINE_CODE
 from isa import ArgType
-from machine import ASCII_END_OF_LINE_CODE
+from peephole import Peephole, relocatable
+from translation_cache import TranslationCache
 
 
 def parse_data_section(data_code: str, labels: dict[str, int]) -> list[int]:
@@ -46,35 +57,86 @@ def parse_data_section(data_code: str, labels: dict[str, int]) -> list[int]:
     return data_section
 
 
-def parse_text_section(text_code: str, labels: dict[str, int]) -> list[str]:
+class SourceLocation(NamedTuple):
+    # номер строки среди строк секции .text после strip (с нуля) и ближайшая
+    # метка выше неё
+    line: int
+    label: str | None
+
+
+def parse_text_section(
+    text_code: str,
+    labels: dict[str, int],
+    locations: list[SourceLocation] | None = None,
+) -> list[str]:
     text_section: list[str] = []
     address_counter = 0
+    label = None
     text_lines = text_code.strip().splitlines()
-    for line in text_lines:
+    for line_number, line in enumerate(text_lines):
         if ":" in line:
             label, command = map(str.strip, line.split(":", 1))
             labels[label] = address_counter
-            if command:
-                text_section.append(command)
-                address_counter += 1
         else:
             command = line.strip()
-            if command:  # добавляем проверку, чтобы пропускать пустые строки
-                text_section.append(command)
-                address_counter += 1
+        if command:  # добавляем проверку, чтобы пропускать пустые строки
+            text_section.append(command)
+            address_counter += 1
+            if locations is not None:
+                locations.append(SourceLocation(line_number, label))
 
     return text_section
 
 
+# Метки-идентификаторы подставляются за один проход по токенам. Метки другого вида
+# (пустые, с не-словесными символами или из одних цифр, которые могут совпасть
+# с уже подставленным адресом) разрешаются последовательными заменами, как раньше.
+IDENTIFIER = re.compile(r"\w+")
+
+# имена групп совпадают с ArgType, кроме литерала перевода строки
+ARGUMENT = re.compile(
+    rf"(?P<{ArgType.REG.value}>R[0-9]+)"
+    rf"|(?P<{ArgType.NUMBER.value}>\d+)"
+    rf"|(?P<{ArgType.INDIRECT_ADDRESS.value}>\(\s*R[0-9]+\s*\))"
+    r"|(?P<eol>'\\n')"
+)
+
+
+def substitute_labels(command: str, labels: dict[str, int]) -> str:
+    for label, address in labels.items():
+        command = re.sub(r"\b" + re.escape(label) + r"\b", str(address), command)
+    return command
+
+
+def format_arg(arg: str) -> ArgType | None:
+    token = ARGUMENT.fullmatch(arg)
+    if token is None:
+        return None
+    if token.lastgroup == "eol":
+        return {ArgType.NUMBER.value: str(ASCII_END_OF_LINE_CODE)}
+    return {token.lastgroup: arg.strip("()")}
+
+
 def resolve_labels(
     text_section: list[str], labels: dict[str, int]
 ) -> list[Instruction]:
+    symbols = {label: str(address) for label, address in labels.items()}
+    single_pass = all(
+        IDENTIFIER.fullmatch(label) and not label.isdigit() for label in labels
+    )
+
+    def lookup(token: re.Match) -> str:
+        return symbols.get(token[0], token[0])
+
+    if single_pass:
+        # команды не содержат переводов строк, поэтому обрабатываются одним текстом
+        commands = IDENTIFIER.sub(lookup, "\n".join(text_section)).split("\n")
+    else:
+        commands = [substitute_labels(command, labels) for command in text_section]
+
     resolved_text_section: list[Instruction] = []
-    for command in text_section:
-        for label, address in labels.items():
-            command = re.sub(r"\b" + re.escape(label) + r"\b", str(address), command)
-        command = command.replace(",", "")
-        parts = command.split()
+    for command in commands:
+        parts = command.replace(",", "").split()
         if len(parts) == 0:
             continue
         opcode = parts[0]
@@ -82,23 +144,21 @@ def resolve_labels(
 
         formatted_args: list[ArgType] = []
         for arg in args:
-            if re.match(r"^R[0-9]+$", arg):
-                formatted_args.append({ArgType.REG.value: arg})
-            elif re.match(r"^\d+$", arg):
-                formatted_args.append({ArgType.NUMBER.value: arg})
-            elif re.match(r"^\(\s*R[0-9]+\s*\)$", arg):
-                formatted_args.append({ArgType.INDIRECT_ADDRESS.value: arg.strip("()")})
-            elif arg == "'\\n'":
-                formatted_args.append(
-                    {ArgType.NUMBER.value: str(ASCII_END_OF_LINE_CODE)}
-                )
+            formatted_arg = format_arg(arg)
+            if formatted_arg is not None:
+                formatted_args.append(formatted_arg)
 
         resolved_text_section.append({"opcode": opcode, "args": formatted_args})
 
     return resolved_text_section
 
 
-def parse_asm(asm_code: str) -> dict[str, list[int] | list[Instruction]]:
+def parse_asm(
+    asm_code: str,
+    source_map: list[dict] | None = None,
+    optimizer: Peephole | None = None,
+    global_optimizer: CfgOptimizer | None = None,
+) -> dict[str, list[int] | list[Instruction]]:
     data_section: list[int] = []
     text_section: list[str] = []
     labels: dict[str, int] = {}
@@ -110,30 +170,206 @@ def parse_asm(asm_code: str) -> dict[str, list[int] | list[Instruction]]:
 
     data_code, text_code = sections
 
+    locations = [] if source_map is not None else None
     data_section = parse_data_section(data_code, labels)
-    text_section = parse_text_section(text_code, labels)
+    text_labels: dict[str, int] = {}
+    source_text_section = parse_text_section(text_code, text_labels, locations)
+    labels.update(text_labels)
+    text_section = source_text_section
     resolved_text_section = resolve_labels(text_section, labels)
+    origins = range(len(text_section))
+
+    if optimizer is not None:
+        # оптимизатор правит копию: source map ссылается на исходные команды
+        text_section = list(source_text_section)
+        origins = optimizer.optimize(
+            text_section, resolved_text_section, labels, text_labels
+        )
+        labels.update(text_labels)
+        resolved_text_section = resolve_labels(text_section, labels)
+
+    if global_optimizer is not None and relocatable(text_section, labels, text_labels):
+        # граф потока управления строится по разрешённым адресам переходов
+        block_origins = global_optimizer.optimize(resolved_text_section, data_section)
+        origins = [origins[origin] for origin in block_origins]
+
+    if source_map is not None:
+        # номер первой строки секции .text в исходном файле (с единицы)
+        first_line = asm_code.count("\n", 0, len(asm_code) - len(text_code.lstrip()))
+        source_map.extend(
+            {
+                "line": first_line + locations[origin].line + 1,
+                "label": locations[origin].label,
+                "source": source_text_section[origin],
+            }
+            for origin in origins
+        )
 
     return {"data": data_section, "text": resolved_text_section}
 
 
-def translate_to_json(asm_code: str) -> str:
-    parsed_asm = parse_asm(asm_code)
+def translate_to_json(
+    asm_code: str,
+    optimizer: Peephole | None = None,
+    global_optimizer: CfgOptimizer | None = None,
+) -> str:
+    parsed_asm = parse_asm(asm_code, None, optimizer, global_optimizer)
 
     return json.dumps(parsed_asm, separators=(", ", ": "))
 
 
-def main(input_file, target_file):
+def translate_to_binary(
+    asm_code: str,
+    optimizer: Peephole | None = None,
+    global_optimizer: CfgOptimizer | None = None,
+) -> bytes:
+    return pack_object(parse_asm(asm_code, None, optimizer, global_optimizer))
+
+
+def translator_version() -> str:
+    # версия транслятора - хеш исходников, от которых зависит объектный код
+    modules = (sys.modules[__name__], isa, binary_object, peephole, cfg_optimizer)
+    return TranslationCache.key(
+        *(Path(module.__file__).read_bytes() for module in modules)
+    )
+
+
+def translate(
+    asm_code: str,
+    binary: bool = False,
+    cache: TranslationCache | None = None,
+    optimizer: Peephole | None = None,
+    global_optimizer: CfgOptimizer | None = None,
+) -> bytes:
+    key = None
+    if cache is not None:
+        output_format = "binary" if binary else "json"
+        passes = ("peephole " if optimizer is not None else "") + (
+            "global" if global_optimizer is not None else ""
+        )
+        key = TranslationCache.key(
+            translator_version(), output_format, passes, asm_code
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    if binary:
+        output = translate_to_binary(asm_code, optimizer, global_optimizer)
+    else:
+        output = translate_to_json(asm_code, optimizer, global_optimizer).encode()
+
+    if cache is not None:
+        cache.put(key, output)
+    return output
+
+
+def write_source_map(
+    asm_code: str,
+    input_file: str,
+    source_map_file: str,
+    optimizer: Peephole | None = None,
+    global_optimizer: CfgOptimizer | None = None,
+):
+    source_map: list[dict] = []
+    parse_asm(asm_code, source_map, optimizer, global_optimizer)
+    with open(source_map_file, "w", encoding="utf-8") as file:
+        json.dump({"file": input_file, "instructions": source_map}, file, indent=1)
+
+
+def main(
+    input_file,
+    target_file,
+    binary=False,
+    cache_dir=None,
+    source_map_file=None,
+    optimize=False,
+    global_optimize=False,
+):
     with open(input_file, encoding="utf-8") as infile:
         asm_code = infile.read()
 
-    json_output = translate_to_json(asm_code)
-
-    with open(target_file, "w") as outfile:
-        outfile.write(json_output)
+    def optimizers() -> tuple[Peephole | None, CfgOptimizer | None]:
+        return (
+            Peephole() if optimize else None,
+            CfgOptimizer() if global_optimize else None,
+        )
+
+    cache = TranslationCache(cache_dir) if cache_dir else None
+    optimizer, global_optimizer = optimizers()
+    hits = cache.hits if cache is not None else 0
+    output = translate(asm_code, binary, cache, optimizer, global_optimizer)
+    cached = cache is not None and cache.hits > hits
+
+    with open(target_file, "wb") as outfile:
+        outfile.write(output)
+
+    if source_map_file:
+        write_source_map(asm_code, input_file, source_map_file, *optimizers())
+
+    if optimize or global_optimize:
+        # счётчики проходов есть только у трансляции, выполненной сейчас;
+        # при попадании в кеш исходник повторно не разбирается
+        if cached:
+            print("optimizer: translation taken from cache", file=sys.stderr)
+        if optimizer is not None and not cached:
+            print(
+                f"peephole: removed {optimizer.removed} instructions,"
+                f" rewrote {optimizer.rewritten}",
+                file=sys.stderr,
+            )
+        if global_optimizer is not None and not cached:
+            print(
+                f"global: folded {global_optimizer.folded},"
+                f" removed {global_optimizer.removed},"
+                f" threaded {global_optimizer.threaded} jumps",
+                file=sys.stderr,
+            )
+        text = load_program(target_file)["text"]
+        print(f"instructions: {len(text)}", file=sys.stderr)
+
+    if cache is not None:
+        print(
+            "translation cache: hits {hits}, misses {misses}".format(**cache.stats()),
+            file=sys.stderr,
+        )
 
 
 if __name__ == "__main__":
-    input_file = sys.argv[1]
-    target_file = sys.argv[2]
-    main(input_file, target_file)
+    parser = argparse.ArgumentParser(prog="translator.py")
+    parser.add_argument("input_file")
+    parser.add_argument("target_file")
+    parser.add_argument(
+        "--binary",
+        action="store_true",
+        help="write binary object file with .text and .data sections",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="reuse translations stored in this directory",
+    )
+    parser.add_argument(
+        "--source-map",
+        metavar="PATH",
+        help="write instruction index to source line and label map (JSON)",
+    )
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="run the peephole pass, see peephole.py",
+    )
+    parser.add_argument(
+        "--global-optimize",
+        action="store_true",
+        help="run control-flow graph passes, see cfg_optimizer.py",
+    )
+    args = parser.parse_args()
+    main(
+        args.input_file,
+        args.target_file,
+        args.binary,
+        args.cache_dir,
+        args.source_map,
+        args.optimize,
+        args.global_optimize,
+    )